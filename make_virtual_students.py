@@ -45,6 +45,7 @@ load_dotenv(ROOT / ".env")
 os.chdir(str(RAG))
 
 from candidate_report import generate_candidate_report  # noqa: E402
+from llm_scheduler import Priority, llm_priority         # noqa: E402
 from app import golden_config as gc                      # noqa: E402
 
 CASES_REF = json.load(open(ONLINE / "data" / "cases_reference.json", encoding="utf-8"))["references"]
@@ -355,4 +356,8 @@ def _write_summary(out_dir: Path, summary: list, profiles: list, case_nums: list
 
 
 if __name__ == "__main__":
-    main()
+    # Trafic hors ligne : cède le pas aux corrections interactives ; les 429
+    # transitoires sont re-tentés par llm_scheduler, seul un quota épuisé
+    # (insufficient_quota) remonte jusqu'à l'arrêt propre ci-dessus.
+    with llm_priority(Priority.BATCH):
+        main()
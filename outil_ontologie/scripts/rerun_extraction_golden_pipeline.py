@@ -17,6 +17,7 @@ Usage (depuis la racine "ECG lecture") :
     python outil_ontologie/scripts/rerun_extraction_golden_pipeline.py --limit 10
     python outil_ontologie/scripts/rerun_extraction_golden_pipeline.py --write-back
     python outil_ontologie/scripts/rerun_extraction_golden_pipeline.py --out rapport.json
+    python outil_ontologie/scripts/rerun_extraction_golden_pipeline.py --checkpoint rerun.jsonl
 
 Par défaut, N'ÉCRIT PAS dans extraction_golden.json (dry-run, compare juste
 les métriques). Utiliser --write-back pour persister la nouvelle
@@ -54,7 +55,7 @@ except ImportError:
     pass
 
 from app import extraction_golden, golden_config  # noqa: E402
-from candidate_report import generate_candidate_report  # noqa: E402
+from batch_grading import BatchStats, GradingItem, grade_batch  # noqa: E402
 from scoring_v3 import build_negation_map  # noqa: E402
 
 ConceptKey = Tuple[str, str]  # (ontology_id, statut)
@@ -99,38 +100,33 @@ def _expert_set(annotation: dict) -> Set[ConceptKey]:
     return out
 
 
-def rerun_pipeline_on_item(cas: int, texte: str) -> List[dict]:
-    """Rejoue le pipeline actuel sur un item, renvoie la liste de concepts
-    au même format que pipeline_extraction. [] en cas d'erreur (dégradation
-    propre, l'item compte alors comme 0 extraction pour ce run)."""
-    try:
-        contract = golden_config.golden_for_scorer(cas)
-        all_pts = contract.get("validants", []) + contract.get("descripteurs", [])
-        golden_ids = [p["concept_id"] for p in all_pts]
-        golden_names = [p["concept_name"] for p in all_pts]
-        golden_roles = ["validant"] * len(contract.get("validants", [])) + \
-            ["descripteur"] * len(contract.get("descripteurs", []))
-        report = generate_candidate_report(
-            texte,
-            golden_names=golden_names,
-            golden_ids=golden_ids,
-            golden_roles=golden_roles,
-            diagnostic_principal=contract.get("diagnostic_principal", ""),
-            with_feedback=False,
-        )
-        out = []
-        for c in getattr(report, "concepts_extraits", []) or []:
-            out.append({
-                "terme_brut": getattr(c, "terme_brut", ""),
-                "ontology_id": getattr(c, "ontology_id", ""),
-                "concept_name": getattr(c, "concept_name", ""),
-                "statut": getattr(c, "statut", "present"),
-                "method": getattr(c, "method", ""),
-            })
-        return out
-    except Exception as ex:  # noqa: BLE001
-        print(f"  ⚠️  Erreur pipeline (cas {cas}): {ex}", file=sys.stderr)
-        return []
+def golden_item(item_id: str, cas: int, texte: str) -> GradingItem:
+    """Copie à corriger avec le contrat golden du cas (golden_config)."""
+    contract = golden_config.golden_for_scorer(cas)
+    all_pts = contract.get("validants", []) + contract.get("descripteurs", [])
+    return GradingItem(
+        item_id,
+        texte,
+        golden_ids=[p["concept_id"] for p in all_pts],
+        golden_names=[p["concept_name"] for p in all_pts],
+        golden_roles=["validant"] * len(contract.get("validants", [])) +
+        ["descripteur"] * len(contract.get("descripteurs", [])),
+        diagnostic_principal=contract.get("diagnostic_principal", ""),
+    )
+
+
+def report_concepts(report) -> List[dict]:
+    """Concepts d'un rapport au même format que pipeline_extraction."""
+    out = []
+    for c in getattr(report, "concepts_extraits", []) or []:
+        out.append({
+            "terme_brut": getattr(c, "terme_brut", ""),
+            "ontology_id": getattr(c, "ontology_id", ""),
+            "concept_name": getattr(c, "concept_name", ""),
+            "statut": getattr(c, "statut", "present"),
+            "method": getattr(c, "method", ""),
+        })
+    return out
 
 
 def compute_confusion(new_pipeline: Dict[str, List[dict]], items: Dict[str, dict]) -> dict:
@@ -229,6 +225,8 @@ def main():
                      help="Écrit la nouvelle pipeline_extraction dans extraction_golden.json.")
     ap.add_argument("--out", type=Path, default=None,
                      help="Chemin JSON détaillé du rapport avant/après.")
+    ap.add_argument("--checkpoint", type=Path, default=None,
+                     help="Fichier .jsonl de reprise (relancer reprend les items déjà faits).")
     args = ap.parse_args()
 
     data = extraction_golden.load()
@@ -249,13 +247,28 @@ def main():
     confusion_old = compute_confusion(old_pipeline, items_subset)
 
     print(f"🔄 Rejeu du pipeline sur {len(item_ids)} items annotés...")
-    new_pipeline: Dict[str, List[dict]] = {}
-    for i, item_id in enumerate(item_ids, 1):
+    # Correction par lot : textes / termes dédupliqués, appels concurrents,
+    # rapports rendus dans l'ordre d'achèvement.
+    batch = []
+    for item_id in item_ids:
         item = items[item_id]
-        print(f"  [{i}/{len(item_ids)}] {item_id} (cas {item['cas']})...", end=" ")
-        extracted = rerun_pipeline_on_item(item["cas"], item["reponse_texte"])
-        new_pipeline[item_id] = extracted
-        print(f"{len(extracted)} concepts")
+        try:
+            batch.append(golden_item(item_id, item["cas"], item["reponse_texte"]))
+        except Exception as ex:  # noqa: BLE001
+            print(f"  ⚠️  Contrat golden indisponible (cas {item['cas']}): {ex}",
+                  file=sys.stderr)
+    new_pipeline: Dict[str, List[dict]] = {item_id: [] for item_id in item_ids}
+    stats = BatchStats()
+    for i, (item_id, report) in enumerate(
+        grade_batch(batch, with_feedback=False, checkpoint=args.checkpoint, stats=stats), 1
+    ):
+        if report.erreur:
+            # Dégradation propre : l'item compte comme 0 extraction pour ce run.
+            print(f"  ⚠️  Erreur pipeline ({item_id}): {report.erreur}", file=sys.stderr)
+        new_pipeline[item_id] = report_concepts(report)
+        print(f"  [{i}/{len(batch)}] {item_id} (cas {items[item_id]['cas']})... "
+              f"{len(new_pipeline[item_id])} concepts")
+    print(stats.format())
 
     confusion_new = compute_confusion(new_pipeline, items_subset)
     print_report(confusion_old, confusion_new)
@@ -0,0 +1,543 @@
+"""
+📦 Correction par lot — une session d'examen entière
+=====================================================
+Corrige une cohorte (75 cas × des centaines d'étudiants) en mutualisant
+tout ce qui peut l'être, au lieu d'appeler generate_candidate_report
+réponse par réponse :
+
+  • Déduplication : une copie identique (même texte, même golden set) est
+    corrigée une fois ; un même texte n'est extrait (NER) qu'une fois ; un
+    même (terme, contexte) n'est soumis au Juge qu'une fois.
+  • Embeddings : les termes uniques d'une vague de copies partent en
+    quelques gros appels (BATCH_EMBED_CHUNK termes par appel), au lieu
+    d'un appel par copie.
+  • Concurrence bornée : NER, Juge, feedback et embeddings passent par un
+    ordonnanceur (au plus BATCH_MAX_CONCURRENCY unités en vol, au plus
+    BATCH_RPM démarrages par minute) ; chaque appel API passe ensuite en
+    priorité BATCH par llm_scheduler (budgets par modèle, re-tentatives).
+  • Streaming : chaque CandidateReport est rendu dès que sa copie est
+    terminée (ordre d'achèvement, pas ordre d'entrée).
+  • Reprise : un fichier de checkpoint JSON Lines reçoit chaque rapport
+    terminé sans erreur ; relancer le même lot rend ces rapports sans
+    rappeler l'API.
+  • Débit : BatchStats (copies/min, appels API par copie, par modèle).
+
+Les étapes sont celles d'agenerate_candidate_report (même code pour
+l'assemblage et le scoring) : pour les mêmes réponses des modèles, un
+rapport du lot est identique au rapport unitaire (hors latence_s).
+
+Usage :
+    from batch_grading import GradingItem, BatchStats, grade_batch
+
+    items = [GradingItem("ECG-042/cas-8", texte, golden_ids=ids,
+                         golden_roles=roles, diagnostic_principal=diag), ...]
+    stats = BatchStats()
+    for item_id, report in grade_batch(items, checkpoint="session.jsonl",
+                                       with_feedback=False, stats=stats):
+        ...
+    print(stats.format())
+
+    # asyncio : async for item_id, report in agrade_batch(items): ...
+
+Configuration :
+  BATCH_MAX_CONCURRENCY  unités (NER, Juge, feedback, embeddings) en vol (défaut 16)
+  BATCH_RPM              démarrages d'unités par minute (défaut 0 = illimité)
+  BATCH_WAVE_SIZE        copies par vague d'embeddings (défaut 200)
+  BATCH_EMBED_CHUNK      termes par appel d'embedding (défaut 1000, max API 2048)
+
+Le checkpoint ne versionne pas le pipeline : après une modification de
+l'ontologie ou du scoring, repartir d'un nouveau fichier.
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List,
+    Optional, Tuple, TypeVar, Union,
+)
+
+from candidate_report import (
+    CandidateReport,
+    DecouverteDetail,
+    DescripteurDetail,
+    ExtractedConcept,
+    ValidantDetail,
+    _assemble_and_score,
+    _fix_negation,
+    _get_engine,
+    _new_report,
+    _resolve_golden,
+)
+from hybrid_search import HybridSearchEngine
+from llm_clients import ApiCallCounter, count_api_calls
+from llm_scheduler import Priority, llm_priority
+from local_cache import content_hash
+from ner_extractor import ClinicalEntity, aextract_clinical_terms
+from neurosymbolic_judge import aresolve_term_to_ontology
+from pedagogical_feedback import PedagogicalFeedback, agenerate_pedagogical_feedback
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+REQUESTS_PER_MINUTE = float(os.getenv("BATCH_RPM", "0"))
+WAVE_SIZE = int(os.getenv("BATCH_WAVE_SIZE", "200"))
+EMBED_CHUNK = int(os.getenv("BATCH_EMBED_CHUNK", "1000"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Entrées / statistiques
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class GradingItem:
+    """Une copie à corriger (arguments de generate_candidate_report + un id)."""
+    item_id: str
+    texte_etudiant: str
+    golden_ids: List[str] = field(default_factory=list)
+    golden_names: List[str] = field(default_factory=list)
+    golden_roles: List[str] = field(default_factory=list)
+    diagnostic_principal: str = ""
+    commentaire_correcteur: str = ""
+
+    def job_key(self) -> str:
+        """Deux copies de même clé produisent le même rapport."""
+        return content_hash(
+            self.texte_etudiant,
+            self.diagnostic_principal,
+            self.commentaire_correcteur,
+            json.dumps([self.golden_ids, self.golden_names, self.golden_roles],
+                       ensure_ascii=False),
+        )
+
+
+@dataclass
+class BatchStats:
+    """Débit et mutualisation d'un lot (rempli au fil de grade_batch)."""
+    n_items: int = 0
+    n_resumed: int = 0            # rapports relus depuis le checkpoint
+    n_graded: int = 0             # rapports calculés dans ce run
+    n_errors: int = 0             # rapports avec `erreur` (non checkpointés)
+    n_unique_jobs: int = 0        # copies distinctes (texte + golden set)
+    n_unique_texts: int = 0       # extractions NER demandées
+    n_entities: int = 0           # entités extraites (toutes copies distinctes)
+    n_unique_terms: int = 0       # termes envoyés à la recherche hybride
+    n_unique_resolutions: int = 0 # (terme, contexte) soumis au Juge
+    api_calls: Dict[str, int] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+    @property
+    def n_api_calls(self) -> int:
+        return sum(self.api_calls.values())
+
+    @property
+    def answers_per_min(self) -> float:
+        return self.n_graded * 60.0 / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def api_calls_per_answer(self) -> float:
+        return self.n_api_calls / self.n_graded if self.n_graded else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["n_api_calls"] = self.n_api_calls
+        d["answers_per_min"] = round(self.answers_per_min, 1)
+        d["api_calls_per_answer"] = round(self.api_calls_per_answer, 2)
+        return d
+
+    def format(self) -> str:
+        by_model = ", ".join(f"{m} {n}" for m, n in sorted(self.api_calls.items()))
+        return "\n".join([
+            f"📦 Lot : {self.n_items} copies — {self.n_graded} corrigées, "
+            f"{self.n_resumed} reprises du checkpoint, {self.n_errors} en erreur",
+            f"   Distinctes : {self.n_unique_jobs} copies, {self.n_unique_texts} textes, "
+            f"{self.n_unique_terms} termes, {self.n_unique_resolutions} résolutions "
+            f"(sur {self.n_entities} entités)",
+            f"   Débit : {self.answers_per_min:.1f} copies/min "
+            f"({self.elapsed_s:.1f}s)",
+            f"   API : {self.n_api_calls} appels, "
+            f"{self.api_calls_per_answer:.2f} par copie"
+            + (f" ({by_model})" if by_model else ""),
+        ])
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Ordonnanceur : concurrence bornée + débit de démarrage
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _RateLimiter:
+    """
+    Au plus `max_concurrency` unités en vol, au plus `requests_per_minute`
+    démarrages par minute (espacement régulier). Une unité = une extraction
+    NER, une résolution, une chaîne de feedback ou un lot d'embeddings.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float):
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def run(self, fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+        async with self._semaphore:
+            if self._interval:
+                async with self._lock:
+                    now = asyncio.get_running_loop().time()
+                    start = max(now, self._next_start)
+                    self._next_start = start + self._interval
+                if start > now:
+                    await asyncio.sleep(start - now)
+            return await fn(*args)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Checkpoint (JSON Lines)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def report_from_dict(d: Dict[str, Any]) -> CandidateReport:
+    """Reconstruit un CandidateReport sérialisé par dataclasses.asdict."""
+    d = dict(d)
+    d["concepts_extraits"] = [ExtractedConcept(**c) for c in d.get("concepts_extraits", [])]
+    d["validant_details"] = [ValidantDetail(**v) for v in d.get("validant_details", [])]
+    d["descripteur_details"] = [
+        DescripteurDetail(**x) for x in d.get("descripteur_details", [])
+    ]
+    d["decouvertes"] = [DecouverteDetail(**x) for x in d.get("decouvertes", [])]
+    if d.get("feedback_pedagogique") is not None:
+        d["feedback_pedagogique"] = PedagogicalFeedback(**d["feedback_pedagogique"])
+    return CandidateReport(**d)
+
+
+def _load_checkpoint(path: Optional[Path]) -> Dict[str, Dict[str, Any]]:
+    """item_id → {"job_key", "report"} des copies déjà corrigées."""
+    done: Dict[str, Dict[str, Any]] = {}
+    if path is None or not path.exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # ligne tronquée (run interrompu pendant l'écriture)
+            done[record["item_id"]] = record
+    return done
+
+
+def _append_checkpoint(path: Path, item: GradingItem, report: CandidateReport) -> None:
+    record = {"item_id": item.item_id, "job_key": item.job_key(), "report": asdict(report)}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Moteur de lot
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _BatchRun:
+    """État partagé d'un lot : tâches dédupliquées NER / Juge, ordonnanceur."""
+
+    def __init__(
+        self,
+        engine: HybridSearchEngine,
+        with_feedback: bool,
+        limiter: _RateLimiter,
+        stats: BatchStats,
+    ):
+        self.engine = engine
+        self.with_feedback = with_feedback
+        self.limiter = limiter
+        self.stats = stats
+        self._resolutions: Dict[Tuple[str, str], "asyncio.Task[Dict]"] = {}
+
+    async def run(
+        self,
+        jobs: List[List[GradingItem]],
+        out: "asyncio.Queue",
+        wave_size: int,
+    ) -> None:
+        """Corrige les copies distinctes par vagues ; pousse (item, rapport) dans `out`."""
+        for start in range(0, len(jobs), max(1, wave_size)):
+            await self._run_wave(jobs[start:start + wave_size], out)
+
+    async def _run_wave(self, jobs: List[List[GradingItem]], out: "asyncio.Queue") -> None:
+        # Brique 2 : une extraction par texte distinct de la vague.
+        texts = list(dict.fromkeys(
+            group[0].texte_etudiant for group in jobs
+            if group[0].texte_etudiant and group[0].texte_etudiant.strip() not in ("", "nan")
+        ))
+        self.stats.n_unique_texts += len(texts)
+        ner_tasks = {
+            t: asyncio.ensure_future(self.limiter.run(aextract_clinical_terms, t))
+            for t in texts
+        }
+        # Brique 3 : recherche hybride de tous les termes de la vague.
+        search = asyncio.ensure_future(self._search_wave(ner_tasks))
+
+        async def grade(group: List[GradingItem]) -> Tuple[List[GradingItem], CandidateReport]:
+            return group, await self._grade_job(group[0], ner_tasks, search)
+
+        for done in asyncio.as_completed([grade(group) for group in jobs]):
+            group, report = await done
+            for i, item in enumerate(group):
+                await out.put((item, report if i == 0 else copy.deepcopy(report)))
+
+    async def _search_wave(
+        self, ner_tasks: Dict[str, "asyncio.Future"],
+    ) -> Tuple[Dict[str, Union[List[ClinicalEntity], BaseException]], Dict[str, List[Dict]]]:
+        """
+        Entités (négation corrigée) par texte, puis candidats par terme
+        unique : quelques gros appels d'embedding pour toute la vague.
+        """
+        entities: Dict[str, Union[List[ClinicalEntity], BaseException]] = {}
+        results = await asyncio.gather(*ner_tasks.values(), return_exceptions=True)
+        for texte, extraction in zip(ner_tasks, results):
+            if isinstance(extraction, BaseException):
+                entities[texte] = extraction
+                continue
+            entites = [_fix_negation(e) for e in extraction.entites]
+            entities[texte] = entites
+            self.stats.n_entities += len(entites)
+
+        terms = list(dict.fromkeys(
+            e.terme_brut
+            for entites in entities.values() if isinstance(entites, list)
+            for e in entites
+        ))
+        self.stats.n_unique_terms += len(terms)
+        chunks = [terms[i:i + EMBED_CHUNK] for i in range(0, len(terms), EMBED_CHUNK)]
+        found = await asyncio.gather(*(
+            self.limiter.run(self.engine.asearch_top_k_many, chunk) for chunk in chunks
+        ))
+        candidates: Dict[str, List[Dict]] = {}
+        for chunk, results_chunk in zip(chunks, found):
+            candidates.update(zip(chunk, results_chunk))
+        return entities, candidates
+
+    def _resolve(self, entite: ClinicalEntity, candidats: List[Dict]) -> "asyncio.Task[Dict]":
+        """Résolution Juge partagée par toutes les entités de même (terme, contexte)."""
+        # Les candidats sont fonction du seul terme : (terme, contexte) suffit.
+        key = (entite.terme_brut, entite.contexte_phrase)
+        task = self._resolutions.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.limiter.run(
+                aresolve_term_to_ontology,
+                entite.terme_brut, entite.contexte_phrase, [dict(c) for c in candidats],
+            ))
+            self._resolutions[key] = task
+            self.stats.n_unique_resolutions += 1
+        return task
+
+    async def _grade_job(
+        self,
+        item: GradingItem,
+        ner_tasks: Dict[str, "asyncio.Future"],
+        search: "asyncio.Future",
+    ) -> CandidateReport:
+        """Même déroulé qu'agenerate_candidate_report, étapes réseau mutualisées."""
+        golden_names, golden_ids, golden_roles = _resolve_golden(
+            list(item.golden_names), list(item.golden_ids), list(item.golden_roles)
+        )
+        report = _new_report(
+            item.texte_etudiant, item.diagnostic_principal, item.commentaire_correcteur
+        )
+        if report.erreur:
+            return report
+
+        t0 = time.time()
+        try:
+            entities, candidates = await asyncio.shield(search)
+            entites = entities[item.texte_etudiant]
+            if isinstance(entites, BaseException):
+                raise entites
+            entites = [e.model_copy(deep=True) for e in entites]
+
+            resolutions = await asyncio.gather(*(
+                asyncio.shield(self._resolve(e, candidates[e.terme_brut]))
+                for e in entites
+            ))
+
+            _assemble_and_score(
+                report, item.texte_etudiant, entites,
+                [copy.deepcopy(r) for r in resolutions],
+                golden_ids, golden_names, golden_roles,
+            )
+
+            if self.with_feedback:
+                try:
+                    report.feedback_pedagogique = await self.limiter.run(
+                        agenerate_pedagogical_feedback, report
+                    )
+                except Exception as fb_err:
+                    logger.warning(f"Feedback pédagogique indisponible : {fb_err}")
+
+        except Exception as e:
+            report.erreur = str(e)[:200]
+
+        report.latence_s = round(time.time() - t0, 2)
+        return report
+
+
+_DONE = object()
+
+
+async def agrade_batch(
+    items: Iterable[GradingItem],
+    moteur: Optional[HybridSearchEngine] = None,
+    with_feedback: bool = True,
+    checkpoint: Optional[Union[str, Path]] = None,
+    max_concurrency: Optional[int] = None,
+    requests_per_minute: Optional[float] = None,
+    wave_size: Optional[int] = None,
+    stats: Optional[BatchStats] = None,
+) -> AsyncIterator[Tuple[str, CandidateReport]]:
+    """
+    Corrige un lot de copies ; rend les (item_id, CandidateReport) au fur
+    et à mesure de leur achèvement.
+
+    Args:
+        items:               Copies à corriger (item_id uniques).
+        moteur:              HybridSearchEngine pré-initialisé (optionnel).
+        with_feedback:       Feedback pédagogique GPT par copie distincte.
+        checkpoint:          Fichier .jsonl de reprise (None = pas de reprise).
+                             Les copies déjà présentes (même item_id, même
+                             contenu) sont rendues d'abord, sans appel API.
+        max_concurrency:     Unités en vol (défaut BATCH_MAX_CONCURRENCY).
+        requests_per_minute: Démarrages d'unités par minute (défaut BATCH_RPM,
+                             0 = illimité).
+        wave_size:           Copies distinctes par vague (défaut BATCH_WAVE_SIZE).
+        stats:               BatchStats rempli en place (débit, appels API).
+    """
+    items = list(items)
+    stats = stats if stats is not None else BatchStats()
+    stats.n_items += len(items)
+    checkpoint_path = Path(checkpoint) if checkpoint is not None else None
+    t0 = time.time()
+
+    # Reprise
+    done = _load_checkpoint(checkpoint_path)
+    pending: List[GradingItem] = []
+    for item in items:
+        record = done.get(item.item_id)
+        if record is not None and record.get("job_key") == item.job_key():
+            stats.n_resumed += 1
+            yield item.item_id, report_from_dict(record["report"])
+        else:
+            pending.append(item)
+
+    # Déduplication des copies identiques (ordre de première apparition)
+    groups: Dict[str, List[GradingItem]] = {}
+    for item in pending:
+        groups.setdefault(item.job_key(), []).append(item)
+    jobs = list(groups.values())
+    stats.n_unique_jobs += len(jobs)
+
+    run = _BatchRun(
+        moteur or _get_engine(),
+        with_feedback,
+        _RateLimiter(
+            MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+            REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute,
+        ),
+        stats,
+    )
+    out: asyncio.Queue = asyncio.Queue()
+    counter = ApiCallCounter()
+
+    async def produce() -> None:
+        # Compteur et priorité sont posés dans le contexte de cette tâche :
+        # les tâches et threads qu'elle lance en héritent. Un lot cède
+        # toujours le pas aux corrections interactives (llm_scheduler).
+        with count_api_calls(counter), llm_priority(Priority.BATCH):
+            try:
+                await run.run(jobs, out, WAVE_SIZE if wave_size is None else wave_size)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await out.put(e)
+                return
+        await out.put(_DONE)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            entry = await out.get()
+            if entry is _DONE:
+                break
+            if isinstance(entry, BaseException):
+                raise entry
+            item, report = entry
+            if report.erreur:
+                stats.n_errors += 1
+            elif checkpoint_path is not None:
+                _append_checkpoint(checkpoint_path, item, report)
+            stats.n_graded += 1
+            stats.api_calls = counter.by_model()
+            stats.elapsed_s = round(time.time() - t0, 2)
+            yield item.item_id, report
+    finally:
+        if not producer.done():
+            producer.cancel()
+        stats.api_calls = counter.by_model()
+        stats.elapsed_s = round(time.time() - t0, 2)
+
+
+def grade_batch(
+    items: Iterable[GradingItem],
+    **options: Any,
+) -> Iterator[Tuple[str, CandidateReport]]:
+    """
+    Variante synchrone d'agrade_batch (scripts de benchmark, CLI) : le lot
+    tourne dans une boucle asyncio dédiée (thread), les rapports sont rendus
+    dans le thread appelant dès qu'ils sont prêts. Mêmes options.
+    """
+    results: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    async def consume() -> None:
+        agen = agrade_batch(items, **options)
+        try:
+            async for entry in agen:
+                results.put(entry)
+                if stop.is_set():
+                    break
+        finally:
+            await agen.aclose()
+
+    def worker() -> None:
+        try:
+            asyncio.run(consume())
+        except BaseException as e:
+            results.put(e)
+        else:
+            results.put(_DONE)
+
+    # Contexte de l'appelant (llm_priority, count_api_calls) repris dans le thread.
+    ctx = contextvars.copy_context()
+    thread = threading.Thread(target=ctx.run, args=(worker,), name="grade-batch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = results.get()
+            if entry is _DONE:
+                break
+            if isinstance(entry, BaseException):
+                raise entry
+            yield entry
+    finally:
+        stop.set()
@@ -0,0 +1,579 @@
+"""
+🗂️ Mode Batch API — re-corrections hors ligne en deux phases
+==============================================================
+Les re-corrections du golden, les comparaisons de juges et la génération
+d'étudiants virtuels ne sont pas sensibles à la latence mais butent sur
+les limites de débit. L'API Batch d'OpenAI traite des fichiers JSON Lines
+de requêtes en différé (fenêtre de 24 h), hors quotas temps réel et à
+moitié prix.
+
+Les enchaînements d'appels du pipeline (NER, Juge, feedback) sont des
+générateurs de requêtes (cf. llm_clients) ; ce module les rejoue avec un
+troisième pilote qui, au lieu d'appeler l'API, cherche la réponse dans un
+magasin local :
+
+  Phase 1 — prepare : chaque copie est rejouée jusqu'à la première requête
+            sans réponse connue ; ces requêtes (dédupliquées, toutes copies
+            confondues) sont écrites dans un fichier batch JSONL.
+  Phase 2 — ingest  : le fichier de sortie du batch est versé au magasin ;
+            un nouveau prepare reprend chaque copie là où elle s'était
+            arrêtée et termine localement les étapes déterministes
+            (recherche hybride, assemblage, scoring V3).
+
+Une erreur transitoire du batch (429, 5xx, batch expiré) renvoie la requête
+au tour suivant (BATCH_MAX_ATTEMPTS tentatives, 3 par défaut) ; une copie
+dont le NER ou le Juge échoue définitivement n'est pas écrite dans
+reports.jsonl et sera reprise par un prochain prepare.
+
+Une copie demande autant de tours que d'appels dépendants : NER, puis
+Juge (toutes les entités dans le même tour), puis la chaîne de feedback
+(un tour par re-tentative / validation). `BatchGradingRun.run()` enchaîne
+les tours jusqu'à ce qu'il ne reste rien à demander.
+
+Les embeddings des requêtes (Brique 3) restent synchrones : un appel par
+copie, déjà mutualisé et mis en cache.
+
+Répertoire de travail :
+    <workdir>/round_01/requests_000.jsonl   requêtes d'un tour (≤ 50 000 lignes)
+    <workdir>/round_01/output_000.jsonl     sortie du batch correspondant
+    <workdir>/responses.jsonl               magasin des réponses ingérées
+    <workdir>/reports.jsonl                 rapports terminés (format checkpoint
+                                            de batch_grading)
+
+Test sans réseau : batch_standin.LocalBatchServer imite les endpoints
+files / batches d'OpenAI en local.
+
+Usage :
+    python batch_mode.py prepare items.jsonl workdir/
+    python batch_mode.py ingest  workdir/ output.jsonl [errors.jsonl]
+    python batch_mode.py run     items.jsonl workdir/ [--no-feedback]
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from openai import OpenAI, omit
+from openai.lib._parsing._completions import parse_chat_completion, type_to_response_format_param
+from openai.types.chat import ChatCompletion
+
+from batch_grading import GradingItem, _append_checkpoint, _load_checkpoint, report_from_dict
+from candidate_report import (
+    CandidateReport,
+    _assemble_and_score,
+    _fix_negation,
+    _get_engine,
+    _new_report,
+    _resolve_golden,
+)
+from hybrid_search import HybridSearchEngine
+from llm_clients import ChatRequest, LLMSteps, load_openai_api_key
+from local_cache import content_hash
+from ner_extractor import _extraction_steps
+from neurosymbolic_judge import _resolution_steps
+from pedagogical_feedback import _feedback_steps
+
+logger = logging.getLogger(__name__)
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+# Limite de l'API Batch : 50 000 requêtes par fichier.
+MAX_REQUESTS_PER_FILE = 50_000
+# Tentatives par requête pour une erreur transitoire (429, 5xx, batch expiré…)
+# avant de la figer comme échec définitif.
+MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+# Codes d'erreur de l'API Batch sans rapport avec le contenu de la requête.
+RETRYABLE_ERROR_CODES = frozenset({
+    "batch_expired", "batch_cancelled", "rate_limit_exceeded", "server_error", "timeout",
+})
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Requêtes batch ↔ ChatRequest
+# ──────────────────────────────────────────────────────────────────────────────
+
+def request_body(request: ChatRequest) -> Dict[str, Any]:
+    """Corps JSON de la requête (response_format Pydantic → json_schema)."""
+    body = dict(request.params)
+    if request.response_format is not None:
+        body["response_format"] = type_to_response_format_param(request.response_format)
+    return body
+
+
+def request_custom_id(request: ChatRequest) -> str:
+    """custom_id = hash du corps : une même requête n'est demandée qu'une fois."""
+    return content_hash(json.dumps(request_body(request), sort_keys=True, ensure_ascii=False))
+
+
+def request_line(request: ChatRequest) -> Dict[str, Any]:
+    """Ligne du fichier d'entrée de l'API Batch."""
+    return {
+        "custom_id": request_custom_id(request),
+        "method": "POST",
+        "url": CHAT_ENDPOINT,
+        "body": request_body(request),
+    }
+
+
+class BatchRequestError(RuntimeError):
+    """Requête en échec dans le batch (renvoyée dans l'enchaînement)."""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Magasin des réponses ingérées
+# ──────────────────────────────────────────────────────────────────────────────
+
+class BatchResponseStore:
+    """
+    custom_id → corps de réponse (ou erreur définitive), persisté en JSON Lines.
+
+    Une erreur transitoire (429, 5xx, batch expiré ou annulé) n'est pas une
+    réponse : la requête reste inconnue et repart au tour suivant, au plus
+    `max_attempts` fois. Seules les erreurs définitives (requête invalide,
+    tentatives épuisées) sont renvoyées dans l'enchaînement.
+    """
+
+    def __init__(self, path: Union[str, Path], max_attempts: int = MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._failures: Dict[str, int] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._add(record)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, custom_id: str) -> bool:
+        return custom_id in self._records
+
+    def _add(self, record: Dict[str, Any]) -> None:
+        """Applique une ligne du magasin (réponse, erreur transitoire ou définitive)."""
+        custom_id = record["custom_id"]
+        if "body" in record:
+            self._records[custom_id] = record
+            return
+        if "body" in self._records.get(custom_id, {}):
+            return  # une réponse obtenue n'est jamais remplacée par une erreur
+        self._failures[custom_id] = self._failures.get(custom_id, 0) + 1
+        if record.get("retryable") and self._failures[custom_id] < self.max_attempts:
+            return
+        self._records[custom_id] = record
+
+    def ingest(self, output_path: Union[str, Path]) -> int:
+        """Verse un fichier de sortie (ou d'erreurs) de l'API Batch au magasin."""
+        added = []
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                out = json.loads(line)
+                response = out.get("response") or {}
+                status = response.get("status_code")
+                if status == 200:
+                    record = {"custom_id": out["custom_id"], "body": response["body"]}
+                else:
+                    error = out.get("error") or (response.get("body") or {}).get("error") or {}
+                    record = {
+                        "custom_id": out["custom_id"],
+                        "error": error.get("message") or f"HTTP {status}",
+                        "retryable": (
+                            (status is not None and (status == 429 or status >= 500))
+                            or error.get("code") in RETRYABLE_ERROR_CODES
+                        ),
+                    }
+                self._add(record)
+                added.append(record)
+        if added:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in added:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(added)
+
+    def response(self, request: ChatRequest):
+        """
+        Réponse (même type que l'appel direct) ou None si inconnue (ou en
+        échec transitoire, à redemander).
+
+        Raises:
+            BatchRequestError: si la requête a définitivement échoué dans le batch.
+        """
+        record = self._records.get(request_custom_id(request))
+        if record is None:
+            return None
+        if "error" in record:
+            raise BatchRequestError(record["error"])
+        completion = ChatCompletion.model_validate(record["body"])
+        if request.response_format is None:
+            return completion
+        return parse_chat_completion(
+            response_format=request.response_format,
+            input_tools=omit,
+            chat_completion=completion,
+        )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pilote « rejeu » : réponses du magasin, requêtes manquantes collectées
+# ──────────────────────────────────────────────────────────────────────────────
+
+PENDING = object()
+
+
+def replay_steps(
+    steps: LLMSteps,
+    store: BatchResponseStore,
+    pending: Dict[str, Dict[str, Any]],
+):
+    """
+    Exécute un enchaînement avec les réponses du magasin. S'arrête à la
+    première requête sans réponse (ajoutée à `pending`) et renvoie PENDING.
+    """
+    try:
+        request = next(steps)
+        while True:
+            try:
+                if isinstance(request, ChatRequest):
+                    response = store.response(request)
+                    if response is None:
+                        line = request_line(request)
+                        pending[line["custom_id"]] = line
+                        steps.close()
+                        return PENDING
+                else:
+                    response = request.send(None)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Correction en tours
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class PrepareResult:
+    """Bilan d'un tour de préparation."""
+    round: int
+    n_done: int                   # copies terminées (cumul, reports.jsonl)
+    n_waiting: int                # copies en attente d'une réponse
+    n_requests: int               # requêtes à soumettre pour ce tour
+    n_failed: int = 0             # copies en échec définitif (non checkpointées)
+    request_files: List[Path] = field(default_factory=list)
+
+
+class BatchGradingRun:
+    """
+    Correction d'un lot via l'API Batch (cf. docstring du module).
+
+    Usage:
+        run = BatchGradingRun("workdir/", with_feedback=False)
+        result = run.prepare(items)        # → result.request_files à soumettre
+        run.ingest(["output.jsonl"])       # sortie du batch
+        result = run.prepare(items)        # tour suivant (ou fini si n_requests == 0)
+        reports = run.reports()
+    """
+
+    def __init__(
+        self,
+        workdir: Union[str, Path],
+        moteur: Optional[HybridSearchEngine] = None,
+        with_feedback: bool = True,
+    ):
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.moteur = moteur
+        self.with_feedback = with_feedback
+        self.store = BatchResponseStore(self.workdir / "responses.jsonl")
+        self.reports_path = self.workdir / "reports.jsonl"
+
+    # ------------------------------------------------------------------
+    # Phase 1
+    # ------------------------------------------------------------------
+
+    def _next_round(self) -> int:
+        rounds = [int(p.name.split("_")[1]) for p in self.workdir.glob("round_*")]
+        return max(rounds, default=0) + 1
+
+    def prepare(self, items: Iterable[GradingItem]) -> PrepareResult:
+        """Rejoue chaque copie non terminée ; écrit les requêtes manquantes."""
+        done = _load_checkpoint(self.reports_path)
+        engine = self.moteur or _get_engine()
+        pending: Dict[str, Dict[str, Any]] = {}
+        n_waiting = n_failed = 0
+        for item in items:
+            record = done.get(item.item_id)
+            if record is not None and record.get("job_key") == item.job_key():
+                continue
+            try:
+                report = self._grade(item, engine, pending)
+            except BatchRequestError as e:
+                # Erreur du batch, pas de la copie : on ne la fige pas comme terminée.
+                n_failed += 1
+                logger.warning(f"⚠️  Batch : copie {item.item_id} non corrigée ({e})")
+                continue
+            if report is None:
+                n_waiting += 1
+                continue
+            _append_checkpoint(self.reports_path, item, report)
+            done[item.item_id] = {"job_key": item.job_key()}
+
+        result = PrepareResult(
+            round=self._next_round() if pending else self._next_round() - 1,
+            n_done=len(done),
+            n_waiting=n_waiting,
+            n_requests=len(pending),
+            n_failed=n_failed,
+        )
+        if pending:
+            round_dir = self.workdir / f"round_{result.round:02d}"
+            round_dir.mkdir(parents=True, exist_ok=True)
+            lines = list(pending.values())
+            for n, start in enumerate(range(0, len(lines), MAX_REQUESTS_PER_FILE)):
+                path = round_dir / f"requests_{n:03d}.jsonl"
+                with open(path, "w", encoding="utf-8") as f:
+                    for line in lines[start:start + MAX_REQUESTS_PER_FILE]:
+                        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                result.request_files.append(path)
+        logger.info(
+            f"🗂️  Batch tour {result.round} : {result.n_done} copies terminées, "
+            f"{n_waiting} en attente, {n_failed} en échec, {len(pending)} requêtes à soumettre"
+        )
+        return result
+
+    def _grade(
+        self,
+        item: GradingItem,
+        engine: HybridSearchEngine,
+        pending: Dict[str, Dict[str, Any]],
+    ) -> Optional[CandidateReport]:
+        """
+        Même déroulé que generate_candidate_report ; None si une réponse manque.
+
+        Raises:
+            BatchRequestError: si une requête NER / Juge a définitivement échoué.
+        """
+        golden_names, golden_ids, golden_roles = _resolve_golden(
+            list(item.golden_names), list(item.golden_ids), list(item.golden_roles)
+        )
+        report = _new_report(
+            item.texte_etudiant, item.diagnostic_principal, item.commentaire_correcteur
+        )
+        if report.erreur:
+            return report
+
+        t0 = time.time()
+        try:
+            extraction = replay_steps(_extraction_steps(item.texte_etudiant), self.store, pending)
+            if extraction is PENDING:
+                return None
+
+            entites = [_fix_negation(e) for e in extraction.entites]
+            candidats_par_entite = engine.search_top_k_many([e.terme_brut for e in entites])
+
+            # Toutes les entités dans le même tour.
+            resolutions = [
+                replay_steps(
+                    _resolution_steps(e.terme_brut, e.contexte_phrase, candidats),
+                    self.store, pending,
+                )
+                for e, candidats in zip(entites, candidats_par_entite)
+            ]
+            if any(r is PENDING for r in resolutions):
+                return None
+
+            _assemble_and_score(
+                report, item.texte_etudiant, entites, resolutions,
+                golden_ids, golden_names, golden_roles,
+            )
+
+            if self.with_feedback:
+                try:
+                    feedback = replay_steps(_feedback_steps(report), self.store, pending)
+                    if feedback is PENDING:
+                        return None
+                    report.feedback_pedagogique = feedback
+                except Exception as fb_err:
+                    logger.warning(f"Feedback pédagogique indisponible : {fb_err}")
+
+        except BatchRequestError:
+            raise
+        except Exception as e:
+            report.erreur = str(e)[:200]
+
+        report.latence_s = round(time.time() - t0, 2)
+        return report
+
+    # ------------------------------------------------------------------
+    # Phase 2
+    # ------------------------------------------------------------------
+
+    def ingest(self, output_files: Iterable[Union[str, Path]]) -> int:
+        """Verse les sorties (et fichiers d'erreurs) du batch au magasin."""
+        return sum(self.store.ingest(p) for p in output_files)
+
+    def reports(self) -> Dict[str, CandidateReport]:
+        """item_id → CandidateReport des copies terminées."""
+        return {
+            item_id: report_from_dict(record["report"])
+            for item_id, record in _load_checkpoint(self.reports_path).items()
+        }
+
+    # ------------------------------------------------------------------
+    # Boucle complète
+    # ------------------------------------------------------------------
+
+    def run(
+        self,
+        items: Iterable[GradingItem],
+        backend: "OpenAIBatchBackend",
+        max_rounds: int = 12,
+    ) -> Dict[str, CandidateReport]:
+        """prepare → soumission → attente → ingest, jusqu'à épuisement des requêtes."""
+        items = list(items)
+        for _ in range(max_rounds):
+            result = self.prepare(items)
+            if not result.n_requests:
+                break
+            outputs: List[Path] = []
+            for request_file in result.request_files:
+                batch_id = backend.submit(request_file)
+                outputs.extend(backend.wait(batch_id, request_file.parent))
+            self.ingest(outputs)
+        else:
+            logger.warning(f"⚠️  Batch : {max_rounds} tours atteints, copies restantes en attente")
+        return self.reports()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Soumission (API Batch OpenAI ou serveur compatible)
+# ──────────────────────────────────────────────────────────────────────────────
+
+class OpenAIBatchBackend:
+    """
+    Soumet un fichier de requêtes à l'API Batch et récupère ses sorties.
+    `client_factory` peut viser batch_standin.LocalBatchServer (tests).
+    """
+
+    TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[], OpenAI]] = None,
+        completion_window: str = "24h",
+        poll_s: float = 60.0,
+    ):
+        self._client_factory = client_factory or (
+            lambda: OpenAI(api_key=load_openai_api_key())
+        )
+        self.completion_window = completion_window
+        self.poll_s = poll_s
+
+    def submit(self, request_file: Path) -> str:
+        client = self._client_factory()
+        with open(request_file, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=CHAT_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"source": "edu-ecg", "file": request_file.name},
+        )
+        logger.info(f"📤 Batch {batch.id} soumis ({request_file.name})")
+        return batch.id
+
+    def wait(self, batch_id: str, dest_dir: Path) -> List[Path]:
+        """Attend la fin du batch ; télécharge sortie et erreurs dans dest_dir."""
+        client = self._client_factory()
+        batch = client.batches.retrieve(batch_id)
+        while batch.status not in self.TERMINAL:
+            time.sleep(self.poll_s)
+            batch = client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            logger.warning(f"⚠️  Batch {batch_id} terminé en statut {batch.status}")
+
+        paths = []
+        for kind, file_id in (("output", batch.output_file_id), ("errors", batch.error_file_id)):
+            if not file_id:
+                continue
+            path = dest_dir / f"{kind}_{batch_id}.jsonl"
+            path.write_text(client.files.content(file_id).text, encoding="utf-8")
+            paths.append(path)
+        return paths
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────────────────────────────
+
+def load_items(path: Union[str, Path]) -> List[GradingItem]:
+    """Copies d'un fichier JSON Lines (un GradingItem par ligne)."""
+    names = {f.name for f in fields(GradingItem)}
+    with open(path, "r", encoding="utf-8") as f:
+        return [
+            GradingItem(**{k: v for k, v in json.loads(line).items() if k in names})
+            for line in f if line.strip()
+        ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Correction via l'API Batch (deux phases)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("prepare", help="phase 1 : écrit les requêtes du prochain tour")
+    p.add_argument("items", type=Path)
+    p.add_argument("workdir", type=Path)
+    p.add_argument("--no-feedback", action="store_true")
+    p = sub.add_parser("ingest", help="phase 2 : verse une sortie de batch au magasin")
+    p.add_argument("workdir", type=Path)
+    p.add_argument("outputs", type=Path, nargs="+")
+    p = sub.add_parser("run", help="tours prepare → batch → ingest jusqu'au bout")
+    p.add_argument("items", type=Path)
+    p.add_argument("workdir", type=Path)
+    p.add_argument("--no-feedback", action="store_true")
+    p.add_argument("--poll", type=float, default=60.0, help="intervalle de suivi (s)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "ingest":
+        n = BatchGradingRun(args.workdir).ingest(args.outputs)
+        print(f"✓ {n} réponses ingérées")
+        return 0
+
+    run = BatchGradingRun(args.workdir, with_feedback=not args.no_feedback)
+    items = load_items(args.items)
+    if args.cmd == "prepare":
+        result = run.prepare(items)
+        print(f"Tour {result.round} : {result.n_done} terminées, {result.n_waiting} en attente")
+        for path in result.request_files:
+            print(f"  → {path}")
+        return 0
+
+    reports = run.run(items, OpenAIBatchBackend(poll_s=args.poll))
+    print(f"✓ {len(reports)}/{len(items)} copies terminées → {run.reports_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding="utf-8")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main())
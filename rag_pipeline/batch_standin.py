@@ -0,0 +1,222 @@
+"""
+🧪 Serveur local imitant l'API Batch d'OpenAI
+==============================================
+Remplaçant local (sans réseau) des endpoints utilisés par le mode batch
+(cf. batch_mode) :
+
+    POST /v1/files                  dépôt d'un fichier de requêtes (multipart)
+    GET  /v1/files/{id}/content     téléchargement (sortie / erreurs)
+    POST /v1/batches                création d'un batch
+    GET  /v1/batches/{id}           suivi du batch
+    POST /v1/chat/completions       appel direct (workers de feedback_jobs)
+
+Chaque ligne du fichier d'entrée est passée à un `responder(body) → dict`
+qui renvoie le corps d'une réponse chat completions : fonction factice en
+test, ou `forwarding_responder(client_factory)` pour relayer vers un
+serveur compatible OpenAI local (Ollama, vLLM, LM Studio...). Le batch est
+traité dans un thread : le client observe in_progress puis completed,
+comme avec l'API réelle.
+
+Usage :
+    with LocalBatchServer(responder) as server:
+        client = OpenAI(base_url=server.base_url, api_key="local")
+        backend = OpenAIBatchBackend(lambda: client, poll_s=0.05)
+        reports = BatchGradingRun("workdir/").run(items, backend)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import email.parser
+import email.policy
+import itertools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def forwarding_responder(client_factory: Callable[[], OpenAI]) -> Responder:
+    """Responder qui exécute chaque requête sur un endpoint compatible OpenAI."""
+    def respond(body: Dict[str, Any]) -> Dict[str, Any]:
+        return client_factory().chat.completions.create(**body).model_dump()
+    return respond
+
+
+class LocalBatchServer:
+    """Serveur HTTP local (thread) implémentant files + batches."""
+
+    def __init__(self, responder: Responder, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "LocalBatchServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="batch-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # ------------------------------------------------------------------
+    # Objets files / batches
+    # ------------------------------------------------------------------
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}-local{next(self._ids):05d}"
+
+    def _add_file(self, filename: str, content: bytes, purpose: str) -> Dict[str, Any]:
+        meta = {
+            "id": self._new_id("file"), "object": "file", "bytes": len(content),
+            "created_at": int(time.time()), "filename": filename,
+            "purpose": purpose, "status": "processed",
+        }
+        with self._lock:
+            self.files[meta["id"]] = {"meta": meta, "content": content}
+        return meta
+
+    def _create_batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        batch = {
+            "id": self._new_id("batch"), "object": "batch",
+            "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"],
+            "completion_window": params.get("completion_window", "24h"),
+            "metadata": params.get("metadata"),
+            "status": "in_progress", "created_at": int(time.time()),
+            "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._process, args=(batch,), daemon=True).start()
+        return dict(batch)
+
+    def _process(self, batch: Dict[str, Any]) -> None:
+        content = self.files[batch["input_file_id"]]["content"].decode("utf-8")
+        outputs, errors = [], []
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                body = self.responder(request["body"])
+            except Exception as e:
+                # Même forme que l'API : échec HTTP de la requête, réessayable.
+                errors.append({
+                    "id": self._new_id("batch_req"), "custom_id": request["custom_id"],
+                    "response": {"status_code": 500, "request_id": "", "body": {
+                        "error": {"type": "server_error", "message": str(e)},
+                    }},
+                    "error": None,
+                })
+            else:
+                outputs.append({
+                    "id": self._new_id("batch_req"), "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "request_id": "", "body": body},
+                    "error": None,
+                })
+
+        def dump(records) -> bytes:
+            return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+        update = {
+            "status": "completed", "completed_at": int(time.time()),
+            "request_counts": {"total": len(outputs) + len(errors),
+                               "completed": len(outputs), "failed": len(errors)},
+        }
+        if outputs:
+            update["output_file_id"] = self._add_file(
+                f"{batch['id']}_output.jsonl", dump(outputs), "batch_output")["id"]
+        if errors:
+            update["error_file_id"] = self._add_file(
+                f"{batch['id']}_errors.jsonl", dump(errors), "batch_output")["id"]
+        with self._lock:
+            batch.update(update)
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logger.debug(fmt % args)
+
+            def _send(self, status: int, payload, raw: bool = False) -> None:
+                data = payload if raw else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header(
+                    "Content-Type", "application/octet-stream" if raw else "application/json"
+                )
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                if self.path == "/v1/files":
+                    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                        b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n"
+                        + self._body()
+                    )
+                    parts = {
+                        p.get_param("name", header="content-disposition"): p
+                        for p in message.iter_parts()
+                    }
+                    upload = parts["file"]
+                    meta = server._add_file(
+                        upload.get_filename() or "upload.jsonl",
+                        upload.get_payload(decode=True),
+                        parts["purpose"].get_content().strip(),
+                    )
+                    return self._send(200, meta)
+                if self.path == "/v1/batches":
+                    return self._send(200, server._create_batch(json.loads(self._body())))
+                if self.path == "/v1/chat/completions":
+                    try:
+                        return self._send(200, server.responder(json.loads(self._body())))
+                    except Exception as e:
+                        return self._send(500, {"error": {"message": str(e)}})
+                self._send(404, {"error": {"message": f"unknown route {self.path}"}})
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    with server._lock:
+                        batch = server.batches.get(parts[2])
+                        if batch is not None:
+                            return self._send(200, dict(batch))
+                if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+                    stored = server.files.get(parts[2])
+                    if stored is not None:
+                        return self._send(200, stored["content"], raw=True)
+                self._send(404, {"error": {"message": f"not found: {self.path}"}})
+
+        return Handler
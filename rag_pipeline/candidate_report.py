@@ -18,22 +18,42 @@ Utilisation :
     )
     print(format_report_text(report))
 
+    # asyncio (serveur multi-étudiants) : même rapport, AsyncOpenAI partagé
+    report = await agenerate_candidate_report(...)
+
+    # En flux (UI) : la note s'affiche avant la chaîne de feedback
+    for event in iter_candidate_report(...):      # async : aiter_candidate_report
+        if event.etape == "score":
+            afficher_note(event.report)
+
 Auteur : BMad Team
 Date   : 2026-04-06  (V3 — scoring ontologique)
 """
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import logging
+import os
 import re
 import time
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set, Tuple
+from typing import AsyncIterator, Dict, Generator, Iterator, List, Optional, Set, Tuple, Union
 
-from ner_extractor import extract_clinical_terms, ClinicalEntity
+from ner_extractor import aextract_clinical_terms, extract_clinical_terms, ClinicalEntity
 from hybrid_search import HybridSearchEngine
-from neurosymbolic_judge import resolve_term_to_ontology
+from llm_clients import (
+    ChatRequest,
+    StepsResult,
+    aiter_steps,
+    get_async_client,
+    get_client,
+    iter_steps,
+)
+from neurosymbolic_judge import aresolve_term_to_ontology, resolve_term_to_ontology
 from ontology_index import normalize_text
 from scoring_v3 import (
     score_student_response_v3,
@@ -42,10 +62,11 @@ from scoring_v3 import (
     build_negation_map,
 )
 from semantic_layer import get_concept, normalize_key, _get_ontology_v2
+from ontology_graph import get_ontology_graph, iter_bits
 from pattern_inference import PatternInferencer
 import scoring_thresholds
 from pedagogical_feedback import (
-    generate_pedagogical_feedback,
+    _feedback_steps,
     format_feedback_html,
     PedagogicalFeedback,
 )
@@ -265,20 +286,42 @@ def _is_synonym_specific_enough(forme_norm: str) -> bool:
     return min(df.get(m, 999) for m in mots) <= _BACKSTOP_MAX_WORD_DF
 
 
-def _descendants_of(ontology_id: str, _seen: Optional[set] = None) -> Set[str]:
-    """Retourne {id} ∪ tous ses descendants (children récursifs) dans l'onto V2."""
-    if _seen is None:
-        _seen = set()
-    key = normalize_key(ontology_id)
-    if key in _seen:
-        return set()
-    _seen.add(key)
-    out = {ontology_id}
-    c = get_concept(key)
-    if c:
-        for child in c.get("children", []):
-            out |= _descendants_of(child, _seen)
-    return out
+# Rejeter une occurrence précédée immédiatement d'un marqueur de négation
+# (mêmes marqueurs que _fix_negation, sur texte normalisé : accents retirés,
+# apostrophe droite ou courbe).
+_BACKSTOP_NEG_PREFIX = (
+    r"(?:pas\s+(?:de\s+|d['']?\s*)|sans\s+"
+    r"|absence\s+(?:de\s+|d['']?\s*)|aucun(?:e)?\s+|ni\s+"
+    r"|elimine\s+|n['']?\s*(?:est|a)\s+pas\s+(?:de\s+|d['']?\s*)?)"
+)
+
+# ontology_id normalisé → [(forme, forme normalisée, motif littéral, motif
+# nié)] des formes assez spécifiques pour le rattrapage (calculé une fois
+# par concept).
+_BackstopForm = Tuple[str, str, "re.Pattern", "re.Pattern"]
+_backstop_forms_cache: Dict[str, List[_BackstopForm]] = {}
+
+
+def _backstop_forms(cid_norm: str) -> List[_BackstopForm]:
+    """Formes candidates (nom canonique + synonymes) éligibles au rattrapage."""
+    forms = _backstop_forms_cache.get(cid_norm)
+    if forms is None:
+        c = get_concept(cid_norm) or {}
+        forms = []
+        for forme in [c.get("concept_name", "")] + list(c.get("synonymes", [])):
+            forme_norm = normalize_text(forme)
+            if not _is_synonym_specific_enough(forme_norm):
+                continue  # aucun mot assez rare → risque de faux positif
+            escaped = re.escape(forme_norm)
+            forms.append((
+                forme,
+                forme_norm,
+                # Correspondance littérale sur une frontière de mot.
+                re.compile(rf"(?<![\w]){escaped}(?![\w])"),
+                re.compile(_BACKSTOP_NEG_PREFIX + escaped),
+            ))
+        _backstop_forms_cache[cid_norm] = forms
+    return forms
 
 
 def _lexical_backstop_ids(
@@ -302,45 +345,30 @@ def _lexical_backstop_ids(
     if not texte_norm:
         return []
 
-    already_norm = {normalize_key(x) for x in already_found}
+    g = get_ontology_graph()
+    already = g.key_mask(already_found)
 
     # Cibles = golden + tous leurs descendants (un enfant plus spécifique crédite
-    # le parent golden via la règle 1b du scoring V3).
-    cibles: Set[str] = set()
+    # le parent golden via la règle 1b du scoring V3), en masque de bits.
+    cibles = 0
+    golden_by_index: Dict[int, str] = {}
     for gid in golden_ids:
-        cibles |= _descendants_of(gid)
+        ngid = normalize_key(gid)
+        cibles |= g.subtree(ngid)
+        if ngid in g.index:
+            golden_by_index.setdefault(g.index[ngid], gid)
 
     rescued: List[Tuple[str, str]] = []
-    seen_ids: Set[str] = set()
-
-    for cid in cibles:
-        cid_norm = normalize_key(cid)
-        if cid_norm in already_norm or cid_norm in seen_ids:
-            continue
-        c = get_concept(cid_norm)
-        if not c:
-            continue
-        # Formes candidates : nom canonique + synonymes.
-        formes = [c.get("concept_name", "")] + list(c.get("synonymes", []))
-        for forme in formes:
-            forme_norm = normalize_text(forme)
-            if not _is_synonym_specific_enough(forme_norm):
-                continue  # aucun mot assez rare → risque de faux positif
-            # Correspondance littérale sur une frontière de mot.
-            if not re.search(rf"(?<![\w]){re.escape(forme_norm)}(?![\w])", texte_norm):
+    for i in iter_bits(cibles & ~already):
+        cid_norm = g.ids[i]
+        for forme, forme_norm, literal, negated in _backstop_forms(cid_norm):
+            # Pré-filtre : sous-chaîne absente → aucune occurrence possible
+            if forme_norm not in texte_norm or not literal.search(texte_norm):
                 continue
-            # Rejeter si un marqueur de négation précède immédiatement
-            # l'occurrence (mêmes marqueurs que _fix_negation, sur texte
-            # normalisé : accents retirés, apostrophe droite ou courbe).
-            neg_prefix = (
-                r"(?:pas\s+(?:de\s+|d['']?\s*)|sans\s+"
-                r"|absence\s+(?:de\s+|d['']?\s*)|aucun(?:e)?\s+|ni\s+"
-                r"|elimine\s+|n['']?\s*(?:est|a)\s+pas\s+(?:de\s+|d['']?\s*)?)"
-            )
-            if re.search(neg_prefix + re.escape(forme_norm), texte_norm):
+            if negated.search(texte_norm):
                 continue
+            cid = golden_by_index.get(i, cid_norm)
             rescued.append((cid, forme))
-            seen_ids.add(cid_norm)
             logger.info(
                 f"🛟 Backstop lexical : '{forme}' trouvé littéralement → "
                 f"rattrapage de {cid} (raté par le NER)"
@@ -429,6 +457,7 @@ class CandidateReport:
 
     # Section 5 : Feedback pédagogique (cours SFC)
     feedback_pedagogique: Optional[PedagogicalFeedback] = None
+    feedback_job_id: Optional[str] = None   # with_feedback="deferred" (cf. feedback_jobs)
 
     # Statistiques méthodes
     n_coupe_circuit: int = 0
@@ -437,6 +466,33 @@ class CandidateReport:
     n_no_candidates: int = 0
 
 
+@dataclass
+class ReportEvent:
+    """
+    Étape franchie par iter_candidate_report / aiter_candidate_report.
+
+    `etape` :
+      "ner"             entités extraites et candidats recherchés (`entites`)
+      "concept"         une entité résolue par le Juge (`concept`, `index`
+                        dans l'ordre des entités)
+      "score"           partie déterministe terminée : note V3, validants,
+                        descripteurs et découvertes sont dans `report`
+      "feedback_etape"  un appel de la chaîne de feedback part (`detail` :
+                        redaction, validation_clinique, reecriture_ciblee)
+      "feedback"        feedback pédagogique prêt (`report.feedback_pedagogique`)
+      "rapport"         rapport final (toujours émis, en dernier)
+
+    `report` est le rapport en cours de construction : le même objet à
+    chaque événement, complété au fil des étapes.
+    """
+    etape: str
+    report: CandidateReport
+    entites: List[ClinicalEntity] = field(default_factory=list)
+    concept: Optional[ExtractedConcept] = None
+    index: int = -1
+    detail: str = ""
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Moteur de recherche (singleton module-level)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -451,6 +507,48 @@ def _get_engine() -> HybridSearchEngine:
     return _engine
 
 
+# Résolutions (Brique 4) menées en parallèle pour une même copie : chaque
+# entité ambiguë coûte un aller-retour Juge LLM, indépendant des autres.
+RESOLVE_WORKERS = int(os.getenv("REPORT_RESOLVE_WORKERS", "8"))
+
+
+def _iter_resolutions(
+    entites: List[ClinicalEntity],
+    candidats_par_entite: List[List[Dict]],
+) -> Iterator[Dict]:
+    """
+    resolve_term_to_ontology pour chaque entité, en parallèle (threads).
+
+    Les résolutions sont produites dans l'ordre des entités, chacune dès
+    qu'elle (et celles qui la précèdent) est disponible : l'assemblage
+    du rapport qui suit reste séquentiel, donc identique à l'exécution
+    série (ordre de concepts_extraits, « dernier écrit gagne » dans
+    student_matched_ids).
+
+    Chaque résolution s'exécute dans une copie du contexte de l'appelant :
+    priorité d'ordonnancement (llm_priority) et compteur d'appels
+    (count_api_calls) suivent les threads du pool.
+    """
+    jobs = list(zip(entites, candidats_par_entite))
+
+    def resolve(job: Tuple[ClinicalEntity, List[Dict]]) -> Dict:
+        entite, candidats = job
+        return resolve_term_to_ontology(
+            entite.terme_brut, entite.contexte_phrase, candidats
+        )
+
+    workers = min(RESOLVE_WORKERS, len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            yield resolve(job)
+        return
+    # Les threads du pool n'héritent pas des contextvars : une copie par job
+    # (un Context ne peut être exécuté que par un thread à la fois).
+    contexts = [contextvars.copy_context() for _ in jobs]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolve") as pool:
+        yield from pool.map(lambda ctx, job: ctx.run(resolve, job), contexts, jobs)
+
+
 _inferencer: Optional[PatternInferencer] = None
 
 
@@ -548,7 +646,7 @@ def generate_candidate_report(
     golden_roles: List[str] = None,
     diagnostic_principal: str = "",
     moteur: Optional[HybridSearchEngine] = None,
-    with_feedback: bool = True,
+    with_feedback: Union[bool, str] = True,
     commentaire_correcteur: str = "",
 ) -> CandidateReport:
     """
@@ -564,33 +662,86 @@ def generate_candidate_report(
         moteur:               HybridSearchEngine pré-initialisé (optionnel).
         with_feedback:        Si True (défaut), génère le feedback pédagogique GPT.
                               Mettre à False pour les benchmarks/tests rapides.
+                              "deferred" : rapport rendu sans attendre le feedback,
+                              confié à la file de feedback_jobs (id dans
+                              report.feedback_job_id).
         commentaire_correcteur: Commentaire libre du correcteur humain.
 
     Returns:
         CandidateReport complet.
     """
-    golden_ids = golden_ids or []
-    golden_names = golden_names or []
-    golden_roles = golden_roles or ["validant"] * len(golden_ids)
+    for event in iter_candidate_report(
+        texte_etudiant, golden_names, golden_ids, golden_roles,
+        diagnostic_principal, moteur, with_feedback, commentaire_correcteur,
+    ):
+        pass
+    return event.report
 
-    # Résoudre les noms depuis l'ontologie V2 si non fournis
-    if golden_ids and not golden_names:
-        for gid in golden_ids:
-            c = get_concept(normalize_key(gid))
-            golden_names.append(c.get("concept_name", gid) if c else gid)
 
-    engine = moteur or _get_engine()
+async def agenerate_candidate_report(
+    texte_etudiant: str,
+    golden_names: List[str] = None,
+    golden_ids: List[str] = None,
+    golden_roles: List[str] = None,
+    diagnostic_principal: str = "",
+    moteur: Optional[HybridSearchEngine] = None,
+    with_feedback: Union[bool, str] = True,
+    commentaire_correcteur: str = "",
+) -> CandidateReport:
+    """
+    Variante asyncio de generate_candidate_report, pour les serveurs qui
+    corrigent plusieurs étudiants à la fois.
+
+    NER, embeddings des requêtes, Juge et chaîne de feedback passent par un
+    AsyncOpenAI partagé (un pool HTTP par boucle, cf. llm_clients) ; les
+    résolutions d'une même copie sont concurrentes (au plus
+    RESOLVE_WORKERS à la fois). Les enchaînements d'appels et toute la
+    partie déterministe sont le même code que le chemin synchrone : pour
+    les mêmes réponses des modèles, le rapport est identique (hors
+    latence_s).
+    """
+    async for event in aiter_candidate_report(
+        texte_etudiant, golden_names, golden_ids, golden_roles,
+        diagnostic_principal, moteur, with_feedback, commentaire_correcteur,
+    ):
+        pass
+    return event.report
 
-    report = CandidateReport(
-        diagnostic_principal=diagnostic_principal,
-        texte_etudiant=texte_etudiant,
-        latence_s=0.0,
-        commentaire_correcteur=commentaire_correcteur,
+
+def iter_candidate_report(
+    texte_etudiant: str,
+    golden_names: List[str] = None,
+    golden_ids: List[str] = None,
+    golden_roles: List[str] = None,
+    diagnostic_principal: str = "",
+    moteur: Optional[HybridSearchEngine] = None,
+    with_feedback: Union[bool, str] = True,
+    commentaire_correcteur: str = "",
+) -> Iterator[ReportEvent]:
+    """
+    generate_candidate_report en flux : produit un ReportEvent à chaque
+    étape franchie (mêmes arguments).
+
+    La note V3 (événement "score") est disponible dès la fin des étapes
+    NER + Juge, avant la chaîne de feedback GPT-4o (rédaction, garde-fous,
+    validations) qui représente l'essentiel de la latence. Le dernier
+    événement ("rapport") porte le rapport final, identique à celui de
+    generate_candidate_report.
+
+    Les brouillons intermédiaires du feedback ne sont pas exposés : seul le
+    texte passé par tous les garde-fous est montré à l'étudiant ; les
+    événements "feedback_etape" permettent d'afficher la progression.
+    """
+    golden_names, golden_ids, golden_roles = _resolve_golden(
+        golden_names, golden_ids, golden_roles
     )
 
-    if not texte_etudiant or texte_etudiant.strip() in ("", "nan"):
-        report.erreur = "Texte vide"
-        return report
+    engine = moteur or _get_engine()
+
+    report = _new_report(texte_etudiant, diagnostic_principal, commentaire_correcteur)
+    if report.erreur:
+        yield ReportEvent("rapport", report)
+        return
 
     t0 = time.time()
 
@@ -603,234 +754,434 @@ def generate_candidate_report(
         # ═══════════════════════════════════════════════════════════════
         # Briques 3 + 4 : Recherche hybride + Juge neurosymbolique
         # ═══════════════════════════════════════════════════════════════
-        student_matched_ids: Dict[str, str] = {}  # id → statut
-        methods: List[str] = []
-
-        for entite in extraction.entites:
-            # Filet de sécurité : corriger la négation si le NER l'a ratée
-            entite = _fix_negation(entite)
-
-            candidats = engine.search_top_k(entite.terme_brut)
-            resolution = resolve_term_to_ontology(
-                entite.terme_brut, entite.contexte_phrase, candidats
-            )
-            matched_id = resolution["ontology_id"]
-            method = resolution["method"]
-            methods.append(method)
-
-            concept = ExtractedConcept(
-                terme_brut=entite.terme_brut,
-                statut=entite.statut,
-                ontology_id=matched_id,
-                concept_name=resolution.get("concept_name", ""),
-                method=method,
-                justification=resolution.get("justification", ""),
-                top_k_candidats=resolution.get("top_k_candidats", []),
-                llm_confiance=resolution.get("llm_confiance", -1),
+        # Filet de sécurité : corriger la négation si le NER l'a ratée
+        entites = [_fix_negation(e) for e in extraction.entites]
+        # Recherche hybride en lot : un seul appel d'embedding pour toutes
+        # les entités (au lieu d'un aller-retour API par entité).
+        candidats_par_entite = engine.search_top_k_many(
+            [e.terme_brut for e in entites]
+        )
+        yield ReportEvent("ner", report, entites=entites)
+
+        # Juge en parallèle (un aller-retour LLM au lieu de N en série),
+        # assemblage dans l'ordre des entités.
+        resolutions: List[Dict] = []
+        for i, resolution in enumerate(_iter_resolutions(entites, candidats_par_entite)):
+            resolutions.append(resolution)
+            yield ReportEvent(
+                "concept", report,
+                concept=_extracted_concept(entites[i], resolution), index=i,
             )
-            report.concepts_extraits.append(concept)
-
-            if matched_id != "NONE":
-                student_matched_ids[matched_id] = entite.statut
 
-        # Stats méthodes
-        report.n_coupe_circuit = methods.count("coupe_circuit")
-        report.n_juge_llm = methods.count("juge_llm")
-        report.n_fallback = methods.count("fallback_subterm")
-        report.n_no_candidates = methods.count("no_candidates")
+        # Briques 2.5 → 5 (déterministes) : assemblage, rattrapages, scoring
+        _assemble_and_score(
+            report, texte_etudiant, entites, resolutions,
+            golden_ids, golden_names, golden_roles,
+        )
+        yield ReportEvent("score", report)
 
         # ═══════════════════════════════════════════════════════════════
-        # Filet de sécurité LEXICAL (déterministe) : rattrapage post-NER
+        # Brique 6 : Feedback pédagogique (cours SFC, Item 231)
         # ═══════════════════════════════════════════════════════════════
-        # Le NER GPT-4o n'est pas 100 % déterministe (même à temperature=0) : un
-        # long synonyme du golden pouvait être oublié 1 run sur 8, faisant chuter
-        # la note aléatoirement. Ici on rattrape, de façon 100 % reproductible,
-        # tout concept du golden (ou descendant) écrit LITTÉRALEMENT par
-        # l'étudiant mais raté par le NER. On ne devine rien : uniquement des
-        # phrases distinctives réellement présentes et non niées.
-        for cid, forme in _lexical_backstop_ids(
-            texte_etudiant, golden_ids, set(student_matched_ids.keys())
-        ):
-            c = get_concept(normalize_key(cid))
-            report.concepts_extraits.append(ExtractedConcept(
-                terme_brut=forme,
-                statut="present",
-                ontology_id=cid,
-                concept_name=(c or {}).get("concept_name", cid),
-                method="lexical_backstop",
-                justification=(
-                    f"Rattrapage lexical déterministe : « {forme} » figure "
-                    f"littéralement dans la réponse mais n'a pas été extrait "
-                    f"par le NER (variabilité GPT-4o)."
-                ),
-                top_k_candidats=[],
-                llm_confiance=-1,
-            ))
-            student_matched_ids[cid] = "present"
+        if with_feedback == "deferred":
+            _defer_feedback(report)
+        elif with_feedback:
+            try:
+                report.feedback_pedagogique = yield from _feedback_events(
+                    report, iter_steps(_feedback_steps(report), get_client)
+                )
+            except Exception as fb_err:
+                logger.warning(f"Feedback pédagogique indisponible : {fb_err}")
+            else:
+                yield ReportEvent("feedback", report)
 
-        # ═══════════════════════════════════════════════════════════════
-        # Brique 2.5 : Inférence d'EXTRACTION des concepts-verdict
-        # ═══════════════════════════════════════════════════════════════
-        # "Trouver l'ECG normal" est du ressort de l'EXTRACTION, pas du barème
-        # (le scoring jugera si c'est correct). Moteur GÉNÉRIQUE : lit le flag
-        # déclaratif `infer_from_requires` dans l'ontologie ; conclut un verdict
-        # (ex. ECG_NORMAL) quand assez de ses `requires` sont satisfaits ET
-        # qu'aucune `excludes_families` n'est présente. Aucun ID codé en dur.
-        _found_now = [oid for oid, st in student_matched_ids.items()
-                      if st in ("present", "hypothese")]
-        _absent_now = [oid for oid, st in student_matched_ids.items()
-                       if st == "absent"]
-        for inf in _get_inferencer().infer(_found_now, _absent_now):
-            inf_id = inf["ontology_id"]
-            if inf_id in student_matched_ids:
-                continue  # déjà extrait par le NER
-            c = get_concept(normalize_key(inf_id))
-            report.concepts_extraits.append(ExtractedConcept(
-                terme_brut=f"[inféré] {inf['n_requires']}/{inf['n_total']} critères",
-                statut="present",
-                ontology_id=inf_id,
-                concept_name=(c or {}).get("concept_name", inf_id),
-                method="pattern_inference",
-                justification=(
-                    f"Verdict inféré : {inf['n_requires']}/{inf['n_total']} "
-                    f"critères requis satisfaits, aucune famille pathologique présente."
-                ),
-                top_k_candidats=[],
-                llm_confiance=-1,
-            ))
-            student_matched_ids[inf_id] = "present"
+    except Exception as e:
+        report.erreur = str(e)[:200]
 
-        # ═══════════════════════════════════════════════════════════════
-        # Brique 5 : Scoring V3 ontologique
-        # ═══════════════════════════════════════════════════════════════
-        # Séparer présents et absents
-        found_ids = [oid for oid, st in student_matched_ids.items()
-                     if st in ("present", "hypothese")]
-        absent_ids = [oid for oid, st in student_matched_ids.items()
-                      if st == "absent"]
-
-        # Seuls les validants sont scorés en V3
-        validant_ids = [gid for gid, role in zip(golden_ids, golden_roles)
-                        if role == "validant"]
-
-        v3_result: ScoringResultV3 = score_student_response_v3(
-            found_ids=found_ids,
-            expected_ids=validant_ids,
-            absent_ids=absent_ids,
-        )
+    report.latence_s = round(time.time() - t0, 2)
+    yield ReportEvent("rapport", report)
 
-        report.score_final_pct = v3_result.score_pct
-
-        # ─── Construire le détail des validants (V3) ─────────────────
-        report.nb_validants_attendus = len(validant_ids)
-        report.nb_validants_trouves = v3_result.n_exact + v3_result.n_requires + v3_result.n_qualifier + v3_result.n_support + v3_result.n_implies + v3_result.n_negation
-
-        # Index golden_id → golden_name
-        id_to_golden_name = {}
-        for gname, gid, role in zip(golden_names, golden_ids, golden_roles):
-            if role == "validant":
-                id_to_golden_name[normalize_key(gid)] = gname
-
-        for cs in v3_result.concept_scores:
-            gname = id_to_golden_name.get(cs.concept_id, cs.concept_name)
-            found = cs.match_type not in ("missed", "excluded")
-            report.validant_details.append(ValidantDetail(
-                golden_name=gname,
-                golden_id=cs.concept_id,
-                found=found,
-                score_pct=round(cs.score * 100, 1),
-                match_type=cs.match_type,
-                detail=cs.detail,
-                explication=_explain_match_type_v3(cs),
-                requires_satisfied=cs.requires_satisfied,
-                requires_missing=cs.requires_missing,
-                qualifiers_found=cs.qualifiers_found,
-                supports_found=cs.supports_found,
-                excluded_by=cs.excluded_by,
-            ))
 
-        # ─── Construire le détail des descripteurs ───────────────────
-        descripteur_ids = [gid for gid, role in zip(golden_ids, golden_roles)
-                          if role == "descripteur"]
-        found_set = {normalize_key(fid) for fid in found_ids}
-        # Ajouter les positifs issus de négations converties
-        for _, pos_id in v3_result.negation_conversions:
-            found_set.add(pos_id)
-
-        report.nb_descripteurs_attendus = len(descripteur_ids)
-        n_desc_found = 0
-        from scoring_v3 import _score_one_concept
-        for gname, gid, role in zip(golden_names, golden_ids, golden_roles):
-            if role != "descripteur":
-                continue
-            nid = normalize_key(gid)
-            # Cohérence avec les validants (cf. cas 8/39/40/14) : un même
-            # concept_id peut apparaître comme validant ET comme descripteur
-            # (rédaction golden avec plusieurs libellés). Utiliser exactement
-            # la même logique de scoring (_score_one_concept : exact / enfant /
-            # parent / requires / exclusions) évite deux incohérences vues en
-            # production :
-            #   1) le descripteur ignorait les exclusions → un concept "exclu"
-            #      côté validant (ex. ECG_NORMAL contredit par une arythmie)
-            #      restait pourtant affiché "trouvé" côté descripteur (cas 8) ;
-            #   2) le descripteur ne testait qu'un match littéral simple, sans
-            #      la logique `requires` → un concept déduit avec succès côté
-            #      validant (ex. TACHYCARDIE_SINUSALE via requires satisfaits)
-            #      restait affiché "manqué" côté descripteur (cas 39/40).
-            cs = _score_one_concept(nid, found_set, None)
-            # NB (bug "Bloc interatrial" du 2026-08-06) : un match de type
-            # "support" est le lien le PLUS FAIBLE du scoring V3 (poids 1/3,
-            # ex: BLOC_INTERATRIAL a "supports: [RYTHME_SINUSAL]" — un lien
-            # statistique faible, pas un vrai indice sémantique). Pour un
-            # validant noté, ce niveau de confiance est acceptable (le score
-            # partiel de 33% reflète l'incertitude). Mais pour un DESCRIPTEUR,
-            # le statut est binaire ("trouvé"/"non mentionné") et le feedback
-            # pédagogique l'affiche comme une affirmation ferme ("vous avez
-            # identifié X") — un match "support" ne doit donc JAMAIS suffire à
-            # déclarer un descripteur "trouvé", sous peine d'affirmer qu'un
-            # étudiant a mentionné un concept qu'il n'a en réalité jamais écrit
-            # (ex: "rythme sinusal" seul faisait crédité "Bloc interatrial").
-            found = cs.match_type not in ("missed", "excluded", "support")
-            match_type = cs.match_type
-            if found:
-                n_desc_found += 1
-            report.descripteur_details.append(DescripteurDetail(
-                golden_name=gname,
-                golden_id=gid,
-                found=found,
-                match_type=match_type,
-            ))
-        report.nb_descripteurs_trouves = n_desc_found
-
-        # ─── Découvertes additionnelles ──────────────────────────────
-        golden_id_set = {normalize_key(gid) for gid in golden_ids}
-        onto = _get_ontology_v2()
-        for fid in found_set - golden_id_set:
-            c = onto["concepts"].get(fid, {})
-            if c:
-                report.decouvertes.append(DecouverteDetail(
-                    concept_name=c.get("concept_name", fid),
-                    ontology_id=fid,
-                    categorie=c.get("type", "DESCRIPTEUR_ECG"),
-                    statut="present",
-                ))
+async def aiter_candidate_report(
+    texte_etudiant: str,
+    golden_names: List[str] = None,
+    golden_ids: List[str] = None,
+    golden_roles: List[str] = None,
+    diagnostic_principal: str = "",
+    moteur: Optional[HybridSearchEngine] = None,
+    with_feedback: Union[bool, str] = True,
+    commentaire_correcteur: str = "",
+) -> AsyncIterator[ReportEvent]:
+    """
+    Variante asyncio de iter_candidate_report (mêmes événements, dans le
+    même ordre ; même rapport final qu'agenerate_candidate_report).
+    """
+    golden_names, golden_ids, golden_roles = _resolve_golden(
+        golden_names, golden_ids, golden_roles
+    )
 
-        # ═══════════════════════════════════════════════════════════════
-        # Brique 6 : Feedback pédagogique (cours SFC, Item 231)
-        # ═══════════════════════════════════════════════════════════════
-        if with_feedback:
+    engine = moteur or _get_engine()
+
+    report = _new_report(texte_etudiant, diagnostic_principal, commentaire_correcteur)
+    if report.erreur:
+        yield ReportEvent("rapport", report)
+        return
+
+    t0 = time.time()
+
+    try:
+        extraction = await aextract_clinical_terms(texte_etudiant)
+
+        entites = [_fix_negation(e) for e in extraction.entites]
+        candidats_par_entite = await engine.asearch_top_k_many(
+            [e.terme_brut for e in entites]
+        )
+        yield ReportEvent("ner", report, entites=entites)
+
+        semaphore = asyncio.Semaphore(max(1, RESOLVE_WORKERS))
+
+        async def resolve(entite: ClinicalEntity, candidats: List[Dict]) -> Dict:
+            async with semaphore:
+                return await aresolve_term_to_ontology(
+                    entite.terme_brut, entite.contexte_phrase, candidats
+                )
+
+        # Toutes les résolutions partent ensemble ; on les attend dans
+        # l'ordre des entités (comme gather).
+        tasks = [
+            asyncio.ensure_future(resolve(e, c))
+            for e, c in zip(entites, candidats_par_entite)
+        ]
+        resolutions: List[Dict] = []
+        try:
+            for i, task in enumerate(tasks):
+                resolution = await task
+                resolutions.append(resolution)
+                yield ReportEvent(
+                    "concept", report,
+                    concept=_extracted_concept(entites[i], resolution), index=i,
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        _assemble_and_score(
+            report, texte_etudiant, entites, resolutions,
+            golden_ids, golden_names, golden_roles,
+        )
+        yield ReportEvent("score", report)
+
+        if with_feedback == "deferred":
+            await asyncio.to_thread(_defer_feedback, report)
+        elif with_feedback:
             try:
-                report.feedback_pedagogique = generate_pedagogical_feedback(report)
+                result = StepsResult()
+                async for request in aiter_steps(_feedback_steps(report), get_async_client, result):
+                    yield _feedback_step_event(report, request)
+                report.feedback_pedagogique = result.value
             except Exception as fb_err:
                 logger.warning(f"Feedback pédagogique indisponible : {fb_err}")
+            else:
+                yield ReportEvent("feedback", report)
 
     except Exception as e:
         report.erreur = str(e)[:200]
 
     report.latence_s = round(time.time() - t0, 2)
+    yield ReportEvent("rapport", report)
+
+
+def _defer_feedback(report: CandidateReport) -> None:
+    """Confie le feedback à la file persistante (feedback_jobs)."""
+    from feedback_jobs import submit_feedback_job  # import local : cycle
+
+    try:
+        report.feedback_job_id = submit_feedback_job(report)
+    except Exception as fb_err:
+        logger.warning(f"Feedback pédagogique différé indisponible : {fb_err}")
+
+
+def _feedback_step_event(report: CandidateReport, request) -> ReportEvent:
+    return ReportEvent(
+        "feedback_etape", report,
+        detail=request.etape if isinstance(request, ChatRequest) else "",
+    )
+
+
+def _feedback_events(
+    report: CandidateReport,
+    steps: Generator,
+) -> Generator[ReportEvent, None, PedagogicalFeedback]:
+    """Un événement "feedback_etape" par requête d'iter_steps ; renvoie le feedback."""
+    try:
+        while True:
+            yield _feedback_step_event(report, next(steps))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _resolve_golden(
+    golden_names: Optional[List[str]],
+    golden_ids: Optional[List[str]],
+    golden_roles: Optional[List[str]],
+) -> Tuple[List[str], List[str], List[str]]:
+    """Valeurs par défaut du golden set (noms résolus depuis l'ontologie V2)."""
+    golden_ids = golden_ids or []
+    golden_names = golden_names or []
+    golden_roles = golden_roles or ["validant"] * len(golden_ids)
+
+    # Résoudre les noms depuis l'ontologie V2 si non fournis
+    if golden_ids and not golden_names:
+        for gid in golden_ids:
+            c = get_concept(normalize_key(gid))
+            golden_names.append(c.get("concept_name", gid) if c else gid)
+    return golden_names, golden_ids, golden_roles
+
+
+def _new_report(
+    texte_etudiant: str,
+    diagnostic_principal: str,
+    commentaire_correcteur: str,
+) -> CandidateReport:
+    """Rapport vide ; `erreur` renseignée si le texte est inexploitable."""
+    report = CandidateReport(
+        diagnostic_principal=diagnostic_principal,
+        texte_etudiant=texte_etudiant,
+        latence_s=0.0,
+        commentaire_correcteur=commentaire_correcteur,
+    )
+    if not texte_etudiant or texte_etudiant.strip() in ("", "nan"):
+        report.erreur = "Texte vide"
     return report
 
 
+def _extracted_concept(entite: ClinicalEntity, resolution: Dict) -> ExtractedConcept:
+    """Concept extrait d'une entité NER et de sa résolution (Brique 4)."""
+    return ExtractedConcept(
+        terme_brut=entite.terme_brut,
+        statut=entite.statut,
+        ontology_id=resolution["ontology_id"],
+        concept_name=resolution.get("concept_name", ""),
+        method=resolution["method"],
+        justification=resolution.get("justification", ""),
+        top_k_candidats=resolution.get("top_k_candidats", []),
+        llm_confiance=resolution.get("llm_confiance", -1),
+    )
+
+
+def _assemble_and_score(
+    report: CandidateReport,
+    texte_etudiant: str,
+    entites: List[ClinicalEntity],
+    resolutions: List[Dict],
+    golden_ids: List[str],
+    golden_names: List[str],
+    golden_roles: List[str],
+) -> None:
+    """
+    Partie déterministe du pipeline (sans appel réseau), commune aux
+    chemins sync et async : concepts extraits, rattrapage lexical,
+    inférence des verdicts (Brique 2.5), scoring V3 (Brique 5), détails
+    validants / descripteurs et découvertes. Complète `report` en place.
+    """
+    student_matched_ids: Dict[str, str] = {}  # id → statut
+    methods: List[str] = []
+
+    for entite, resolution in zip(entites, resolutions):
+        matched_id = resolution["ontology_id"]
+        method = resolution["method"]
+        methods.append(method)
+
+        report.concepts_extraits.append(_extracted_concept(entite, resolution))
+
+        if matched_id != "NONE":
+            student_matched_ids[matched_id] = entite.statut
+
+    # Stats méthodes
+    report.n_coupe_circuit = methods.count("coupe_circuit")
+    report.n_juge_llm = methods.count("juge_llm")
+    report.n_fallback = methods.count("fallback_subterm")
+    report.n_no_candidates = methods.count("no_candidates")
+
+    # ═══════════════════════════════════════════════════════════════
+    # Filet de sécurité LEXICAL (déterministe) : rattrapage post-NER
+    # ═══════════════════════════════════════════════════════════════
+    # Le NER GPT-4o n'est pas 100 % déterministe (même à temperature=0) : un
+    # long synonyme du golden pouvait être oublié 1 run sur 8, faisant chuter
+    # la note aléatoirement. Ici on rattrape, de façon 100 % reproductible,
+    # tout concept du golden (ou descendant) écrit LITTÉRALEMENT par
+    # l'étudiant mais raté par le NER. On ne devine rien : uniquement des
+    # phrases distinctives réellement présentes et non niées.
+    for cid, forme in _lexical_backstop_ids(
+        texte_etudiant, golden_ids, set(student_matched_ids.keys())
+    ):
+        c = get_concept(normalize_key(cid))
+        report.concepts_extraits.append(ExtractedConcept(
+            terme_brut=forme,
+            statut="present",
+            ontology_id=cid,
+            concept_name=(c or {}).get("concept_name", cid),
+            method="lexical_backstop",
+            justification=(
+                f"Rattrapage lexical déterministe : « {forme} » figure "
+                f"littéralement dans la réponse mais n'a pas été extrait "
+                f"par le NER (variabilité GPT-4o)."
+            ),
+            top_k_candidats=[],
+            llm_confiance=-1,
+        ))
+        student_matched_ids[cid] = "present"
+
+    # ═══════════════════════════════════════════════════════════════
+    # Brique 2.5 : Inférence d'EXTRACTION des concepts-verdict
+    # ═══════════════════════════════════════════════════════════════
+    # "Trouver l'ECG normal" est du ressort de l'EXTRACTION, pas du barème
+    # (le scoring jugera si c'est correct). Moteur GÉNÉRIQUE : lit le flag
+    # déclaratif `infer_from_requires` dans l'ontologie ; conclut un verdict
+    # (ex. ECG_NORMAL) quand assez de ses `requires` sont satisfaits ET
+    # qu'aucune `excludes_families` n'est présente. Aucun ID codé en dur.
+    _found_now = [oid for oid, st in student_matched_ids.items()
+                  if st in ("present", "hypothese")]
+    _absent_now = [oid for oid, st in student_matched_ids.items()
+                   if st == "absent"]
+    for inf in _get_inferencer().infer(_found_now, _absent_now):
+        inf_id = inf["ontology_id"]
+        if inf_id in student_matched_ids:
+            continue  # déjà extrait par le NER
+        c = get_concept(normalize_key(inf_id))
+        report.concepts_extraits.append(ExtractedConcept(
+            terme_brut=f"[inféré] {inf['n_requires']}/{inf['n_total']} critères",
+            statut="present",
+            ontology_id=inf_id,
+            concept_name=(c or {}).get("concept_name", inf_id),
+            method="pattern_inference",
+            justification=(
+                f"Verdict inféré : {inf['n_requires']}/{inf['n_total']} "
+                f"critères requis satisfaits, aucune famille pathologique présente."
+            ),
+            top_k_candidats=[],
+            llm_confiance=-1,
+        ))
+        student_matched_ids[inf_id] = "present"
+
+    # ═══════════════════════════════════════════════════════════════
+    # Brique 5 : Scoring V3 ontologique
+    # ═══════════════════════════════════════════════════════════════
+    # Séparer présents et absents
+    found_ids = [oid for oid, st in student_matched_ids.items()
+                 if st in ("present", "hypothese")]
+    absent_ids = [oid for oid, st in student_matched_ids.items()
+                  if st == "absent"]
+
+    # Seuls les validants sont scorés en V3
+    validant_ids = [gid for gid, role in zip(golden_ids, golden_roles)
+                    if role == "validant"]
+
+    v3_result: ScoringResultV3 = score_student_response_v3(
+        found_ids=found_ids,
+        expected_ids=validant_ids,
+        absent_ids=absent_ids,
+    )
+
+    report.score_final_pct = v3_result.score_pct
+
+    # ─── Construire le détail des validants (V3) ─────────────────
+    report.nb_validants_attendus = len(validant_ids)
+    report.nb_validants_trouves = v3_result.n_exact + v3_result.n_requires + v3_result.n_qualifier + v3_result.n_support + v3_result.n_implies + v3_result.n_negation
+
+    # Index golden_id → golden_name
+    id_to_golden_name = {}
+    for gname, gid, role in zip(golden_names, golden_ids, golden_roles):
+        if role == "validant":
+            id_to_golden_name[normalize_key(gid)] = gname
+
+    for cs in v3_result.concept_scores:
+        gname = id_to_golden_name.get(cs.concept_id, cs.concept_name)
+        found = cs.match_type not in ("missed", "excluded")
+        report.validant_details.append(ValidantDetail(
+            golden_name=gname,
+            golden_id=cs.concept_id,
+            found=found,
+            score_pct=round(cs.score * 100, 1),
+            match_type=cs.match_type,
+            detail=cs.detail,
+            explication=_explain_match_type_v3(cs),
+            requires_satisfied=cs.requires_satisfied,
+            requires_missing=cs.requires_missing,
+            qualifiers_found=cs.qualifiers_found,
+            supports_found=cs.supports_found,
+            excluded_by=cs.excluded_by,
+        ))
+
+    # ─── Construire le détail des descripteurs ───────────────────
+    descripteur_ids = [gid for gid, role in zip(golden_ids, golden_roles)
+                      if role == "descripteur"]
+    found_set = {normalize_key(fid) for fid in found_ids}
+    # Ajouter les positifs issus de négations converties
+    for _, pos_id in v3_result.negation_conversions:
+        found_set.add(pos_id)
+
+    found_mask = get_ontology_graph().mask(found_set)
+
+    report.nb_descripteurs_attendus = len(descripteur_ids)
+    n_desc_found = 0
+    from scoring_v3 import _score_one_concept
+    for gname, gid, role in zip(golden_names, golden_ids, golden_roles):
+        if role != "descripteur":
+            continue
+        nid = normalize_key(gid)
+        # Cohérence avec les validants (cf. cas 8/39/40/14) : un même
+        # concept_id peut apparaître comme validant ET comme descripteur
+        # (rédaction golden avec plusieurs libellés). Utiliser exactement
+        # la même logique de scoring (_score_one_concept : exact / enfant /
+        # parent / requires / exclusions) évite deux incohérences vues en
+        # production :
+        #   1) le descripteur ignorait les exclusions → un concept "exclu"
+        #      côté validant (ex. ECG_NORMAL contredit par une arythmie)
+        #      restait pourtant affiché "trouvé" côté descripteur (cas 8) ;
+        #   2) le descripteur ne testait qu'un match littéral simple, sans
+        #      la logique `requires` → un concept déduit avec succès côté
+        #      validant (ex. TACHYCARDIE_SINUSALE via requires satisfaits)
+        #      restait affiché "manqué" côté descripteur (cas 39/40).
+        cs = _score_one_concept(nid, found_set, None, found_mask)
+        # NB (bug "Bloc interatrial" du 2026-08-06) : un match de type
+        # "support" est le lien le PLUS FAIBLE du scoring V3 (poids 1/3,
+        # ex: BLOC_INTERATRIAL a "supports: [RYTHME_SINUSAL]" — un lien
+        # statistique faible, pas un vrai indice sémantique). Pour un
+        # validant noté, ce niveau de confiance est acceptable (le score
+        # partiel de 33% reflète l'incertitude). Mais pour un DESCRIPTEUR,
+        # le statut est binaire ("trouvé"/"non mentionné") et le feedback
+        # pédagogique l'affiche comme une affirmation ferme ("vous avez
+        # identifié X") — un match "support" ne doit donc JAMAIS suffire à
+        # déclarer un descripteur "trouvé", sous peine d'affirmer qu'un
+        # étudiant a mentionné un concept qu'il n'a en réalité jamais écrit
+        # (ex: "rythme sinusal" seul faisait crédité "Bloc interatrial").
+        found = cs.match_type not in ("missed", "excluded", "support")
+        match_type = cs.match_type
+        if found:
+            n_desc_found += 1
+        report.descripteur_details.append(DescripteurDetail(
+            golden_name=gname,
+            golden_id=gid,
+            found=found,
+            match_type=match_type,
+        ))
+    report.nb_descripteurs_trouves = n_desc_found
+
+    # ─── Découvertes additionnelles ──────────────────────────────
+    golden_id_set = {normalize_key(gid) for gid in golden_ids}
+    onto = _get_ontology_v2()
+    for fid in found_set - golden_id_set:
+        c = onto["concepts"].get(fid, {})
+        if c:
+            report.decouvertes.append(DecouverteDetail(
+                concept_name=c.get("concept_name", fid),
+                ontology_id=fid,
+                categorie=c.get("type", "DESCRIPTEUR_ECG"),
+                statut="present",
+            ))
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Formatage texte (terminal / console)
 # ──────────────────────────────────────────────────────────────────────────────
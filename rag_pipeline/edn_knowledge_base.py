@@ -1189,8 +1189,10 @@ EDN_ENTRIES: List[EDNEntry] = [
 # ──────────────────────────────────────────────────────────────────────────────
 
 import unicodedata
+from functools import lru_cache
 
 
+@lru_cache(maxsize=8192)
 def _normalize_id(ontology_id: str) -> str:
     """Normalise un ontology_id pour l'indexation/la recherche : supprime les
     accents et met en majuscules. Les `golden_id` de `cases_golden.json` sont
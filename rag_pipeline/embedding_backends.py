@@ -0,0 +1,250 @@
+"""
+🧬 Backends d'embeddings — OpenAI, Ollama, local (CPU, in-process)
+===================================================================
+Abstraction commune aux deux côtés de l'espace vectoriel :
+  - construction de l'index (Brique 1, OntologyIndex._build_embeddings) ;
+  - vectorisation des requêtes (Brique 3, HybridSearchEngine).
+
+Les deux côtés DOIVENT utiliser le même backend, le même modèle et la même
+dimension, sinon les cosinus n'ont aucun sens. L'index enregistre donc
+`embedding_backend` / `embedding_model` / `embedding_dims` dans
+metadata_ontologie.json, et le moteur de recherche reconstruit le backend
+de requête à partir de ces champs (cf. backend_from_index_meta).
+
+Backends :
+  - "openai" : API OpenAI (défaut, vecteurs déjà normalisés L2 par l'API)
+  - "ollama" : endpoint OpenAI-compatible local (OLLAMA_BASE_URL)
+  - "local"  : sentence-transformers chargé une fois dans le processus,
+               inférence CPU, AUCUN appel réseau à la requête.
+               Dépendance optionnelle : pip install sentence-transformers
+
+Pour "ollama" et "local", les vecteurs sont normalisés L2 (comme au build)
+pour que le produit scalaire reste un cosinus.
+
+Chaque backend expose aussi `aembed` (asyncio) : client AsyncOpenAI pour
+"openai", thread dédié (asyncio.to_thread) pour les autres.
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+
+from llm_clients import get_endpoint_client, record_api_call
+from llm_scheduler import estimate_text_tokens, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai", "ollama", "local")
+
+# Presets Ollama connus (modèle → dims), historiquement dans OntologyIndex.
+OLLAMA_PRESETS = {
+    "nomic-embed-text": 768,
+    "mxbai-embed-large": 1024,
+    "bge-m3": 1024,
+    "snowflake-arctic-embed": 1024,
+}
+
+# Modèle local par défaut : multilingue (français médical), 384 dims, ~120 Mo.
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalise L2 chaque ligne (les vecteurs nuls sont laissés tels quels)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class EmbeddingBackend:
+    """Interface : texts → matrice (n × dims) float32."""
+
+    name = "base"
+
+    def __init__(self, model: str, dims: Optional[int] = None):
+        self.model = model
+        self.dims = dims
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """Variante asyncio de embed (par défaut : embed dans un thread)."""
+        return await asyncio.to_thread(self.embed, texts)
+
+    def _check_dims(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dims is not None and vectors.shape[1] != self.dims:
+            raise ValueError(
+                f"Backend {self.name}/{self.model} : embeddings de dimension "
+                f"{vectors.shape[1]}, l'index attend {self.dims}. "
+                f"Reconstruire l'index avec le même modèle."
+            )
+        return vectors
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(model={self.model!r}, dims={self.dims})"
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """API OpenAI (ou tout endpoint compatible fourni par client_factory)."""
+
+    name = "openai"
+    normalize = False  # vecteurs OpenAI déjà normalisés L2
+
+    def __init__(
+        self,
+        model: str,
+        dims: Optional[int] = None,
+        client_factory: Optional[Callable[[], OpenAI]] = None,
+        async_client_factory: Optional[Callable[[], AsyncOpenAI]] = None,
+    ):
+        super().__init__(model, dims)
+        if client_factory is None:
+            raise ValueError("OpenAIEmbeddingBackend requiert un client_factory")
+        self._client_factory = client_factory
+        self._async_client_factory = async_client_factory
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dims or 0), dtype=np.float32)
+        record_api_call(self.model)
+        response = get_scheduler().call(
+            self.model, self._client_factory().embeddings.create,
+            tokens=estimate_text_tokens(*texts),
+            model=self.model,
+            input=list(texts),
+        )
+        return self._to_vectors(texts, response)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if self._async_client_factory is None:
+            return await super().aembed(texts)
+        if not texts:
+            return np.empty((0, self.dims or 0), dtype=np.float32)
+        record_api_call(self.model)
+        response = await get_scheduler().acall(
+            self.model, self._async_client_factory().embeddings.create,
+            tokens=estimate_text_tokens(*texts),
+            model=self.model,
+            input=list(texts),
+        )
+        return self._to_vectors(texts, response)
+
+    def _to_vectors(self, texts: List[str], response) -> np.ndarray:
+        vectors = np.zeros((len(texts), len(response.data[0].embedding)), dtype=np.float32)
+        for i, item in enumerate(response.data):
+            vectors[getattr(item, "index", i)] = item.embedding
+        if self.normalize:
+            vectors = l2_normalize(vectors)
+        return self._check_dims(vectors)
+
+
+class OllamaEmbeddingBackend(OpenAIEmbeddingBackend):
+    """Ollama via son endpoint OpenAI-compatible (100 % local, serveur HTTP)."""
+
+    name = "ollama"
+    normalize = True  # vecteurs Ollama non garantis normalisés
+
+    def __init__(self, model: str, dims: Optional[int] = None):
+        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+        super().__init__(
+            model, dims, client_factory=lambda: get_endpoint_client(base_url, "ollama"),
+        )
+
+
+# Modèles sentence-transformers chargés une seule fois par processus.
+_LOCAL_MODELS: Dict[str, object] = {}
+_LOCAL_MODELS_LOCK = threading.Lock()
+
+
+def _load_local_model(model: str):
+    with _LOCAL_MODELS_LOCK:
+        if model not in _LOCAL_MODELS:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError(
+                    "Backend d'embeddings 'local' : sentence-transformers n'est pas "
+                    "installé (pip install sentence-transformers)."
+                ) from e
+            device = os.getenv("LOCAL_EMBED_DEVICE", "cpu")
+            logger.info(f"🧬 Chargement du modèle d'embeddings local {model} ({device})")
+            _LOCAL_MODELS[model] = SentenceTransformer(model, device=device)
+        return _LOCAL_MODELS[model]
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers in-process (CPU) : zéro aller-retour réseau."""
+
+    name = "local"
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, dims: Optional[int] = None):
+        super().__init__(model, dims)
+        self._model = _load_local_model(model)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dims or 0), dtype=np.float32)
+        vectors = self._model.encode(
+            list(texts),
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=False,
+            show_progress_bar=False,
+        )
+        return self._check_dims(l2_normalize(np.asarray(vectors, dtype=np.float32)))
+
+
+def get_embedding_backend(
+    backend: str,
+    model: str,
+    dims: Optional[int] = None,
+    client_factory: Optional[Callable[[], OpenAI]] = None,
+    async_client_factory: Optional[Callable[[], AsyncOpenAI]] = None,
+) -> EmbeddingBackend:
+    """Fabrique un backend par nom ("openai" | "ollama" | "local")."""
+    backend = (backend or "openai").lower()
+    if backend == "openai":
+        return OpenAIEmbeddingBackend(
+            model, dims,
+            client_factory=client_factory,
+            async_client_factory=async_client_factory,
+        )
+    if backend == "ollama":
+        return OllamaEmbeddingBackend(model, dims)
+    if backend == "local":
+        return LocalEmbeddingBackend(model, dims)
+    raise ValueError(f"Backend d'embeddings inconnu : {backend!r} (attendu : {BACKENDS})")
+
+
+def backend_from_index_meta(
+    index_meta: Dict,
+    default_model: str,
+    client_factory: Optional[Callable[[], OpenAI]] = None,
+    async_client_factory: Optional[Callable[[], AsyncOpenAI]] = None,
+) -> EmbeddingBackend:
+    """
+    Reconstruit le backend de requête décrit par metadata_ontologie.json.
+
+    Index antérieurs au champ `embedding_backend` : "openai", sauf si le
+    modèle est un preset Ollama connu (index construits avec
+    ONTOLOGY_EMBED_BACKEND=ollama).
+    """
+    model = index_meta.get("embedding_model", default_model)
+    backend = index_meta.get("embedding_backend")
+    if backend is None:
+        backend = "ollama" if model.split(":")[0] in OLLAMA_PRESETS else "openai"
+    return get_embedding_backend(
+        backend, model, index_meta.get("embedding_dims"),
+        client_factory=client_factory,
+        async_client_factory=async_client_factory,
+    )
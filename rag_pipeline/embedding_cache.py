@@ -0,0 +1,174 @@
+"""
+🧠 Cache d'embeddings de requête (Brique 3)
+=============================================
+Évite de re-vectoriser via l'API le vocabulaire étudiant récurrent
+("FA", "BBG", "rythme sinusal"...) : chaque embedding de requête est
+adressé par son contenu — hash(modèle, dimensions, query normalisée) —
+et conservé :
+  - en mémoire (LRU borné, accès O(1)) ;
+  - sur disque (SQLite partagé entre processus, taille bornée).
+
+Le modèle et les dimensions font partie de la clé : plusieurs modèles
+(ou index de dimensions différentes) partagent sans conflit le même fichier,
+et les entrées d'un modèle abandonné sortent par l'éviction LRU.
+
+Configuration :
+  HYBRID_EMBED_CACHE       chemin du fichier SQLite ("off" = mémoire seule)
+                           défaut : ~/.cache/edu-ecg/query_embeddings.sqlite
+  HYBRID_EMBED_CACHE_MB    taille disque max (défaut 64 Mo)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from local_cache import SQLiteStore, content_hash, resolve_cache_path
+from ontology_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """
+    Cache à deux niveaux (mémoire LRU → SQLite) des embeddings de requête.
+
+    Usage:
+        cache = QueryEmbeddingCache("text-embedding-3-small", 1536)
+        vec = cache.get("FA")
+        if vec is None:
+            vec = ...  # appel API
+            cache.put("FA", vec)
+        print(cache.stats())
+    """
+
+    def __init__(
+        self,
+        model: str,
+        dims: int,
+        path: Optional[Union[str, Path]] = None,
+        memory_size: int = 4096,
+        max_disk_mb: float = 64.0,
+    ):
+        self.model = model
+        self.dims = int(dims)
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._store: Optional[SQLiteStore] = None
+        if path is not None:
+            # Vecteurs float32 de taille fixe : borne disque ⇔ borne en entrées.
+            max_entries = max(1, int(max_disk_mb * 1024 * 1024 / (self.dims * 4)))
+            try:
+                self._store = SQLiteStore(path, max_entries=max_entries)
+            except Exception as e:
+                # Un cache disque inaccessible ne doit jamais bloquer la recherche.
+                logger.warning(f"⚠️  Cache d'embeddings disque désactivé ({path}) : {e}")
+                self._store = None
+
+    @classmethod
+    def from_env(cls, model: str, dims: int) -> "QueryEmbeddingCache":
+        """Construit le cache selon HYBRID_EMBED_CACHE / HYBRID_EMBED_CACHE_MB."""
+        path = resolve_cache_path("HYBRID_EMBED_CACHE", "query_embeddings.sqlite")
+        max_mb = float(os.getenv("HYBRID_EMBED_CACHE_MB", "64"))
+        return cls(model, dims, path=path, max_disk_mb=max_mb)
+
+    # ------------------------------------------------------------------
+    # Clé de contenu
+    # ------------------------------------------------------------------
+
+    def key(self, query: str) -> str:
+        """Clé stable : hash(modèle, dimensions, query normalisée)."""
+        return content_hash(self.model, str(self.dims), normalize_text(query))
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Retourne l'embedding en cache (float32, lecture seule) ou None."""
+        key = self.key(query)
+        with self._lock:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vec
+
+        if self._store is not None:
+            raw = self._store.get(key)
+            if raw is not None and len(raw) == self.dims * 4:
+                vec = np.frombuffer(raw, dtype=np.float32)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, vec)
+                return vec
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, vec: np.ndarray) -> None:
+        """Enregistre l'embedding d'une requête (mémoire + disque)."""
+        vec = np.ascontiguousarray(vec, dtype=np.float32)
+        if vec.shape != (self.dims,):
+            raise ValueError(
+                f"Embedding de dimension {vec.shape} incompatible avec le cache "
+                f"({self.dims} dimensions, modèle {self.model})"
+            )
+        vec.setflags(write=False)
+        key = self.key(query)
+        with self._lock:
+            self._remember(key, vec)
+        if self._store is not None:
+            try:
+                self._store.put(key, vec.tobytes())
+            except Exception as e:
+                logger.warning(f"⚠️  Écriture cache d'embeddings échouée : {e}")
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        """Insère dans le LRU mémoire (appelé sous verrou)."""
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vide les deux niveaux du cache (compteurs conservés)."""
+        with self._lock:
+            self._memory.clear()
+        if self._store is not None:
+            self._store.clear()
+
+    # ------------------------------------------------------------------
+    # Statistiques
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """Compteurs hit/miss depuis la création du cache."""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "model": self.model,
+            "dims": self.dims,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_path": str(self._store.path) if self._store is not None else None,
+        }
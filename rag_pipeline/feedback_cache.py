@@ -0,0 +1,300 @@
+"""
+💬 Cache des feedbacks pédagogiques — clé = issue notée, pas le texte
+======================================================================
+Deux étudiants qui font exactement les mêmes constats sur un même cas
+(mêmes validants trouvés / manqués, mêmes types de match, même tranche de
+score, mêmes descripteurs et découvertes) reçoivent aujourd'hui chacun un
+commentaire GPT-4o rédigé de zéro (jusqu'à trois appels). Ce cache, optionnel,
+sert les profils d'issue fréquents des cas populaires depuis le disque :
+
+    clé = hash(signature d'issue, contexte de cours, commentaire du correcteur,
+               modèle, température, hash des prompts)
+
+La signature d'issue reprend le résumé envoyé au rédacteur
+(_build_student_summary) SANS le texte libre de l'étudiant : diagnostic du
+cas, validants (id, nom, trouvé, match_type, score par tranche, critères /
+qualificatifs / supports / exclusion), descripteurs, découvertes, score
+final par tranche.
+
+Politique de réutilisation (ReusePolicy) :
+  - tranche de score (FEEDBACK_CACHE_SCORE_BAND, 5 points par défaut ;
+    0 = score exact). Le garde-fou de ton (< 40 %) est ré-appliqué au score
+    réel à chaque service ;
+  - nombre maximal de services d'une même entrée (FEEDBACK_CACHE_MAX_REUSE,
+    0 = illimité) : au-delà, l'entrée est retirée et le prochain étudiant
+    reçoit un texte neuf ;
+  - un feedback qui recopie un passage propre au texte de l'étudiant (suite
+    de mots absente du résumé hors texte et du cours) n'est pas mis en
+    cache : il ne doit pas être servi à un autre étudiant ;
+  - seul un texte entièrement contrôlé est mis en cache : juge clinique
+    abouti et, si des problèmes ont été relevés, réécriture acceptée.
+
+Éviction : LRU bornée (FEEDBACK_CACHE_MAX_ENTRIES) + durée de vie depuis
+la rédaction (FEEDBACK_CACHE_TTL, en jours), cf. local_cache.
+
+Configuration :
+  FEEDBACK_CACHE               absent / "off" = désactivé (défaut) ;
+                               "on" = ~/.cache/edu-ecg/feedback_cache.sqlite ;
+                               sinon chemin du fichier SQLite
+  FEEDBACK_CACHE_SCORE_BAND    largeur des tranches de score (points, défaut 5)
+  FEEDBACK_CACHE_MAX_REUSE     services max par entrée (défaut 0 = illimité)
+  FEEDBACK_CACHE_TTL           durée de vie en jours (défaut 30)
+  FEEDBACK_CACHE_MAX_ENTRIES   borne LRU (défaut 50 000)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Union
+
+from local_cache import SQLiteStore, content_hash, default_cache_dir, resolve_cache_path
+from ontology_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Longueur (en mots) d'un passage considéré comme recopié du texte étudiant.
+QUOTE_NGRAM = 4
+
+
+@dataclass(frozen=True)
+class ReusePolicy:
+    """Règles de réutilisation d'un feedback entre étudiants."""
+    score_band_pct: float = 5.0          # 0 = score exact
+    max_reuse: Optional[int] = None      # None = illimité
+    ttl_days: Optional[float] = 30.0
+    max_entries: int = 50_000
+
+    @classmethod
+    def from_env(cls) -> "ReusePolicy":
+        max_reuse = int(os.getenv("FEEDBACK_CACHE_MAX_REUSE", "0"))
+        ttl_days = float(os.getenv("FEEDBACK_CACHE_TTL", "30"))
+        return cls(
+            score_band_pct=float(os.getenv("FEEDBACK_CACHE_SCORE_BAND", "5")),
+            max_reuse=max_reuse or None,
+            ttl_days=ttl_days or None,
+            max_entries=int(os.getenv("FEEDBACK_CACHE_MAX_ENTRIES", "50000")),
+        )
+
+    def band(self, score_pct: float) -> float:
+        """Borne basse de la tranche de score (score arrondi si tranche nulle)."""
+        if self.score_band_pct <= 0:
+            return round(score_pct, 1)
+        return math.floor(score_pct / self.score_band_pct) * self.score_band_pct
+
+
+def outcome_signature(report, policy: ReusePolicy) -> str:
+    """
+    Signature canonique de l'issue notée d'un CandidateReport (texte libre
+    exclu) : deux rapports de même signature produisent le même résumé pour
+    le rédacteur, aux tranches de score près.
+    """
+    return json.dumps({
+        "diagnostic": report.diagnostic_principal,
+        "score": policy.band(report.score_final_pct),
+        "validants": [
+            [vd.golden_id, vd.golden_name, vd.found, vd.match_type,
+             policy.band(vd.score_pct), sorted(vd.requires_satisfied),
+             sorted(vd.qualifiers_found), sorted(vd.supports_found), vd.excluded_by]
+            for vd in report.validant_details
+        ],
+        "descripteurs": [
+            [dd.golden_id, dd.golden_name, dd.found] for dd in report.descripteur_details
+        ],
+        "decouvertes": sorted(
+            [dec.ontology_id, dec.concept_name, dec.categorie] for dec in report.decouvertes
+        ),
+    }, ensure_ascii=False, sort_keys=True)
+
+
+def _ngrams(text: str, n: int = QUOTE_NGRAM) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", normalize_text(text))
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def quotes_student_text(feedback_text: str, texte_etudiant: str, reference: str) -> bool:
+    """
+    True si le feedback reprend une suite de QUOTE_NGRAM mots propre au texte
+    de l'étudiant, c.-à-d. absente de `reference` (résumé hors texte + cours).
+    """
+    own = _ngrams(texte_etudiant) - _ngrams(reference)
+    return bool(own and own & _ngrams(feedback_text))
+
+
+class FeedbackCache:
+    """
+    Cache persistant (SQLite) des textes de feedback, par issue notée.
+
+    Usage:
+        cache = FeedbackCache.from_env()
+        key = cache.key(report, course_context, commentaire, model, temperature, prompt)
+        texte = cache.get(key)
+        if texte is None:
+            texte = ...  # chaîne de feedback GPT-4o
+            cache.put(key, texte, report.texte_etudiant, reference)
+        print(cache.stats())
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]],
+        policy: Optional[ReusePolicy] = None,
+    ):
+        self.policy = policy or ReusePolicy()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped_personalized = 0
+        self.retired = 0
+        self.expired = 0
+
+        self._store: Optional[SQLiteStore] = None
+        if path is not None:
+            try:
+                self._store = SQLiteStore(
+                    path,
+                    max_entries=self.policy.max_entries,
+                    ttl_s=self.policy.ttl_days * 86400 if self.policy.ttl_days else None,
+                )
+            except Exception as e:
+                # Un cache inaccessible ne doit jamais bloquer la correction.
+                logger.warning(f"⚠️  Cache des feedbacks désactivé ({path}) : {e}")
+                self._store = None
+
+    @classmethod
+    def from_env(cls) -> "FeedbackCache":
+        """Construit le cache selon FEEDBACK_CACHE et FEEDBACK_CACHE_* (désactivé par défaut)."""
+        value = os.getenv("FEEDBACK_CACHE")
+        if value is None:
+            path = None
+        elif value.strip().lower() in ("1", "on", "true", "yes"):
+            path = default_cache_dir() / "feedback_cache.sqlite"
+        else:
+            path = resolve_cache_path("FEEDBACK_CACHE", "feedback_cache.sqlite")
+        return cls(path, ReusePolicy.from_env())
+
+    @property
+    def enabled(self) -> bool:
+        return self._store is not None
+
+    # ------------------------------------------------------------------
+    # Clé
+    # ------------------------------------------------------------------
+
+    def key(
+        self,
+        report,
+        course_context: str,
+        commentaire_correcteur: str,
+        model: str,
+        temperature: float,
+        prompt: str,
+    ) -> str:
+        """hash(signature d'issue, cours, commentaire, modèle, température, prompts)."""
+        return content_hash(
+            outcome_signature(report, self.policy),
+            course_context,
+            (commentaire_correcteur or "").strip(),
+            model,
+            repr(temperature),
+            content_hash(prompt),
+        )
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[str]:
+        """Texte de feedback en cache, ou None. Compte un service de l'entrée."""
+        if self._store is None:
+            return None
+        texte = None
+        try:
+            with self._lock:
+                raw = self._store.get(key)
+                if raw is not None:
+                    entry = json.loads(raw.decode("utf-8"))
+                    texte = self._serve_locked(key, entry)
+        except Exception as e:
+            logger.warning(f"⚠️  Lecture cache des feedbacks échouée : {e}")
+            texte = None
+        with self._lock:
+            if texte is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return texte
+
+    def _serve_locked(self, key: str, entry: Dict) -> Optional[str]:
+        """Applique durée de vie et plafond de services à une entrée lue."""
+        ttl_days = self.policy.ttl_days
+        if ttl_days and time.time() - entry["cree_le"] > ttl_days * 86400:
+            self._store.delete(key)
+            self.expired += 1
+            return None
+        entry["n_servi"] += 1
+        if self.policy.max_reuse and entry["n_servi"] >= self.policy.max_reuse:
+            self._store.delete(key)
+            self.retired += 1
+        else:
+            self._store.put(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        return entry["texte"]
+
+    def put(self, key: str, texte: str, texte_etudiant: str = "", reference: str = "") -> bool:
+        """
+        Enregistre le feedback rédigé pour cette issue, sauf s'il recopie un
+        passage propre au texte de l'étudiant. True si mis en cache.
+        """
+        if self._store is None:
+            return False
+        if texte_etudiant and quotes_student_text(texte, texte_etudiant, reference):
+            with self._lock:
+                self.skipped_personalized += 1
+            return False
+        entry = {"texte": texte, "cree_le": time.time(), "n_servi": 0}
+        try:
+            with self._lock:
+                self._store.put(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+                self.stores += 1
+        except Exception as e:
+            logger.warning(f"⚠️  Écriture cache des feedbacks échouée : {e}")
+            return False
+        return True
+
+    def clear(self) -> None:
+        if self._store is not None:
+            self._store.clear()
+
+    # ------------------------------------------------------------------
+    # Statistiques
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """Compteurs depuis la création du cache (hit = chaîne de feedback évitée)."""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "stores": self.stores,
+            "skipped_personalized": self.skipped_personalized,
+            "retired_max_reuse": self.retired,
+            "expired": self.expired,
+            "score_band_pct": self.policy.score_band_pct,
+            "max_reuse": self.policy.max_reuse,
+            "disk_entries": len(self._store) if self._store is not None else 0,
+            "disk_path": str(self._store.path) if self._store is not None else None,
+        }
@@ -0,0 +1,544 @@
+"""
+⏳ Feedback pédagogique différé — file persistante + pool de workers
+====================================================================
+La chaîne de feedback (rédaction GPT-4o, juge clinique, réécriture ciblée)
+représente jusqu'à trois appels séquentiels par copie, alors que la note
+n'en dépend pas. En mode différé, generate_candidate_report rend le rapport
+noté immédiatement et dépose le feedback à produire dans une file SQLite
+sur disque ; un pool de workers (threads, dans ce processus ou dans un
+processus dédié) la vide en arrière-plan.
+
+    report = generate_candidate_report(texte, golden_ids=..., with_feedback="deferred")
+    report.feedback_job_id                    # "fbj-…"
+    job = get_feedback_job(report.feedback_job_id)
+    job.status                                # pending | running | done | failed
+    job.feedback                              # PedagogicalFeedback (done / failed)
+    apply_feedback_job(report)                # complète report.feedback_pedagogique
+
+Le feedback est calculé par le même enchaînement que le chemin synchrone
+(_feedback_steps), sur le rapport tel qu'il était à la soumission : pour
+les mêmes réponses du modèle, le texte est identique.
+
+Re-tentatives : l'ordonnanceur (llm_scheduler) réessaie déjà les erreurs
+transitoires de chaque appel ; ici, un job dont la chaîne échoue (API
+indisponible → feedback de secours avec `erreur`) est remis en file avec
+un délai exponentiel, jusqu'à FEEDBACK_JOBS_MAX_ATTEMPTS. Au-delà il passe
+« failed » en gardant le feedback de secours. Un job dont le worker a
+disparu (processus tué) redevient disponible à l'expiration de son bail.
+
+Test sans OpenAI : FeedbackWorkerPool(client_factory=...) accepte tout
+client compatible, par ex. batch_standin.LocalBatchServer (route
+/v1/chat/completions) ou un serveur local (Ollama, vLLM...).
+
+Configuration :
+  FEEDBACK_JOBS_PATH            fichier SQLite (défaut ~/.cache/edu-ecg/feedback_jobs.sqlite ;
+                                "off" = file en mémoire, non persistante)
+  FEEDBACK_JOBS_WORKERS         threads du pool (défaut 4)
+  FEEDBACK_JOBS_AUTOSTART       1 (défaut) = pool démarré dans ce processus à la
+                                première soumission ; 0 = workers externes
+  FEEDBACK_JOBS_MAX_ATTEMPTS    tentatives par job (défaut 3)
+  FEEDBACK_JOBS_RETRY_S         délai de base entre tentatives (défaut 30 s, doublé)
+  FEEDBACK_JOBS_LEASE_S         bail d'un job en cours (défaut 600 s)
+  FEEDBACK_JOBS_TTL_S           conservation des jobs terminés (défaut 7 jours)
+
+Usage (workers dédiés) :
+    python feedback_jobs.py work [--workers 4]
+    python feedback_jobs.py status [job_id]
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from llm_clients import get_client, run_steps
+from llm_scheduler import Priority, llm_priority
+from local_cache import resolve_cache_path
+from pedagogical_feedback import PedagogicalFeedback, _feedback_steps
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_JOBS_WORKERS = int(os.getenv("FEEDBACK_JOBS_WORKERS", "4"))
+FEEDBACK_JOBS_AUTOSTART = os.getenv("FEEDBACK_JOBS_AUTOSTART", "1") not in ("0", "off", "false")
+FEEDBACK_JOBS_MAX_ATTEMPTS = int(os.getenv("FEEDBACK_JOBS_MAX_ATTEMPTS", "3"))
+FEEDBACK_JOBS_RETRY_S = float(os.getenv("FEEDBACK_JOBS_RETRY_S", "30"))
+FEEDBACK_JOBS_LEASE_S = float(os.getenv("FEEDBACK_JOBS_LEASE_S", "600"))
+FEEDBACK_JOBS_TTL_S = float(os.getenv("FEEDBACK_JOBS_TTL_S", str(7 * 24 * 3600)))
+
+STATUSES = ("pending", "running", "done", "failed")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# File persistante (SQLite)
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class FeedbackJob:
+    """État d'un job de feedback différé (API de suivi)."""
+    job_id: str
+    status: str                                 # pending | running | done | failed
+    attempts: int
+    max_attempts: int
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+    feedback: Optional[PedagogicalFeedback] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+@dataclass
+class ClaimedJob:
+    """Job réservé par un worker : rapport à commenter + jeton de bail."""
+    job_id: str
+    owner: str
+    attempts: int
+    report: Dict[str, Any]
+
+
+class FeedbackQueue:
+    """
+    File de jobs de feedback, partagée entre threads et processus (SQLite en
+    mode WAL, réservation atomique par BEGIN IMMEDIATE).
+
+    Un job réservé porte un jeton `owner` et un bail (`lease_until`) : seul
+    le détenteur du bail peut le clore, et un bail expiré rend le job à la
+    file (worker disparu).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        max_attempts: int = FEEDBACK_JOBS_MAX_ATTEMPTS,
+        retry_s: float = FEEDBACK_JOBS_RETRY_S,
+        lease_s: float = FEEDBACK_JOBS_LEASE_S,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.max_attempts = max_attempts
+        self.retry_s = retry_s
+        self.lease_s = lease_s
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path) if self.path is not None else ":memory:",
+            timeout=30.0, check_same_thread=False, isolation_level=None,
+        )
+        if self.path is not None:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, status TEXT NOT NULL,"
+            " report TEXT NOT NULL, feedback TEXT, error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+            " owner TEXT, lease_until REAL, next_attempt_at REAL NOT NULL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, next_attempt_at)"
+        )
+
+    # ------------------------------------------------------------------
+    # Producteur
+    # ------------------------------------------------------------------
+
+    def submit(self, report) -> str:
+        """Dépose le rapport (CandidateReport) à commenter ; retourne l'id du job."""
+        job_id = f"fbj-{uuid.uuid4().hex}"
+        now = time.time()
+        payload = json.dumps(asdict(report), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, report, max_attempts,"
+                " next_attempt_at, created_at, updated_at)"
+                " VALUES (?, 'pending', ?, ?, ?, ?, ?)",
+                (job_id, payload, self.max_attempts, now, now, now),
+            )
+        return job_id
+
+    # ------------------------------------------------------------------
+    # Suivi
+    # ------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[FeedbackJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, max_attempts, created_at, updated_at,"
+                " error, feedback FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, max_attempts, created_at, updated_at, error, feedback = row
+        return FeedbackJob(
+            job_id=job_id,
+            status=status,
+            attempts=attempts,
+            max_attempts=max_attempts,
+            created_at=created_at,
+            updated_at=updated_at,
+            error=error,
+            feedback=PedagogicalFeedback(**json.loads(feedback)) if feedback else None,
+        )
+
+    def wait(
+        self, job_id: str, timeout: Optional[float] = None, poll_s: float = 0.2
+    ) -> Optional[FeedbackJob]:
+        """Attend qu'un job soit terminé (done / failed) ; état courant si timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.finished:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_s)
+
+    def stats(self) -> Dict[str, int]:
+        """Nombre de jobs par statut."""
+        counts = dict.fromkeys(STATUSES, 0)
+        with self._lock:
+            for status, n in self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ):
+                counts[status] = n
+        return counts
+
+    def purge(self, older_than_s: float = FEEDBACK_JOBS_TTL_S) -> int:
+        """Supprime les jobs terminés depuis plus de `older_than_s` secondes."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than_s,),
+            )
+        return cur.rowcount
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def claim(self, owner: str) -> Optional[ClaimedJob]:
+        """
+        Réserve le plus ancien job prêt (ou au bail expiré), s'il y en a un.
+        Un job au bail expiré qui a épuisé ses tentatives passe « failed ».
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', owner = NULL, lease_until = NULL,"
+                    " error = COALESCE(error, 'bail expiré'), updated_at = ?"
+                    " WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = self._conn.execute(
+                    "SELECT job_id, attempts, report FROM jobs"
+                    " WHERE (status = 'pending' AND next_attempt_at <= ?)"
+                    "    OR (status = 'running' AND lease_until < ? AND attempts < max_attempts)"
+                    " ORDER BY next_attempt_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?,"
+                        " attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                        (owner, now + self.lease_s, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job_id, attempts, report = row
+        return ClaimedJob(job_id, owner, attempts + 1, json.loads(report))
+
+    def complete(self, job: ClaimedJob, feedback: PedagogicalFeedback) -> bool:
+        """Clôt un job réussi. False si le bail a été perdu entre-temps."""
+        return self._finish(job, "done", feedback, None)
+
+    def fail(
+        self,
+        job: ClaimedJob,
+        error: str,
+        feedback: Optional[PedagogicalFeedback] = None,
+    ) -> bool:
+        """
+        Échec d'une tentative : remise en file avec délai exponentiel, ou
+        « failed » (en gardant `feedback`, le feedback de secours) si c'était
+        la dernière. False si le bail a été perdu entre-temps.
+        """
+        # Décision et écriture dans le même UPDATE : atomique entre processus.
+        now = time.time()
+        payload = json.dumps(asdict(feedback), ensure_ascii=False) if feedback else None
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET"
+                " status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,"
+                " next_attempt_at = CASE WHEN attempts < max_attempts THEN ? ELSE next_attempt_at END,"
+                " feedback = CASE WHEN attempts < max_attempts THEN feedback ELSE ? END,"
+                " error = ?, owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (now + self.retry_s * 2 ** (job.attempts - 1), payload, error, now,
+                 job.job_id, job.owner),
+            )
+        return cur.rowcount == 1
+
+    def _finish(
+        self,
+        job: ClaimedJob,
+        status: str,
+        feedback: Optional[PedagogicalFeedback],
+        error: Optional[str],
+    ) -> bool:
+        payload = json.dumps(asdict(feedback), ensure_ascii=False) if feedback else None
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, feedback = ?, error = ?, owner = NULL,"
+                " lease_until = NULL, updated_at = ?"
+                " WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (status, payload, error, time.time(), job.job_id, job.owner),
+            )
+        return cur.rowcount == 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pool de workers
+# ──────────────────────────────────────────────────────────────────────────────
+
+class FeedbackWorkerPool:
+    """
+    Threads qui vident une FeedbackQueue. Les appels partent en priorité
+    « lot » (llm_scheduler) : la correction interactive reste servie d'abord.
+    """
+
+    def __init__(
+        self,
+        queue: Optional[FeedbackQueue] = None,
+        workers: int = FEEDBACK_JOBS_WORKERS,
+        client_factory: Callable = get_client,
+        poll_s: float = 1.0,
+    ):
+        self.queue = queue or get_feedback_queue()
+        self.workers = max(1, workers)
+        self.client_factory = client_factory
+        self.poll_s = poll_s
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "FeedbackWorkerPool":
+        if self._threads:
+            return self
+        self._stop.clear()
+        self.queue.purge()
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._loop, name=f"feedback-{i}", daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        """Arrête les workers (un job en cours est terminé, pas interrompu)."""
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._threads = []
+
+    def notify(self) -> None:
+        """Réveille les workers en attente (job soumis dans ce processus)."""
+        self._wake.set()
+
+    def __enter__(self) -> "FeedbackWorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _loop(self) -> None:
+        owner = f"{os.getpid()}-{threading.current_thread().name}-{uuid.uuid4().hex[:8]}"
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(owner)
+            except sqlite3.Error as e:
+                logger.warning(f"File de feedback indisponible : {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_s)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: ClaimedJob) -> None:
+        """Exécute la chaîne de feedback d'un job réservé et en consigne l'issue."""
+        from batch_grading import report_from_dict  # import local : cycle candidate_report
+
+        try:
+            report = report_from_dict(job.report)
+            with llm_priority(Priority.BATCH):
+                feedback = run_steps(_feedback_steps(report), self.client_factory)
+        except Exception as e:
+            logger.warning(f"Feedback différé {job.job_id} (tentative {job.attempts}) : {e}")
+            self.queue.fail(job, str(e)[:200])
+            return
+        if feedback.erreur:
+            logger.warning(
+                f"Feedback différé {job.job_id} (tentative {job.attempts}) : {feedback.erreur}"
+            )
+            self.queue.fail(job, feedback.erreur, feedback)
+        else:
+            self.queue.complete(job, feedback)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# API module (file et pool partagés)
+# ──────────────────────────────────────────────────────────────────────────────
+
+_queue: Optional[FeedbackQueue] = None
+_pool: Optional[FeedbackWorkerPool] = None
+_singleton_lock = threading.Lock()
+
+
+def get_feedback_queue() -> FeedbackQueue:
+    """File partagée du processus (FEEDBACK_JOBS_PATH)."""
+    global _queue
+    with _singleton_lock:
+        if _queue is None:
+            _queue = FeedbackQueue(
+                resolve_cache_path("FEEDBACK_JOBS_PATH", "feedback_jobs.sqlite")
+            )
+        return _queue
+
+
+def set_feedback_queue(queue: Optional[FeedbackQueue]) -> None:
+    """Injecte une file (tests, répertoire dédié) ; None = défaut au prochain accès."""
+    global _queue
+    with _singleton_lock:
+        _queue = queue
+
+
+def start_feedback_workers(
+    workers: int = FEEDBACK_JOBS_WORKERS,
+    client_factory: Callable = get_client,
+) -> FeedbackWorkerPool:
+    """Démarre (une fois) le pool partagé de ce processus sur la file partagée."""
+    global _pool
+    queue = get_feedback_queue()
+    with _singleton_lock:
+        if _pool is None or _pool.queue is not queue:
+            if _pool is not None:
+                _pool.stop(wait=False)
+            _pool = FeedbackWorkerPool(queue, workers, client_factory).start()
+        return _pool
+
+
+def stop_feedback_workers() -> None:
+    global _pool
+    with _singleton_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
+
+
+def submit_feedback_job(report) -> str:
+    """
+    Dépose le feedback d'un CandidateReport noté dans la file partagée et
+    retourne l'id du job. Démarre le pool local si FEEDBACK_JOBS_AUTOSTART.
+    """
+    job_id = get_feedback_queue().submit(report)
+    if FEEDBACK_JOBS_AUTOSTART:
+        start_feedback_workers().notify()
+    elif _pool is not None:
+        _pool.notify()
+    return job_id
+
+
+def get_feedback_job(job_id: str) -> Optional[FeedbackJob]:
+    """État d'un job (None si inconnu ou purgé)."""
+    return get_feedback_queue().get(job_id)
+
+
+def apply_feedback_job(report, timeout: Optional[float] = 0.0) -> bool:
+    """
+    Complète report.feedback_pedagogique depuis son job différé, en
+    attendant au plus `timeout` secondes (None = sans limite). True si le
+    feedback est disponible (job done, ou failed avec feedback de secours).
+    """
+    job_id = getattr(report, "feedback_job_id", None)
+    if not job_id:
+        return report.feedback_pedagogique is not None
+    job = get_feedback_queue().wait(job_id, timeout)
+    if job is None or job.feedback is None:
+        return False
+    report.feedback_pedagogique = job.feedback
+    return True
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────────────────────────────────────
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Feedback pédagogique différé")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("work", help="vide la file jusqu'à interruption (Ctrl+C)")
+    p.add_argument("--workers", type=int, default=FEEDBACK_JOBS_WORKERS)
+    p = sub.add_parser("status", help="compteurs de la file, ou état d'un job")
+    p.add_argument("job_id", nargs="?")
+    args = ap.parse_args(argv)
+
+    queue = get_feedback_queue()
+    if args.cmd == "status":
+        if args.job_id:
+            job = queue.get(args.job_id)
+            if job is None:
+                print(f"✗ job inconnu : {args.job_id}")
+                return 1
+            print(f"{job.job_id} : {job.status} ({job.attempts}/{job.max_attempts})"
+                  + (f" — {job.error}" if job.error else ""))
+        else:
+            print("  ".join(f"{s}={n}" for s, n in queue.stats().items()))
+        return 0
+
+    pool = FeedbackWorkerPool(queue, args.workers).start()
+    print(f"✓ {pool.workers} workers sur {queue.path or ':memory:'} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(60)
+            logger.info("  ".join(f"{s}={n}" for s, n in queue.stats().items()))
+    except KeyboardInterrupt:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding="utf-8")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main())
@@ -28,15 +28,13 @@ Date   : 2026-08-02
 from __future__ import annotations
 
 import logging
-import os
 from pathlib import Path
 from typing import Dict, List, Optional, Set
 
-from dotenv import load_dotenv
-from openai import OpenAI
 
 from global_semantic_schema import GlobalSemanticReport
 from hybrid_search import HybridSearchEngine
+from llm_clients import ChatRequest, get_client
 from semantic_layer import get_concept, normalize_key, _get_ontology_v2
 
 logger = logging.getLogger(__name__)
@@ -48,38 +46,6 @@ MODEL = "gpt-4o-2024-08-06"
 MAX_CANDIDATES = 30
 
 
-# ---------------------------------------------------------------------------
-# Client OpenAI (singleton module-level)
-# ---------------------------------------------------------------------------
-
-_client: Optional[OpenAI] = None
-
-
-def _get_client() -> OpenAI:
-    global _client
-    if _client is None:
-        env_candidates = [
-            Path(".env"),
-            Path(__file__).parent / ".env",
-            Path(__file__).parent.parent / "ECG lecture" / ".env",
-        ]
-        for env_path in env_candidates:
-            if env_path.exists():
-                load_dotenv(env_path)
-                break
-        else:
-            load_dotenv()
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY non trouvée. "
-                "Ajoutez-la dans un fichier .env ou en variable d'environnement."
-            )
-        _client = OpenAI(api_key=api_key)
-    return _client
-
-
 _engine: Optional[HybridSearchEngine] = None
 
 
@@ -151,7 +117,8 @@ def build_candidate_catalog(
 
     # 1. Récupération lexicale/dense sur des fenêtres du texte entier
     for window in _naive_windows(texte_etudiant):
-        for cand in engine.search_top_k(window, k=5):
+        # Pool de rappel : on veut le voisinage complet, pas le coupe-circuit.
+        for cand in engine.search_top_k(window, k=5, exact_short_circuit=False):
             pool.add(cand["ontology_id"])
 
     # 2. Toujours inclure les concepts du contrat du cas (validants/exclusions)
@@ -247,7 +214,7 @@ def judge_global(
     Returns:
         GlobalSemanticReport structuré (aucune note).
     """
-    client = _get_client()
+    client = get_client()
     catalog = catalog if catalog is not None else build_candidate_catalog(
         texte_etudiant, golden_ids
     )
@@ -270,16 +237,18 @@ def judge_global(
         f"{len(catalog)} concepts candidats"
     )
 
-    response = client.beta.chat.completions.parse(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
+    response = ChatRequest(
+        dict(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
+            seed=42,
+        ),
         response_format=GlobalSemanticReport,
-        temperature=0,
-        seed=42,
-    )
+    ).send(lambda: client)
 
     result = response.choices[0].message.parsed
     if result is None:
@@ -5,16 +5,26 @@ Prend un terme brut extrait par GPT-4o (Brique 2) et trouve les Top-K
 meilleurs concepts correspondants dans l'ontologie locale.
 
 Deux moteurs combinés :
-  - Dense  (sémantique) : embedding OpenAI text-embedding-3-small + cosinus
-  - Sparse (lexical)     : BM25Okapi sur les surface_forms normalisés
+  - Dense  (sémantique) : embedding de la query (même backend/modèle que
+                          l'index : OpenAI, Ollama ou local CPU) + cosinus
+  - Sparse (lexical)     : BM25 Okapi vectorisé (sparse_bm25) sur les surface_forms normalisés
 
 Fusion via Reciprocal Rank Fusion (RRF) avec boost acronyme BM25.
 
+Coupe-circuit amont : si la query normalisée (ou une de ses variantes
+flexionnelles) est une forme d'UN SEUL concept, la table d'exact match
+pré-calculée suffit — aucun embedding, aucun BM25, aucun appel réseau.
+Désactivable (HYBRID_EXACT_SHORTCUT=0, ou exact_short_circuit=False).
+
+Variantes asyncio : asearch_top_k / asearch_top_k_many (seul l'embedding
+de la requête est asynchrone ; classement identique).
+
 Dépendances :
   - vecteurs_ontologie.npy   (matrice N×1536, produite par Brique 1)
   - metadata_ontologie.json  (registre i ↔ doc i, produit par Brique 1)
   - normalize_text / tokenize (fonctions de Brique 1)
-  - OpenAI API (text-embedding-3-small) pour vectoriser la requête
+  - Backend d'embeddings décrit par metadata_ontologie.json pour vectoriser
+    la requête (OpenAI par défaut ; cf. embedding_backends)
 
 Auteur : BMad Team
 Date   : 2026-02-25
@@ -22,100 +32,27 @@ Date   : 2026-02-25
 
 from __future__ import annotations
 
-import json
 import logging
 import os
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from dotenv import load_dotenv
-from openai import OpenAI
-from rank_bm25 import BM25Okapi
 
 # Import des utilitaires de normalisation de la Brique 1
-from ontology_index import normalize_text, tokenize
+from ontology_index import normalize_text, tokenize, top_k_indices
+from ontology_index import deflect as _deflect  # noqa: F401 — nom historique de ce module
+from embedding_backends import EmbeddingBackend, backend_from_index_meta
+from embedding_cache import QueryEmbeddingCache
+from index_store import DocumentTable, load_index
+from llm_clients import get_async_client, get_client
 
 logger = logging.getLogger(__name__)
 
 
-# ---------------------------------------------------------------------------
-# Flexion helper — normalise les variantes pluriel/genre du français médical
-# ---------------------------------------------------------------------------
-
-def _deflect(text: str) -> set:
-    """
-    Génère les variantes flexionnelles d'un texte normalisé pour
-    absorber les différences singulier/pluriel et masculin/féminin
-    dans le test d'exact match.
-
-    Ex: "qrs larges" → {"qrs large"}
-        "flutter atriale" → {"flutter atrial"}
-        "ondes t amples" → {"onde t ample", "ondes t ample", ...}
-
-    Ne touche PAS à normalize_text ni au BM25/embeddings,
-    s'applique uniquement au test is_exact_match.
-    """
-    variants = set()
-    words = text.split()
-    if not words:
-        return variants
-
-    # Pour chaque mot, générer la variante sans -s, -x, -es, -e final
-    for i, w in enumerate(words):
-        new_words = list(words)
-        # Pluriel : -s, -x
-        if w.endswith("s") and len(w) > 2 and not w.endswith("ss"):
-            new_words[i] = w[:-1]
-            variants.add(" ".join(new_words))
-        if w.endswith("x") and len(w) > 2:
-            new_words[i] = w[:-1]
-            variants.add(" ".join(new_words))
-        # Pluriel -es → -e (ex: "larges" → "large")
-        # Déjà couvert par le -s ci-dessus
-        # Genre : -e final (ex: "atriale" → "atrial")
-        if w.endswith("e") and len(w) > 3 and not w.endswith("ee"):
-            new_words[i] = w[:-1]
-            variants.add(" ".join(new_words))
-        # Genre inverse : ajouter -e (ex: "atrial" → "atriale")
-        if not w.endswith("e") and len(w) > 3:
-            new_words[i] = w + "e"
-            variants.add(" ".join(new_words))
-
-    return variants
-
-
-# ---------------------------------------------------------------------------
-# Client OpenAI (singleton module-level)
-# ---------------------------------------------------------------------------
-
-_client: Optional[OpenAI] = None
-
-
-def _get_client() -> OpenAI:
-    """Retourne le client OpenAI, en le créant si nécessaire."""
-    global _client
-    if _client is None:
-        env_candidates = [
-            Path(".env"),
-            Path(__file__).parent / ".env",
-            Path(__file__).parent.parent / "ECG lecture" / ".env",
-        ]
-        for env_path in env_candidates:
-            if env_path.exists():
-                load_dotenv(env_path)
-                break
-        else:
-            load_dotenv()
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY non trouvée. "
-                "Ajoutez-la dans un fichier .env ou en variable d'environnement."
-            )
-        _client = OpenAI(api_key=api_key)
-    return _client
+def _has_index(path: Path) -> bool:
+    """Un dossier d'index contient des métadonnées JSON et/ou un bundle compilé."""
+    return (path / "metadata_ontologie.json").exists() or (path / "bundle" / "manifest.json").exists()
 
 
 # ---------------------------------------------------------------------------
@@ -126,10 +63,13 @@ class HybridSearchEngine:
     """
     Moteur de recherche hybride (Dense + Sparse) sur l'ontologie ECG.
 
-    Initialisé une seule fois au démarrage, il charge en RAM :
-      - la matrice d'embeddings (411×1536, ~2.5 Mo)
+    Initialisé une seule fois au démarrage, il charge :
+      - la matrice d'embeddings (projetée en mémoire, mmap partagé entre
+        processus)
       - les métadonnées des documents
-      - l'index BM25
+      - l'index BM25 et la table d'exact match (lus depuis le bundle compilé
+        bundle/ si son manifest et ses empreintes sont valides, sinon
+        reconstruits depuis les fichiers historiques ; cf. index_store)
 
     La méthode .search_top_k() est ensuite ultra-rapide (~50 ms par requête,
     dominé par l'appel API OpenAI pour l'embedding de la query).
@@ -148,67 +88,113 @@ class HybridSearchEngine:
     # Modèle d'embedding (doit correspondre à celui de Brique 1)
     EMBEDDING_MODEL = "text-embedding-3-small"
 
-    def __init__(self, index_dir: str = "rag_index/"):
+    def __init__(
+        self,
+        index_dir: str = "rag_index/",
+        embedding_cache: Optional[QueryEmbeddingCache] = None,
+        embedding_backend: Optional[EmbeddingBackend] = None,
+        exact_short_circuit: Optional[bool] = None,
+    ):
         """
         Charge l'index pré-calculé depuis le disque.
 
         Args:
-            index_dir: Répertoire contenant vecteurs_ontologie.npy
-                       et metadata_ontologie.json.
+            index_dir:       Répertoire contenant vecteurs_ontologie.npy
+                             et metadata_ontologie.json.
+            embedding_cache: Cache des embeddings de requête. Par défaut,
+                             construit depuis l'environnement
+                             (cf. embedding_cache.QueryEmbeddingCache.from_env).
+            embedding_backend: Backend de vectorisation des requêtes. Par
+                             défaut, celui décrit par metadata_ontologie.json
+                             (embedding_backend / embedding_model / embedding_dims).
+            exact_short_circuit: Répondre depuis la table d'exact match, sans
+                             recherche, quand la query désigne un seul concept.
+                             Par défaut : HYBRID_EXACT_SHORTCUT (activé).
+
+        Raises:
+            ValueError: si la dimension déclarée par l'index (ou produite par
+                        le backend fourni) diffère de celle de la matrice.
         """
         index_path = Path(index_dir)
         # Vendoring self-contained : si le chemin par défaut (CWD-relatif) n'existe
         # pas, on se rabat sur le dossier rag_index/ livré à côté de ce module.
-        if not (index_path / "metadata_ontologie.json").exists():
+        if not _has_index(index_path):
             local = Path(__file__).parent / "rag_index"
-            if (local / "metadata_ontologie.json").exists():
+            if _has_index(local):
                 index_path = local
 
-        # --- 1. Chargement des embeddings ---
-        npy_path = index_path / "vecteurs_ontologie.npy"
-        if not npy_path.exists():
-            raise FileNotFoundError(f"Matrice d'embeddings introuvable : {npy_path}")
-        self.embeddings: np.ndarray = np.load(npy_path)
-
-        # --- 2. Chargement des métadonnées ---
-        json_path = index_path / "metadata_ontologie.json"
-        if not json_path.exists():
-            raise FileNotFoundError(f"Métadonnées introuvables : {json_path}")
-
-        with open(json_path, "r", encoding="utf-8") as f:
-            meta = json.load(f)
-
-        self.documents: List[Dict] = meta["documents"]
-        self.index_meta: Dict = {k: v for k, v in meta.items() if k != "documents"}
+        # --- 1 + 2. Embeddings (mmap) + métadonnées ---
+        # Bundle compilé par OntologyIndex.save (bundle/) : une poignée de
+        # mmaps, pages partagées entre workers. À défaut, fichiers historiques
+        # (vecteurs_ontologie.npy en mmap + metadata_ontologie.json).
+        bundle = load_index(index_path)
+        if bundle.embeddings is None:
+            raise FileNotFoundError(
+                f"Matrice d'embeddings introuvable : {index_path / 'vecteurs_ontologie.npy'}"
+            )
+        self.embeddings: np.ndarray = bundle.embeddings
+        self.documents: DocumentTable = bundle.documents
+        self.index_meta: Dict = bundle.index_meta
 
         assert len(self.documents) == self.embeddings.shape[0], (
             f"Incohérence : {len(self.documents)} documents vs "
             f"{self.embeddings.shape[0]} lignes d'embeddings"
         )
 
-        # --- 3. Construction de l'index BM25 ---
-        # Tokeniser chaque surface_form avec la même normalisation que Brique 1
-        self._bm25_corpus: List[List[str]] = [
-            tokenize(doc["surface_form"]) for doc in self.documents
-        ]
-        self._bm25 = BM25Okapi(self._bm25_corpus)
-
-        # --- 4. Index inverse : ontology_id → set(surface_forms normalisées) ---
-        # Utilisé par la Brique 4 (coupe-circuit) pour vérifier les matchs exacts
-        # contre TOUTES les formes d'un concept (canonical + synonymes)
-        self._normalized_forms_by_id: Dict[str, set] = {}
-        for doc in self.documents:
-            oid = doc["ontology_id"]
-            norm = normalize_text(doc["surface_form"])
-            if oid not in self._normalized_forms_by_id:
-                self._normalized_forms_by_id[oid] = set()
-            self._normalized_forms_by_id[oid].add(norm)
+        # --- 3. Index BM25 (surface_forms tokenisées comme en Brique 1) ---
+        self._bm25 = bundle.bm25
+
+        # --- 4. Table d'exact match : forme normalisée ou variante
+        # flexionnelle → concepts. Utilisée pour is_exact_match, qui déclenche
+        # le coupe-circuit de la Brique 4.
+        self._exact_matches = bundle.exact_matches
+        self._forms_by_id: Optional[Dict[str, List[Tuple[int, str]]]] = None
+        if exact_short_circuit is None:
+            exact_short_circuit = os.getenv("HYBRID_EXACT_SHORTCUT", "1").strip().lower() not in (
+                "0", "false", "no", "off",
+            )
+        self.exact_short_circuit = exact_short_circuit
+
+        # --- 5. Backend d'embeddings des requêtes ---
+        # Même espace vectoriel que l'index : backend, modèle et dimension sont
+        # lus dans les métadonnées produites par la Brique 1.
+        dims = int(self.embeddings.shape[1])
+        declared = self.index_meta.get("embedding_dims")
+        if declared is not None and int(declared) != dims:
+            raise ValueError(
+                f"Index incohérent : metadata déclare {declared} dimensions, "
+                f"la matrice d'embeddings en a {dims}."
+            )
+        if embedding_backend is None:
+            embedding_backend = backend_from_index_meta(
+                self.index_meta, self.EMBEDDING_MODEL,
+                client_factory=get_client,
+                async_client_factory=get_async_client,
+            )
+        if embedding_backend.dims is None:
+            embedding_backend.dims = dims
+        elif embedding_backend.dims != dims:
+            raise ValueError(
+                f"Backend {embedding_backend!r} incompatible avec l'index "
+                f"({dims} dimensions)."
+            )
+        self.embedding_backend = embedding_backend
+
+        # --- 6. Cache des embeddings de requête ---
+        # Backend, modèle et dimensions font partie de la clé : les entrées d'un
+        # autre modèle ne sont simplement plus jamais servies, et la borne
+        # LRU / taille disque finit par les évincer.
+        if embedding_cache is None:
+            embedding_cache = QueryEmbeddingCache.from_env(
+                f"{embedding_backend.name}:{embedding_backend.model}", dims,
+            )
+        self.embedding_cache = embedding_cache
 
         logger.info(
             f"🔍 HybridSearchEngine initialisé : "
             f"{len(self.documents)} documents, "
             f"embeddings {self.embeddings.shape}, "
-            f"modèle {self.index_meta.get('embedding_model', self.EMBEDDING_MODEL)}"
+            f"backend {embedding_backend.name}, modèle {embedding_backend.model}"
         )
 
     # ------------------------------------------------------------------
@@ -229,36 +215,140 @@ class HybridSearchEngine:
         Returns:
             Set de strings normalisés (ex: {"fibrillation atriale", "af", "fa"}).
         """
-        return self._normalized_forms_by_id.get(ontology_id, set())
+        return {form for _, form in self._concept_forms(ontology_id)}
+
+    def _concept_forms(self, ontology_id: str) -> List[Tuple[int, str]]:
+        """(index de document, surface_form normalisée) des documents d'un concept."""
+        if self._forms_by_id is None:
+            forms: Dict[str, List[Tuple[int, str]]] = {}
+            ids = self.documents.column("ontology_id")
+            surfaces = self.documents.column("surface_form")
+            for idx, (oid, surface) in enumerate(zip(ids, surfaces)):
+                forms.setdefault(oid, []).append((idx, normalize_text(surface)))
+            self._forms_by_id = forms
+        return self._forms_by_id.get(ontology_id, [])
+
+    # ------------------------------------------------------------------
+    # Coupe-circuit amont : table d'exact match
+    # ------------------------------------------------------------------
+
+    def _exact_short_circuit(self, query_norm: str) -> Optional[List[Dict]]:
+        """
+        Résultat immédiat si `query_norm` désigne exactement UN concept.
+
+        Le candidat renvoyé est le document du concept dont la forme
+        normalisée est la query elle-même, à défaut une de ses variantes
+        flexionnelles (deflect). Plusieurs concepts matchés → None : le
+        départage (candidat le plus spécifique, Brique 4) a besoin du
+        classement complet.
+        """
+        exact_ids = self._exact_matches.get(query_norm)
+        if len(exact_ids) != 1:
+            return None
+        (oid,) = exact_ids
+        forms = self._concept_forms(oid)
+        variants = _deflect(query_norm)
+        idx = next(
+            (i for i, form in forms if form == query_norm),
+            next((i for i, form in forms if form in variants), None),
+        )
+        if idx is None:  # table d'exact match d'un autre index que les documents
+            return None
+        doc = self.documents[idx]
+        return [{
+            "ontology_id": oid,
+            "surface_form": doc["surface_form"],
+            "concept_name": doc["concept_name"],
+            "source_type": doc["source_type"],
+            "categorie": doc["categorie"],
+            "poids": doc["poids"],
+            # Pas de recherche : aucun score de classement.
+            "rrf_score": 0.0,
+            "cosine_score": 0.0,
+            "bm25_score": 0.0,
+            "is_exact_match": True,
+        }]
 
     # ------------------------------------------------------------------
     # Recherche Dense (sémantique)
     # ------------------------------------------------------------------
 
-    def _search_dense(
-        self, query: str, pool_size: int = 30
-    ) -> List[Tuple[int, float]]:
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
         """
-        Recherche vectorielle : embedding de la query via OpenAI,
-        puis similarité cosinus contre la matrice locale.
+        Embeddings d'un lot de queries (matrice n×dims, float32).
 
-        Returns:
-            Liste de (index, score) triée par score décroissant.
+        Les queries déjà en cache sont servies localement ; toutes les
+        autres (dédupliquées) partent en UN SEUL appel au backend
+        d'embeddings, dont les résultats sont mis en cache.
         """
-        client = _get_client()
+        vecs, missing = self._cached_vectors(queries)
+        fetched = self.embedding_backend.embed(missing) if missing else None
+        return self._merge_vectors(queries, vecs, missing, fetched)
+
+    async def _aembed_queries(self, queries: List[str]) -> np.ndarray:
+        """Variante asyncio de _embed_queries (même cache, un seul appel)."""
+        vecs, missing = self._cached_vectors(queries)
+        fetched = await self.embedding_backend.aembed(missing) if missing else None
+        return self._merge_vectors(queries, vecs, missing, fetched)
+
+    def _cached_vectors(
+        self, queries: List[str],
+    ) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """Embeddings en cache (None sinon) + queries manquantes dédupliquées."""
+        vecs: List[Optional[np.ndarray]] = [
+            self.embedding_cache.get(q) for q in queries
+        ]
+        missing = list(dict.fromkeys(
+            q for q, v in zip(queries, vecs) if v is None
+        ))
+        return vecs, missing
 
-        response = client.embeddings.create(
-            model=self.EMBEDDING_MODEL,
-            input=[query],
+    def _merge_vectors(
+        self,
+        queries: List[str],
+        vecs: List[Optional[np.ndarray]],
+        missing: List[str],
+        fetched: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """Met en cache les embeddings obtenus du backend et assemble la matrice."""
+        if missing:
+            by_query: Dict[str, np.ndarray] = {}
+            for q, vec in zip(missing, fetched):
+                self.embedding_cache.put(q, vec)
+                by_query[q] = vec
+            vecs = [by_query[q] if v is None else v for q, v in zip(queries, vecs)]
+
+        return np.stack(vecs) if vecs else np.empty(
+            (0, self.embeddings.shape[1]), dtype=np.float32
         )
-        query_vec = np.array(response.data[0].embedding, dtype=np.float32)
 
-        # Dot product ≈ cosine similarity (vecteurs OpenAI déjà normalisés L2)
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embedding d'une query unique (cache ou backend)."""
+        return self._embed_queries([query])[0]
+
+    def _rank_dense(
+        self, query_vec: np.ndarray, pool_size: int
+    ) -> List[Tuple[int, float]]:
+        """Similarité cosinus d'un vecteur de query contre la matrice locale."""
+        # Dot product ≈ cosine similarity (vecteurs normalisés L2 : par l'API
+        # OpenAI, ou par embedding_backends pour Ollama / local)
         similarities = self.embeddings @ query_vec
 
-        top_indices = np.argsort(similarities)[::-1][:pool_size]
+        top_indices = top_k_indices(similarities, pool_size)
         return [(int(idx), float(similarities[idx])) for idx in top_indices]
 
+    def _search_dense(
+        self, query: str, pool_size: int = 30
+    ) -> List[Tuple[int, float]]:
+        """
+        Recherche vectorielle : embedding de la query (cache ou backend),
+        puis similarité cosinus contre la matrice locale.
+
+        Returns:
+            Liste de (index, score) triée par score décroissant.
+        """
+        return self._rank_dense(self._embed_query(query), pool_size)
+
     # ------------------------------------------------------------------
     # Recherche Sparse (BM25)
     # ------------------------------------------------------------------
@@ -276,8 +366,13 @@ class HybridSearchEngine:
         if not tokens:
             return []
 
-        scores = self._bm25.get_scores(tokens)
-        top_indices = np.argsort(scores)[::-1][:pool_size]
+        return self._rank_sparse(self._bm25.get_scores(tokens), pool_size)
+
+    def _rank_sparse(
+        self, scores: np.ndarray, pool_size: int
+    ) -> List[Tuple[int, float]]:
+        """Top pool_size des scores BM25 strictement positifs."""
+        top_indices = top_k_indices(scores, pool_size)
 
         return [
             (int(idx), float(scores[idx]))
@@ -328,6 +423,7 @@ class HybridSearchEngine:
         query: str,
         k: int = 5,
         pool_factor: int = 3,
+        exact_short_circuit: Optional[bool] = None,
     ) -> List[Dict]:
         """
         Recherche hybride : trouve les Top-K concepts ontologiques
@@ -336,11 +432,19 @@ class HybridSearchEngine:
         Le terme est normalisé via la même fonction que Brique 1
         avant d'être cherché dans les deux moteurs.
 
+        Coupe-circuit amont : si la query matche exactement un seul concept
+        (table pré-calculée), la réponse est ce seul candidat, marqué
+        is_exact_match=True et sans scores — aucun embedding ni BM25.
+
         Args:
             query:       Le terme brut extrait par GPT-4o (ex: "tachi supra").
             k:           Nombre de résultats à retourner.
             pool_factor: Facteur multiplicatif pour le pool de pré-sélection
                          (on cherche k × pool_factor dans chaque moteur avant fusion).
+            exact_short_circuit: Force (True) ou désactive (False) le
+                         coupe-circuit amont. Par défaut : réglage du moteur.
+                         À désactiver quand on veut le voisinage complet
+                         (pool de rappel, diagnostics).
 
         Returns:
             Liste de dictionnaires, chacun contenant :
@@ -357,6 +461,13 @@ class HybridSearchEngine:
         if not query_norm:
             return []
 
+        if exact_short_circuit is None:
+            exact_short_circuit = self.exact_short_circuit
+        if exact_short_circuit:
+            shortcut = self._exact_short_circuit(query_norm)
+            if shortcut is not None:
+                return shortcut
+
         pool_size = k * pool_factor
 
         # A. Dense (sémantique)
@@ -365,6 +476,144 @@ class HybridSearchEngine:
         # B. Sparse (BM25)
         sparse_results = self._search_sparse(query_norm, pool_size=pool_size)
 
+        # C + D. Fusion RRF et formatage
+        return self._assemble_results(query_norm, dense_results, sparse_results, k)
+
+    def search_top_k_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        pool_factor: int = 3,
+        exact_short_circuit: Optional[bool] = None,
+    ) -> List[List[Dict]]:
+        """
+        Version par lot de search_top_k : une réponse étudiante de N entités
+        coûte UN appel d'embedding (pour les queries absentes du cache) au
+        lieu de N allers-retours séquentiels.
+
+        Le résultat de chaque query est strictement identique à celui de
+        search_top_k(query, k, pool_factor) : seule la vectorisation est
+        mutualisée, le classement dense / BM25 / RRF reste le même code.
+        Les queries résolues par le coupe-circuit amont ne sont ni
+        vectorisées ni scorées.
+
+        Args:
+            queries:     Termes bruts (l'ordre est conservé, doublons admis).
+            k:           Nombre de résultats par query.
+            pool_factor: Cf. search_top_k.
+            exact_short_circuit: Cf. search_top_k.
+
+        Returns:
+            Une liste de résultats (format search_top_k) par query, dans
+            l'ordre de `queries` ([] pour une query vide après normalisation).
+        """
+        norms, by_norm, unique = self._plan_many(queries, exact_short_circuit)
+        # A. Dense : un seul lot d'embeddings pour toutes les queries.
+        vectors = self._embed_queries(unique)
+        return self._rank_many(norms, by_norm, unique, vectors, k, pool_factor)
+
+    async def asearch_top_k_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        pool_factor: int = 3,
+        exact_short_circuit: Optional[bool] = None,
+    ) -> List[List[Dict]]:
+        """
+        Variante asyncio de search_top_k_many : seule la vectorisation des
+        queries est asynchrone (AsyncOpenAI partagé, cf. llm_clients) ; le
+        classement est le même code, les résultats sont identiques.
+        """
+        norms, by_norm, unique = self._plan_many(queries, exact_short_circuit)
+        vectors = await self._aembed_queries(unique)
+        return self._rank_many(norms, by_norm, unique, vectors, k, pool_factor)
+
+    async def asearch_top_k(
+        self,
+        query: str,
+        k: int = 5,
+        pool_factor: int = 3,
+        exact_short_circuit: Optional[bool] = None,
+    ) -> List[Dict]:
+        """Variante asyncio de search_top_k."""
+        (results,) = await self.asearch_top_k_many(
+            [query], k=k, pool_factor=pool_factor,
+            exact_short_circuit=exact_short_circuit,
+        )
+        return results
+
+    def _plan_many(
+        self,
+        queries: List[str],
+        exact_short_circuit: Optional[bool],
+    ) -> Tuple[List[str], Dict[str, List[Dict]], List[str]]:
+        """
+        Normalise un lot de queries et applique le coupe-circuit amont.
+
+        Returns:
+            (queries normalisées, résultats déjà connus par query normalisée,
+             queries normalisées uniques restant à chercher)
+        """
+        norms = [normalize_text(q) for q in queries]
+        unique = list(dict.fromkeys(n for n in norms if n))
+
+        by_norm: Dict[str, List[Dict]] = {}
+        if exact_short_circuit is None:
+            exact_short_circuit = self.exact_short_circuit
+        if exact_short_circuit:
+            for query_norm in unique:
+                shortcut = self._exact_short_circuit(query_norm)
+                if shortcut is not None:
+                    by_norm[query_norm] = shortcut
+            unique = [n for n in unique if n not in by_norm]
+        return norms, by_norm, unique
+
+    def _rank_many(
+        self,
+        norms: List[str],
+        by_norm: Dict[str, List[Dict]],
+        unique: List[str],
+        vectors: np.ndarray,
+        k: int,
+        pool_factor: int,
+    ) -> List[List[Dict]]:
+        """Classement dense / BM25 / RRF d'un lot dont les embeddings sont connus."""
+        pool_size = k * pool_factor
+
+        # B. Sparse : BM25 de toutes les queries en un passage.
+        token_lists = [tokenize(n) for n in unique]
+        bm25_scores = self._bm25.get_scores_many(token_lists)
+
+        for i, query_norm in enumerate(unique):
+            # Le cosinus reste calculé query par query (même produit
+            # matrice-vecteur que _search_dense) : un produit matrice-matrice
+            # changerait l'ordre de sommation float32 et donc, à la marge,
+            # les scores et les égalités de rang.
+            dense_results = self._rank_dense(vectors[i], pool_size)
+            sparse_results = (
+                self._rank_sparse(bm25_scores[i], pool_size)
+                if token_lists[i] else []
+            )
+            # C + D. Fusion RRF et formatage
+            by_norm[query_norm] = self._assemble_results(
+                query_norm, dense_results, sparse_results, k
+            )
+
+        # Copie par query : l'appelant peut muter ses dicts sans effet de bord
+        # sur les doublons du même lot.
+        return [
+            [dict(r) for r in by_norm[n]] if n else []
+            for n in norms
+        ]
+
+    def _assemble_results(
+        self,
+        query_norm: str,
+        dense_results: List[Tuple[int, float]],
+        sparse_results: List[Tuple[int, float]],
+        k: int,
+    ) -> List[Dict]:
+        """Fusion RRF + formatage de la sortie publique (cf. search_top_k)."""
         # C. Fusion RRF
         fused = self._fuse_rrf(dense_results, sparse_results, k=k)
 
@@ -373,16 +622,16 @@ class HybridSearchEngine:
         sparse_by_idx = {idx: score for idx, score in sparse_results}
 
         # D. Formatage de la sortie
+        # La query normalisée matche-t-elle exactement une des surface_forms
+        # d'un concept (canonical OU synonyme), y compris via les variantes
+        # flexionnelles (pluriel/genre) pour absorber "QRS larges" vs
+        # "QRS large", "atriale" vs "atrial" ? Table pré-calculée : O(1).
+        exact_ids = self._exact_matches.get(query_norm)
         results = []
         for idx, rrf_score in fused:
             doc = self.documents[idx]
             oid = doc["ontology_id"]
-            # Vérifier si la query normalisée matche exactement une des
-            # surface_forms du concept (canonical OU synonyme).
-            # On teste aussi les variantes flexionnelles (pluriel/genre)
-            # pour absorber "QRS larges" vs "QRS large", "atriale" vs "atrial".
-            forms = self.get_all_normalized_forms(oid)
-            exact = query_norm in forms or bool(_deflect(query_norm) & forms)
+            exact = oid in exact_ids
             results.append({
                 "ontology_id": oid,
                 "surface_form": doc["surface_form"],
@@ -410,10 +659,11 @@ class HybridSearchEngine:
             "=" * 60,
             f"  Documents  : {len(self.documents)}",
             f"  Embeddings : {self.embeddings.shape}",
-            f"  Modèle     : {self.index_meta.get('embedding_model', '?')}",
+            f"  Modèle     : {self.embedding_backend.name}:{self.embedding_backend.model}",
             f"  BM25       : {'✅' if self._bm25 is not None else '❌'}",
             f"  RRF K      : {self.RRF_K}",
             f"  BM25 Boost : {self.BM25_BOOST}×",
+            f"  Cache emb. : {self.embedding_cache.stats()['disk_path'] or 'mémoire seule'}",
             "=" * 60,
         ]
         return "\n".join(lines)
@@ -456,4 +706,5 @@ if __name__ == "__main__":
                 f"— \"{r['surface_form']}\" ({r['source_type']}, {r['categorie']})"
             )
 
+    print(f"\n🧠 Cache d'embeddings : {engine.embedding_cache.stats()}")
     print("\n✅ Brique 3 — Recherche Hybride terminée.")
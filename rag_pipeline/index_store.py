@@ -0,0 +1,476 @@
+"""
+💾 Bundle d'index compilé — chargement par mmap, sans recalcul
+===============================================================
+Au démarrage, HybridSearchEngine chargeait la matrice d'embeddings en copie
+RAM complète, relisait le JSON (indenté) de toutes les métadonnées, puis
+re-tokenisait chaque surface_form pour reconstruire BM25 et l'index des
+formes normalisées. Avec plusieurs workers (Streamlit, grading par lot),
+chaque processus payait ce coût et gardait sa propre copie.
+
+OntologyIndex.save() produit désormais, à côté des fichiers historiques,
+un bundle versionné `bundle/` :
+
+    manifest.json              format, version, description de l'espace
+                               vectoriel, métadonnées d'index, et pour chaque
+                               fichier : taille + SHA-256
+    embeddings.npy             matrice N × dims (float32, ou float16)
+    doc_<colonne>*.npy         métadonnées documentaires en colonnes
+                               (ontology_id, surface_form, source_type,
+                               concept_name, categorie, poids)
+    bm25_*.npy                 statistiques BM25 pré-pondérées (SparseBM25)
+    exact_*.npy                table d'exact match : forme normalisée OU
+                               variante flexionnelle (cf. deflect) → concepts
+
+Les colonnes de chaînes sont stockées en UTF-8 concaténé + offsets
+(`<nom>_utf8.npy`, `<nom>_offsets.npy`) : compact et projetable en mémoire,
+contrairement aux chaînes NumPy à largeur fixe.
+
+Tout est relu en `mmap_mode="r"` : le démarrage se réduit à une poignée de
+projections mémoire, et les pages sont partagées entre processus.
+Exception : une matrice float16 n'est qu'un format disque (distribution,
+stockage) ; elle est convertie une fois en float32 en RAM au chargement,
+par processus (pas de produit matriciel float16 rapide dans NumPy).
+
+Intégrité :
+  - chaque fichier est vérifié en taille à l'ouverture (SHA-256 complet
+    avec verify="full", ou INDEX_BUNDLE_VERIFY=full) ;
+  - le manifest enregistre l'empreinte du metadata_ontologie.json écrit
+    en même temps : si celui-ci a été régénéré sans le bundle, le bundle
+    est ignoré (reconstruction en mémoire depuis les fichiers historiques).
+
+Génération pour un index existant :
+    python index_store.py rag_index/            (float32)
+    python index_store.py rag_index/ --float16  (fichier 2× plus léger)
+    python index_store.py rag_index/ --verify   (contrôle SHA-256 complet)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from local_cache import file_fingerprint
+from ontology_index import deflect, normalize_text, tokenize
+from sparse_bm25 import SparseBM25
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = "bundle"
+BUNDLE_FORMAT = "edu-ecg-index-bundle"
+BUNDLE_FORMAT_VERSION = 2
+
+# Colonnes documentaires, dans l'ordre des clés de metadata_ontologie.json.
+DOC_COLUMNS = ("ontology_id", "surface_form", "source_type", "concept_name", "categorie", "poids")
+
+_BM25_ARRAYS = ("indptr", "indices", "data", "doc_len", "idf", "params")
+
+
+# ---------------------------------------------------------------------------
+# Colonnes de chaînes (UTF-8 + offsets)
+# ---------------------------------------------------------------------------
+
+class StringArray:
+    """Séquence de chaînes stockée en un buffer UTF-8 et des offsets (mmap-able)."""
+
+    def __init__(self, utf8: np.ndarray, offsets: np.ndarray):
+        self.utf8 = utf8
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Sequence[str]) -> "StringArray":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        utf8 = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(utf8, offsets)
+
+    def raw(self, i: int) -> bytes:
+        return self.utf8[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+# ---------------------------------------------------------------------------
+# Documents en colonnes
+# ---------------------------------------------------------------------------
+
+class DocumentTable:
+    """
+    Vue « liste de dicts » sur des colonnes NumPy (éventuellement mmap).
+
+    `table[i]` renvoie le même dict que metadata_ontologie.json["documents"][i] ;
+    les colonnes restent accessibles directement (`table.column("ontology_id")`).
+    """
+
+    def __init__(self, columns: Dict[str, Union[StringArray, np.ndarray]]):
+        self._columns = columns
+        self._n = len(columns["ontology_id"])
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Dict]) -> "DocumentTable":
+        columns: Dict[str, Union[StringArray, np.ndarray]] = {
+            name: StringArray.from_strings([d[name] for d in documents])
+            for name in DOC_COLUMNS if name != "poids"
+        }
+        columns["poids"] = np.array([d["poids"] for d in documents], dtype=np.int16)
+        return cls(columns)
+
+    def column(self, name: str) -> Union[StringArray, np.ndarray]:
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += self._n
+        return {
+            name: int(self._columns[name][i]) if name == "poids" else self._columns[name][i]
+            for name in DOC_COLUMNS
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self._n):
+            yield self[i]
+
+
+# ---------------------------------------------------------------------------
+# Table d'exact match (formes normalisées + variantes flexionnelles)
+# ---------------------------------------------------------------------------
+
+def deflect_sources(form: str) -> set:
+    """
+    Inverse de deflect : toutes les requêtes q telles que `form ∈ deflect(q)`.
+
+    deflect ne modifie qu'un mot à la fois (retrait d'un -s/-x/-e final ou
+    ajout d'un -e) ; on génère donc, mot par mot, les antécédents possibles
+    puis on ne garde que ceux que deflect ramène effectivement sur `form`.
+    """
+    words = form.split()
+    sources = set()
+    for i, w in enumerate(words):
+        candidates = [w + "s", w + "x", w + "e"]
+        if w.endswith("e"):
+            candidates.append(w[:-1])
+        for c in candidates:
+            if not c:
+                continue
+            q = " ".join(words[:i] + [c] + words[i + 1:])
+            if form in deflect(q):
+                sources.add(q)
+    return sources
+
+
+class ExactMatchTable:
+    """
+    Clé normalisée → ensemble d'ontology_id matchés exactement.
+
+    Une requête normalisée q matche exactement le concept C si q est une des
+    formes normalisées de C, ou si une variante flexionnelle de q (deflect)
+    en est une — exactement le test historique de search_top_k, mais décidé
+    en un seul accès (recherche dichotomique sur des clés triées par octets
+    UTF-8, mmap).
+    """
+
+    def __init__(self, keys: StringArray, indptr: np.ndarray, codes: np.ndarray,
+                 concept_ids: StringArray):
+        self.keys = keys
+        self.indptr = indptr
+        self.codes = codes
+        self.concept_ids = concept_ids
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Dict]) -> "ExactMatchTable":
+        concept_ids = list(dict.fromkeys(d["ontology_id"] for d in documents))
+        code_of = {oid: i for i, oid in enumerate(concept_ids)}
+        table: Dict[str, set] = {}
+        for doc in documents:
+            form = normalize_text(doc["surface_form"])
+            code = code_of[doc["ontology_id"]]
+            for key in {form} | deflect_sources(form):
+                table.setdefault(key, set()).add(code)
+
+        keys = sorted(table, key=lambda k: k.encode("utf-8"))
+        counts = [len(table[k]) for k in keys]
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        codes = np.array([c for k in keys for c in sorted(table[k])], dtype=np.int32)
+        return cls(StringArray.from_strings(keys), indptr, codes,
+                   StringArray.from_strings(concept_ids))
+
+    def get(self, key: str) -> FrozenSet[str]:
+        """Concepts matchés exactement par la requête normalisée `key`."""
+        target = key.encode("utf-8")
+        lo, hi = 0, len(self.keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.keys.raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= len(self.keys) or self.keys.raw(lo) != target:
+            return frozenset()
+        codes = self.codes[self.indptr[lo]:self.indptr[lo + 1]]
+        return frozenset(self.concept_ids[int(c)] for c in codes)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def arrays(self) -> Dict[str, Union[StringArray, np.ndarray]]:
+        return {"keys": self.keys, "indptr": self.indptr, "codes": self.codes,
+                "concept_ids": self.concept_ids}
+
+
+# ---------------------------------------------------------------------------
+# Bundle
+# ---------------------------------------------------------------------------
+
+@dataclass
+class IndexBundle:
+    """Index complet prêt à servir (Briques 1 et 3)."""
+    documents: DocumentTable
+    embeddings: Optional[np.ndarray]
+    bm25: SparseBM25
+    exact_matches: ExactMatchTable
+    index_meta: Dict = field(default_factory=dict)
+
+
+def build_bundle(
+    documents: Sequence[Dict],
+    embeddings: Optional[np.ndarray],
+    index_meta: Dict,
+    bm25: Optional[SparseBM25] = None,
+) -> IndexBundle:
+    """Construit en mémoire toutes les structures dérivées (chemin lent)."""
+    if bm25 is None:
+        bm25 = SparseBM25([tokenize(d["surface_form"]) for d in documents])
+    return IndexBundle(
+        documents=DocumentTable.from_documents(documents),
+        embeddings=embeddings,
+        bm25=bm25,
+        exact_matches=ExactMatchTable.from_documents(documents),
+        index_meta=dict(index_meta),
+    )
+
+
+def load_embeddings(npy_path: Union[str, Path]) -> np.ndarray:
+    """Matrice d'embeddings en lecture seule, projetée en mémoire (mmap)."""
+    return np.load(npy_path, mmap_mode="r")
+
+
+def write_bundle(
+    index_dir: Union[str, Path],
+    bundle: IndexBundle,
+    embedding_dtype: str = "float32",
+) -> Path:
+    """
+    Écrit `bundle/` dans `index_dir`. Si metadata_ontologie.json y est déjà
+    écrit, son empreinte est enregistrée (détection de bundle périmé).
+
+    L'écriture se fait dans un dossier temporaire renommé à la fin : un
+    lecteur concurrent voit l'ancien bundle complet ou le nouveau, jamais
+    un mélange.
+    """
+    if embedding_dtype not in ("float32", "float16"):
+        raise ValueError(f"embedding_dtype non supporté : {embedding_dtype}")
+    index_dir = Path(index_dir)
+    final = index_dir / BUNDLE_DIR
+    tmp = index_dir / f".{BUNDLE_DIR}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    arrays: Dict[str, Union[StringArray, np.ndarray]] = {}
+    if bundle.embeddings is not None:
+        arrays["embeddings"] = np.asarray(bundle.embeddings).astype(embedding_dtype)
+    for name in DOC_COLUMNS:
+        arrays[f"doc_{name}"] = bundle.documents.column(name)
+    for name, arr in bundle.bm25.to_arrays().items():
+        arrays[f"bm25_{name}"] = arr
+    arrays["bm25_vocab"] = StringArray.from_strings(list(bundle.bm25.vocab))
+    for name, arr in bundle.exact_matches.arrays().items():
+        arrays[f"exact_{name}"] = arr
+
+    flat: Dict[str, np.ndarray] = {}
+    for name, arr in arrays.items():
+        if isinstance(arr, StringArray):
+            flat[f"{name}_utf8"] = arr.utf8
+            flat[f"{name}_offsets"] = arr.offsets
+        else:
+            flat[name] = arr
+
+    files = {}
+    for name, arr in flat.items():
+        path = tmp / f"{name}.npy"
+        np.save(path, np.ascontiguousarray(arr))
+        files[path.name] = {"bytes": path.stat().st_size, "sha256": file_fingerprint(path)}
+
+    meta_path = index_dir / "metadata_ontologie.json"
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_documents": len(bundle.documents),
+        "embedding_dtype": embedding_dtype if bundle.embeddings is not None else None,
+        "metadata_sha256": file_fingerprint(meta_path) if meta_path.exists() else None,
+        "index_meta": bundle.index_meta,
+        "files": files,
+    }
+    with open(tmp / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # Remplacement (quasi) atomique : les mmaps d'un ancien bundle restent
+    # valides tant qu'ils sont ouverts (inodes conservés).
+    old = index_dir / f".{BUNDLE_DIR}.old-{os.getpid()}"
+    if final.exists():
+        final.rename(old)
+    tmp.rename(final)
+    shutil.rmtree(old, ignore_errors=True)
+
+    logger.info(f"💾 Bundle écrit dans {final}/ ({len(bundle.documents)} documents, "
+                f"{len(bundle.exact_matches)} clés d'exact match, embeddings {embedding_dtype})")
+    return final
+
+
+def load_bundle(
+    index_dir: Union[str, Path],
+    verify: Optional[str] = None,
+) -> Optional[IndexBundle]:
+    """
+    Ouvre `bundle/` en mmap. Retourne None si absent, d'un autre format,
+    incomplet, corrompu (verify="full") ou périmé par rapport à
+    metadata_ontologie.json.
+
+    Args:
+        verify: "size" (défaut, taille de chaque fichier) ou "full"
+                (SHA-256 de chaque fichier). Défaut : INDEX_BUNDLE_VERIFY.
+    """
+    index_dir = Path(index_dir)
+    src = index_dir / BUNDLE_DIR
+    manifest_path = src / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    verify = (verify or os.getenv("INDEX_BUNDLE_VERIFY", "size")).lower()
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if (manifest.get("format") != BUNDLE_FORMAT
+                or manifest.get("format_version") != BUNDLE_FORMAT_VERSION):
+            logger.info(f"ℹ️  {src}/ : format {manifest.get('format_version')} ignoré")
+            return None
+
+        meta_path = index_dir / "metadata_ontologie.json"
+        expected_meta = manifest.get("metadata_sha256")
+        if expected_meta and meta_path.exists() and file_fingerprint(meta_path) != expected_meta:
+            logger.warning(f"⚠️  {src}/ périmé (métadonnées régénérées sans le bundle) : ignoré")
+            return None
+
+        for name, info in manifest["files"].items():
+            path = src / name
+            if path.stat().st_size != info["bytes"]:
+                raise ValueError(f"{name} : taille inattendue")
+            if verify == "full" and file_fingerprint(path) != info["sha256"]:
+                raise ValueError(f"{name} : SHA-256 invalide")
+
+        def arr(name: str) -> np.ndarray:
+            return np.load(src / f"{name}.npy", mmap_mode="r")
+
+        def strings(name: str) -> StringArray:
+            return StringArray(arr(f"{name}_utf8"), arr(f"{name}_offsets"))
+
+        bm25 = SparseBM25.from_arrays(
+            list(strings("bm25_vocab")),
+            {name: arr(f"bm25_{name}") for name in _BM25_ARRAYS},
+        )
+        columns: Dict[str, Union[StringArray, np.ndarray]] = {
+            name: strings(f"doc_{name}") for name in DOC_COLUMNS if name != "poids"
+        }
+        columns["poids"] = arr("doc_poids")
+        embeddings = arr("embeddings") if "embeddings.npy" in manifest["files"] else None
+        if embeddings is not None and embeddings.dtype != np.float32:
+            # float16 = format de stockage : `M16 @ q` recopierait (en float32)
+            # toute la matrice à chaque requête, et NumPy n'a pas de produit
+            # float16 rapide. Conversion unique au chargement.
+            embeddings = np.array(embeddings, dtype=np.float32)
+        return IndexBundle(
+            documents=DocumentTable(columns),
+            embeddings=embeddings,
+            bm25=bm25,
+            exact_matches=ExactMatchTable(
+                strings("exact_keys"), arr("exact_indptr"), arr("exact_codes"),
+                strings("exact_concept_ids"),
+            ),
+            index_meta=manifest.get("index_meta", {}),
+        )
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️  {src}/ illisible ({e}) : ignoré")
+        return None
+
+
+def load_legacy(index_dir: Union[str, Path]) -> IndexBundle:
+    """
+    Construit l'index depuis les fichiers historiques (metadata_ontologie.json
+    + vecteurs_ontologie.npy en mmap), en recalculant les structures dérivées.
+    """
+    index_dir = Path(index_dir)
+    json_path = index_dir / "metadata_ontologie.json"
+    if not json_path.exists():
+        raise FileNotFoundError(f"Métadonnées introuvables : {json_path}")
+    with open(json_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    documents = meta.pop("documents")
+
+    npy_path = index_dir / "vecteurs_ontologie.npy"
+    embeddings = load_embeddings(npy_path) if npy_path.exists() else None
+    return build_bundle(documents, embeddings, meta)
+
+
+def load_index(index_dir: Union[str, Path]) -> IndexBundle:
+    """Bundle compilé s'il est présent et valide, sinon fichiers historiques."""
+    bundle = load_bundle(index_dir)
+    if bundle is not None:
+        return bundle
+    return load_legacy(index_dir)
+
+
+# ---------------------------------------------------------------------------
+# CLI : compile (ou vérifie) le bundle d'un index existant
+# ---------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Compile le bundle mmap d'un index existant.")
+    parser.add_argument("index_dir", nargs="?", default=str(Path(__file__).parent / "rag_index"))
+    parser.add_argument("--float16", action="store_true", help="Embeddings stockés en float16 (disque seulement, float32 en RAM).")
+    parser.add_argument("--verify", action="store_true", help="Vérifie le bundle existant (SHA-256).")
+    args = parser.parse_args()
+
+    if args.verify:
+        ok = load_bundle(args.index_dir, verify="full") is not None
+        print("✅ Bundle valide" if ok else "❌ Bundle absent, périmé ou corrompu")
+        raise SystemExit(0 if ok else 1)
+
+    legacy = load_legacy(args.index_dir)
+    write_bundle(args.index_dir, legacy, "float16" if args.float16 else "float32")
+    print(f"✅ {Path(args.index_dir) / BUNDLE_DIR}/ généré")
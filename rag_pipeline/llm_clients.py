@@ -0,0 +1,428 @@
+"""
+🔌 Clients LLM — mêmes appels en synchrone et en asyncio
+==========================================================
+Le pipeline (NER, Juge, feedback pédagogique) enchaîne des appels OpenAI
+entremêlés de logique métier : garde-fous, re-tentatives, validations. Pour
+offrir une API asyncio (front web multi-étudiants) SANS dupliquer cette
+logique, chaque enchaînement est écrit une seule fois sous forme de
+générateur de « requêtes » :
+
+    def _steps(...):
+        response = yield ChatRequest({...})          # un appel LLM
+        ...                                          # logique métier
+        return resultat
+
+et exécuté par l'un des deux pilotes :
+    run_steps(steps, get_client)        → client OpenAI synchrone partagé
+    await arun_steps(steps)             → AsyncOpenAI partagé
+
+iter_steps / aiter_steps sont les pilotes « suivis » (rapport en flux) :
+ils produisent chaque requête juste avant son envoi ; run_steps et
+arun_steps se contentent de les vider. Le résultat de l'enchaînement est
+renvoyé par `yield from iter_steps(...)` en synchrone, et déposé dans un
+StepsResult en asynchrone (un générateur asynchrone ne renvoie pas de
+valeur).
+
+Une exception levée par l'appel est renvoyée DANS le générateur, au point
+du `yield` : ses try/except se comportent exactement comme en appel direct.
+Les deux chemins produisent donc le même résultat pour les mêmes réponses.
+
+Un travail synchrone bloquant au milieu d'un enchaînement (ex. recherche
+hybride du fallback sous-termes) se déclare par `yield BlockingCall(fn, ...)` :
+appel direct en synchrone, thread (asyncio.to_thread) en asynchrone.
+
+Registre des clients : un seul OpenAI synchrone par processus et un seul
+AsyncOpenAI par boucle d'événements, partagés par NER, embeddings, Juge,
+Juge global et feedback — un pool HTTP keep-alive (HTTP/2 si `h2` est
+installé), donc plus de poignée de main TLS par copie en régime établi.
+set_client / set_async_client injectent un client (tests, serveur local).
+Les endpoints OpenAI-compatibles (Ollama) ont leur entrée, par base_url :
+get_endpoint_client / set_endpoint_client, même pool et pas de
+re-tentative côté SDK.
+
+Configuration du pool :
+  LLM_HTTP_TIMEOUT / LLM_HTTP_CONNECT_TIMEOUT   délais en s (défaut 60 / 5)
+  LLM_HTTP_MAX_CONNECTIONS                      connexions simultanées (64)
+  LLM_HTTP_KEEPALIVE_CONNECTIONS / _EXPIRY      connexions gardées (32, 300 s)
+  LLM_HTTP2                                     0 = HTTP/1.1 même si h2 présent
+
+Chaque appel passe par l'ordonnanceur partagé (llm_scheduler) : budgets
+par modèle, re-tentatives, priorités.
+
+Comptage : `with count_api_calls() as calls:` compte, par modèle, les
+appels API émis dans le contexte courant (tâches asyncio et threads
+asyncio.to_thread compris) — débit des corrections par lot.
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Generator, Generic, Iterator, Optional, Type, TypeVar, Union,
+)
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from llm_scheduler import estimate_chat_tokens, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# ---------------------------------------------------------------------------
+# Configuration (.env)
+# ---------------------------------------------------------------------------
+
+def load_openai_api_key() -> str:
+    """
+    Charge le premier .env trouvé (CWD, rag_pipeline/, ECG lecture/) et
+    retourne OPENAI_API_KEY.
+
+    Raises:
+        RuntimeError: si la clé est introuvable.
+    """
+    env_candidates = [
+        Path(".env"),
+        Path(__file__).parent / ".env",
+        Path(__file__).parent.parent / "ECG lecture" / ".env",
+    ]
+    for env_path in env_candidates:
+        if env_path.exists():
+            load_dotenv(env_path)
+            break
+    else:
+        load_dotenv()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "OPENAI_API_KEY non trouvée. "
+            "Ajoutez-la dans un fichier .env ou en variable d'environnement."
+        )
+    return api_key
+
+
+# ---------------------------------------------------------------------------
+# Registre des clients (un pool HTTP partagé par processus)
+# ---------------------------------------------------------------------------
+
+# Pool de connexions : keep-alive long (un même processus corrige en continu),
+# HTTP/2 si le paquet `h2` est installé (pip install "httpx[http2]").
+HTTP_TIMEOUT_S = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "300"))
+
+
+def _http2_available() -> bool:
+    if os.getenv("LLM_HTTP2", "1").strip().lower() in ("0", "false", "off", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def _http_options() -> Dict[str, Any]:
+    """Options du client httpx : délais, pool keep-alive, HTTP/2."""
+    import httpx
+
+    return dict(
+        timeout=httpx.Timeout(HTTP_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+        http2=_http2_available(),
+    )
+
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+# Endpoints OpenAI-compatibles (Ollama…), un client par base_url.
+_endpoint_clients: Dict[str, OpenAI] = {}
+
+# Un AsyncOpenAI (et son pool httpx) est lié à la boucle qui l'utilise.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+_async_clients_lock = threading.Lock()
+_async_client_override: Optional[AsyncOpenAI] = None
+
+
+def get_client() -> OpenAI:
+    """
+    OpenAI synchrone partagé par tout le processus (NER, Juge, Juge global,
+    feedback, embeddings), créé à la première demande.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            options = _http_options()
+            _client = OpenAI(
+                api_key=load_openai_api_key(),
+                # Re-tentatives : llm_scheduler (une seule couche, budgets partagés).
+                max_retries=0,
+                timeout=options["timeout"],
+                http_client=DefaultHttpxClient(**options),
+            )
+        return _client
+
+
+def get_endpoint_client(base_url: str, api_key: str) -> OpenAI:
+    """
+    OpenAI synchrone partagé d'un endpoint compatible (ex. Ollama local),
+    créé à la première demande avec le même pool que get_client.
+    """
+    with _client_lock:
+        client = _endpoint_clients.get(base_url)
+        if client is None:
+            options = _http_options()
+            client = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                timeout=options["timeout"],
+                http_client=DefaultHttpxClient(**options),
+            )
+            _endpoint_clients[base_url] = client
+        return client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """AsyncOpenAI partagé de la boucle d'événements courante."""
+    if _async_client_override is not None:
+        return _async_client_override
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            options = _http_options()
+            client = AsyncOpenAI(
+                api_key=load_openai_api_key(),
+                max_retries=0,
+                timeout=options["timeout"],
+                http_client=DefaultAsyncHttpxClient(**options),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+def set_client(client: Optional[OpenAI]) -> None:
+    """Injecte le client synchrone partagé (tests, endpoint compatible) ; None = défaut."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def set_endpoint_client(base_url: str, client: Optional[OpenAI]) -> None:
+    """Injecte le client d'un endpoint compatible (tests) ; None = défaut."""
+    with _client_lock:
+        if client is None:
+            _endpoint_clients.pop(base_url, None)
+        else:
+            _endpoint_clients[base_url] = client
+
+
+def set_async_client(client: Optional[AsyncOpenAI]) -> None:
+    """Injecte le client asynchrone, toutes boucles confondues ; None = défaut."""
+    global _async_client_override
+    _async_client_override = client
+
+
+# ---------------------------------------------------------------------------
+# Comptage des appels API
+# ---------------------------------------------------------------------------
+
+class ApiCallCounter:
+    """Nombre d'appels API par modèle (thread-safe)."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, model: str) -> None:
+        with self._lock:
+            self._counts[model] += 1
+
+    def by_model(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+
+_api_call_counter: "contextvars.ContextVar[Optional[ApiCallCounter]]" = (
+    contextvars.ContextVar("api_call_counter", default=None)
+)
+
+
+@contextmanager
+def count_api_calls(counter: Optional[ApiCallCounter] = None) -> Iterator[ApiCallCounter]:
+    """Compte les appels API émis dans ce contexte (cf. docstring du module)."""
+    counter = counter if counter is not None else ApiCallCounter()
+    token = _api_call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _api_call_counter.reset(token)
+
+
+def record_api_call(model: str) -> None:
+    """Signale un appel API au compteur actif (sans effet hors count_api_calls)."""
+    counter = _api_call_counter.get()
+    if counter is not None:
+        counter.add(model)
+
+
+# ---------------------------------------------------------------------------
+# Requêtes et pilotes
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ChatRequest:
+    """
+    Un appel chat completions, décrit sans être exécuté.
+
+    `params` : arguments de chat.completions.create (model, messages, ...).
+    `response_format` : schéma Pydantic → Structured Outputs
+                        (beta.chat.completions.parse).
+    `etape` : libellé de progression (ex. "redaction"), sans effet sur l'appel.
+    """
+    params: Dict[str, Any]
+    response_format: Optional[Type] = None
+    etape: str = ""
+
+    def send(self, client_factory: Callable[[], OpenAI]):
+        client = client_factory()
+        model = self.params.get("model", "")
+        record_api_call(model)
+        tokens = estimate_chat_tokens(self.params)
+        if self.response_format is not None:
+            return get_scheduler().call(
+                model, client.beta.chat.completions.parse,
+                tokens=tokens, response_format=self.response_format, **self.params
+            )
+        return get_scheduler().call(
+            model, client.chat.completions.create, tokens=tokens, **self.params
+        )
+
+    async def asend(self, client_factory: Callable[[], AsyncOpenAI]):
+        client = client_factory()
+        model = self.params.get("model", "")
+        record_api_call(model)
+        tokens = estimate_chat_tokens(self.params)
+        if self.response_format is not None:
+            return await get_scheduler().acall(
+                model, client.beta.chat.completions.parse,
+                tokens=tokens, response_format=self.response_format, **self.params
+            )
+        return await get_scheduler().acall(
+            model, client.chat.completions.create, tokens=tokens, **self.params
+        )
+
+
+class BlockingCall:
+    """Travail synchrone (I/O bloquante) au sein d'un enchaînement."""
+
+    def __init__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def send(self, client_factory: Callable[[], OpenAI]):
+        return self.fn(*self.args, **self.kwargs)
+
+    async def asend(self, client_factory: Callable[[], AsyncOpenAI]):
+        return await asyncio.to_thread(self.fn, *self.args, **self.kwargs)
+
+
+# Enchaînement d'appels : reçoit la réponse de chaque requête produite.
+LLMSteps = Generator[Union[ChatRequest, BlockingCall], Any, T]
+
+
+def run_steps(steps: LLMSteps[T], client_factory: Callable[[], OpenAI]) -> T:
+    """Exécute un enchaînement d'appels LLM avec un client synchrone."""
+    driver = iter_steps(steps, client_factory)
+    try:
+        while True:
+            next(driver)
+    except StopIteration as stop:
+        return stop.value
+
+
+def iter_steps(
+    steps: LLMSteps[T], client_factory: Callable[[], OpenAI]
+) -> Generator[Union[ChatRequest, BlockingCall], None, T]:
+    """
+    Comme run_steps, mais produit chaque requête juste avant de l'envoyer
+    (suivi de progression). `resultat = yield from iter_steps(...)`.
+    """
+    try:
+        request = next(steps)
+        while True:
+            yield request
+            try:
+                response = request.send(client_factory)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+@dataclass
+class StepsResult(Generic[T]):
+    """Résultat d'un enchaînement piloté par aiter_steps."""
+    value: Optional[T] = None
+
+
+async def aiter_steps(
+    steps: LLMSteps[T],
+    client_factory: Callable[[], AsyncOpenAI],
+    result: StepsResult[T],
+) -> AsyncIterator[Union[ChatRequest, BlockingCall]]:
+    """
+    Comme iter_steps, avec le client asynchrone. Le résultat de
+    l'enchaînement est déposé dans `result.value` en fin d'itération.
+    """
+    try:
+        request = next(steps)
+        while True:
+            yield request
+            try:
+                response = await request.asend(client_factory)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        result.value = stop.value
+
+
+async def arun_steps(steps: LLMSteps[T], client: Optional[AsyncOpenAI] = None) -> T:
+    """Exécute un enchaînement d'appels LLM avec le client asynchrone partagé."""
+    client_factory = (lambda: client) if client is not None else get_async_client
+    result: StepsResult[T] = StepsResult()
+    async for _ in aiter_steps(steps, client_factory, result):
+        pass
+    return result.value
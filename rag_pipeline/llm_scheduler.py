@@ -0,0 +1,467 @@
+"""
+🚦 Ordonnanceur des appels LLM — budgets, re-tentatives, priorités
+===================================================================
+Point de passage unique de tous les appels API du pipeline (NER, Juge,
+Juge global, feedback, embeddings) : les modules partagent les mêmes
+budgets au lieu de s'ignorer mutuellement.
+
+  • Budgets par modèle : deux seaux à jetons (requêtes/min et tokens/min)
+    remplis en continu. Les tokens d'une requête sont estimés à l'envoi
+    (≈ 4 caractères/token + max_tokens) puis réconciliés avec `usage`.
+  • Adaptatif : un 429 divise par deux le débit du modèle et suspend ses
+    envois pendant Retry-After ; chaque succès le restaure de 2 %.
+  • Re-tentatives : backoff exponentiel avec jitter, Retry-After respecté ;
+    429 / 408 / 409 / 5xx / erreurs réseau. `insufficient_quota` n'est
+    pas re-tenté (la re-tentative ne peut pas réussir).
+  • Priorités : INTERACTIVE (correction d'un étudiant, défaut) réserve sa
+    place dans le seau ; BATCH (re-corrections, benchmarks) ne part que
+    s'il reste de la capacité immédiate — il cède toujours le pas.
+  • Métriques : attente en file (moyenne, p95, max) par modèle et priorité,
+    re-tentatives, échecs, tokens consommés.
+
+Usage :
+    scheduler = get_scheduler()
+    response = scheduler.call("gpt-4o", client.chat.completions.create,
+                              tokens=estimate_chat_tokens(params), **params)
+    response = await scheduler.acall(...)          # même chose, asyncio
+
+    with llm_priority(Priority.BATCH):             # lot hors ligne
+        ...
+    print(format_scheduler_metrics())
+
+Les clients OpenAI sont créés avec max_retries=0 : les re-tentatives sont
+faites ici, une seule fois, en connaissance des budgets.
+
+Configuration :
+  LLM_BUDGETS        budgets "modèle=rpm:tpm,..." (préfixe de nom de modèle ;
+                     "off" = pas de budgets, re-tentatives seules)
+                     défaut : gpt-4o=5000:800000, gpt-4o-mini=5000:4000000,
+                              text-embedding-3=5000:5000000
+  LLM_MAX_RETRIES    re-tentatives par appel (défaut 6)
+  LLM_BACKOFF_BASE   délai initial en secondes (défaut 1)
+  LLM_BACKOFF_MAX    délai maximal en secondes (défaut 60)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Budgets par défaut (palier 3 OpenAI, requêtes/min : tokens/min). Un compte
+# moins bien doté est ramené à son débit réel par l'ajustement sur 429.
+DEFAULT_BUDGETS = "gpt-4o=5000:800000,gpt-4o-mini=5000:4000000,text-embedding-3=5000:5000000"
+
+# Complétion supposée quand la requête ne fixe pas max_tokens.
+DEFAULT_COMPLETION_TOKENS = 500
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: "contextvars.ContextVar[Priority]" = contextvars.ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: Priority) -> Iterator[None]:
+    """
+    Priorité des appels émis dans ce contexte. Seuls en héritent les tâches
+    asyncio, asyncio.to_thread et les contextes copiés explicitement
+    (contextvars.copy_context) : un thread ordinaire repart en INTERACTIVE.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# Estimation des tokens
+# ---------------------------------------------------------------------------
+
+def estimate_text_tokens(*texts: str) -> int:
+    """≈ 4 caractères par token (ordre de grandeur suffisant pour un budget)."""
+    return max(1, sum(len(t) for t in texts) // 4)
+
+
+def estimate_chat_tokens(params: Dict[str, Any]) -> int:
+    """Prompt estimé + complétion maximale (comme le décompte TPM d'OpenAI)."""
+    prompt = json.dumps(params.get("messages", []), ensure_ascii=False)
+    return estimate_text_tokens(prompt) + int(
+        params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    )
+
+
+# ---------------------------------------------------------------------------
+# Seaux à jetons
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ModelBudget:
+    rpm: float
+    tpm: float
+
+
+def parse_budgets(spec: str) -> Dict[str, ModelBudget]:
+    """'gpt-4o=500:30000,...' → {préfixe: ModelBudget}."""
+    budgets: Dict[str, ModelBudget] = {}
+    if spec.strip().lower() == "off":
+        return budgets
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, _, limits = entry.partition("=")
+        rpm, _, tpm = limits.partition(":")
+        budgets[name.strip()] = ModelBudget(float(rpm), float(tpm or 0))
+    return budgets
+
+
+class _Bucket:
+    """Seau à jetons : capacité = budget d'une minute, remplissage continu."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, scale: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def delay(self, amount: float, scale: float) -> float:
+        """Secondes avant que `amount` soit disponible (0 si tout de suite)."""
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / (self.rate * scale))
+
+
+@dataclass
+class _WaitStats:
+    n: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def add(self, wait_s: float) -> None:
+        self.n += 1
+        self.total_s += wait_s
+        self.max_s = max(self.max_s, wait_s)
+        self.recent.append(wait_s)
+
+    def as_dict(self) -> Dict[str, float]:
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "requests": self.n,
+            "wait_avg_s": round(self.total_s / self.n, 3) if self.n else 0.0,
+            "wait_p95_s": round(p95, 3),
+            "wait_max_s": round(self.max_s, 3),
+        }
+
+
+class _ModelState:
+    """Budgets, facteur adaptatif et compteurs d'un modèle."""
+
+    def __init__(self, budget: Optional[ModelBudget]):
+        self.requests = _Bucket(budget.rpm) if budget and budget.rpm else None
+        self.tokens = _Bucket(budget.tpm) if budget and budget.tpm else None
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.waits: Dict[Priority, _WaitStats] = {p: _WaitStats() for p in Priority}
+        self.retries = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.tokens_used = 0
+
+
+# ---------------------------------------------------------------------------
+# Re-tentatives
+# ---------------------------------------------------------------------------
+
+def retry_after_s(error: BaseException) -> Optional[float]:
+    """Délai demandé par le serveur (retry-after-ms / retry-after), sinon None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erreur transitoire (débit, surcharge, réseau) — pas un quota épuisé."""
+    if isinstance(error, openai.APIConnectionError):  # inclut APITimeoutError
+        return True
+    if isinstance(error, openai.RateLimitError):
+        return getattr(error, "code", None) != "insufficient_quota"
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Ordonnanceur
+# ---------------------------------------------------------------------------
+
+class LLMScheduler:
+    """Budgets partagés + re-tentatives pour les appels sync et asyncio."""
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, ModelBudget]] = None,
+        max_retries: int = 6,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+    ):
+        self.budgets = budgets or {}
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self._models: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            budgets=parse_budgets(os.getenv("LLM_BUDGETS", DEFAULT_BUDGETS)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "6")),
+            backoff_base_s=float(os.getenv("LLM_BACKOFF_BASE", "1")),
+            backoff_max_s=float(os.getenv("LLM_BACKOFF_MAX", "60")),
+        )
+
+    # ------------------------------------------------------------------
+    # Budgets
+    # ------------------------------------------------------------------
+
+    def _state(self, model: str) -> _ModelState:
+        """État du modèle (budget du plus long préfixe configuré). Sous verrou."""
+        state = self._models.get(model)
+        if state is None:
+            prefixes = [p for p in self.budgets if model.startswith(p)]
+            budget = self.budgets[max(prefixes, key=len)] if prefixes else None
+            state = self._models[model] = _ModelState(budget)
+        return state
+
+    def _reserve(self, model: str, tokens: int, priority: Priority) -> Tuple[bool, float]:
+        """
+        (accordé, délai). INTERACTIVE : toujours accordé, après `délai`
+        (la place est réservée). BATCH : accordé seulement sans attente ;
+        sinon réessayer après `délai`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            delay = max(0.0, state.paused_until - now)
+            for bucket, amount in ((state.requests, 1), (state.tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now, state.scale)
+                    delay = max(delay, bucket.delay(amount, state.scale))
+            if priority == Priority.BATCH and delay > 0:
+                return False, delay
+            if state.requests is not None:
+                state.requests.level -= 1
+            if state.tokens is not None:
+                state.tokens.level -= min(tokens, state.tokens.capacity)
+            return True, delay
+
+    def _record_wait(self, model: str, priority: Priority, wait_s: float) -> None:
+        with self._lock:
+            self._state(model).waits[priority].add(wait_s)
+
+    def _on_success(self, model: str, estimated: int, response: Any) -> None:
+        usage = getattr(response, "usage", None)
+        actual = getattr(usage, "total_tokens", None) if usage is not None else None
+        with self._lock:
+            state = self._state(model)
+            state.scale = min(1.0, state.scale * 1.02)
+            state.tokens_used += actual if actual is not None else estimated
+            if actual is not None and state.tokens is not None:
+                # Réconciliation : l'estimation était trop haute ou trop basse.
+                state.tokens.level -= actual - min(estimated, state.tokens.capacity)
+
+    def _on_error(self, model: str, error: BaseException, attempt: int) -> Optional[float]:
+        """Délai avant re-tentative, ou None si l'erreur est définitive."""
+        retryable = is_retryable(error) and attempt < self.max_retries
+        retry_after = retry_after_s(error)
+        with self._lock:
+            state = self._state(model)
+            if not retryable:
+                state.failures += 1
+                return None
+            state.retries += 1
+            if isinstance(error, openai.RateLimitError) or getattr(error, "status_code", None) == 429:
+                # Le serveur a refusé : le budget configuré est trop optimiste.
+                state.rate_limited += 1
+                state.scale = max(0.1, state.scale * 0.5)
+                if retry_after:
+                    state.paused_until = max(
+                        state.paused_until, time.monotonic() + retry_after
+                    )
+        backoff = min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt)
+        delay = backoff * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        logger.warning(
+            f"⏳ {model} : {type(error).__name__} — nouvelle tentative "
+            f"{attempt + 1}/{self.max_retries} dans {delay:.1f}s"
+        )
+        return delay
+
+    # ------------------------------------------------------------------
+    # Appels
+    # ------------------------------------------------------------------
+
+    def call(
+        self, model: str, fn: Callable[..., T], /, *args: Any, tokens: int = 0, **kwargs: Any,
+    ) -> T:
+        """
+        Appel synchrone : attend son tour, re-tente les erreurs transitoires.
+        `model` / `fn` sont positionnels : `model=` peut figurer dans kwargs (API).
+        """
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            granted, delay = self._reserve(model, tokens, priority)
+            while not granted:
+                time.sleep(delay)
+                granted, delay = self._reserve(model, tokens, priority)
+            if delay:
+                time.sleep(delay)
+            self._record_wait(model, priority, time.monotonic() - t0)
+            try:
+                response = fn(*args, **kwargs)
+            except Exception as e:
+                retry_in = self._on_error(model, e, attempt)
+                if retry_in is None:
+                    raise
+                time.sleep(retry_in)
+                attempt += 1
+                continue
+            self._on_success(model, tokens, response)
+            return response
+
+    async def acall(
+        self,
+        model: str,
+        fn: Callable[..., Awaitable[T]],
+        /,
+        *args: Any,
+        tokens: int = 0,
+        **kwargs: Any,
+    ) -> T:
+        """Variante asyncio de call (`fn` renvoie un awaitable)."""
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            granted, delay = self._reserve(model, tokens, priority)
+            while not granted:
+                await asyncio.sleep(delay)
+                granted, delay = self._reserve(model, tokens, priority)
+            if delay:
+                await asyncio.sleep(delay)
+            self._record_wait(model, priority, time.monotonic() - t0)
+            try:
+                response = await fn(*args, **kwargs)
+            except Exception as e:
+                retry_in = self._on_error(model, e, attempt)
+                if retry_in is None:
+                    raise
+                await asyncio.sleep(retry_in)
+                attempt += 1
+                continue
+            self._on_success(model, tokens, response)
+            return response
+
+    # ------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Par modèle : attentes par priorité, re-tentatives, échecs, tokens."""
+        with self._lock:
+            return {
+                model: {
+                    "waits": {p.name.lower(): s.as_dict() for p, s in state.waits.items()},
+                    "retries": state.retries,
+                    "rate_limited": state.rate_limited,
+                    "failures": state.failures,
+                    "tokens_used": state.tokens_used,
+                    "rate_scale": round(state.scale, 3),
+                }
+                for model, state in self._models.items()
+            }
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Ordonnanceur partagé du processus (configuré par l'environnement)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler.from_env()
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[LLMScheduler]) -> None:
+    """Remplace l'ordonnanceur partagé (tests, budgets fixés par un script)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+def format_scheduler_metrics() -> str:
+    lines = ["🚦 Ordonnanceur LLM :"]
+    for model, m in sorted(get_scheduler().metrics().items()):
+        waits = ", ".join(
+            f"{p} {w['requests']} req (attente moy. {w['wait_avg_s']}s, "
+            f"p95 {w['wait_p95_s']}s)"
+            for p, w in m["waits"].items() if w["requests"]
+        )
+        lines.append(
+            f"   {model} : {waits or 'aucun appel'} ; {m['retries']} re-tentatives "
+            f"({m['rate_limited']} × 429), {m['failures']} échecs, "
+            f"{m['tokens_used']} tokens"
+        )
+    return "\n".join(lines)
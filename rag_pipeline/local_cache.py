@@ -0,0 +1,235 @@
+"""
+🗄️ Cache local persistant — magasin clé → valeur SQLite partagé
+================================================================
+Petit magasin clé → valeur (bytes) persistant sur disque, partagé entre
+processus (SQLite en mode WAL) et entre threads (connexion unique protégée
+par un verrou). Sert de socle aux caches du pipeline (embeddings de requête,
+résolutions du juge, ...) : chaque cache choisit sa clé (hash de contenu)
+et son format de valeur, ce module ne gère que le stockage, l'éviction LRU
+bornée et l'expiration optionnelle (TTL).
+
+Emplacement par défaut : ~/.cache/edu-ecg/ (surcharge : EDU_ECG_CACHE_DIR).
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Valeurs d'environnement qui désactivent un cache disque.
+_DISABLED_VALUES = ("", "0", "off", "false", "none", "no")
+
+
+def default_cache_dir() -> Path:
+    """Répertoire racine des caches locaux (EDU_ECG_CACHE_DIR ou ~/.cache/edu-ecg)."""
+    env = os.getenv("EDU_ECG_CACHE_DIR")
+    if env:
+        return Path(env)
+    return Path.home() / ".cache" / "edu-ecg"
+
+
+def resolve_cache_path(env_var: str, default_name: str) -> Optional[Path]:
+    """
+    Résout le chemin d'un fichier de cache depuis une variable d'environnement.
+
+    - variable absente          → default_cache_dir() / default_name
+    - variable à "off"/"0"/...  → None (cache disque désactivé)
+    - sinon                     → chemin fourni
+    """
+    value = os.getenv(env_var)
+    if value is None:
+        return default_cache_dir() / default_name
+    if value.strip().lower() in _DISABLED_VALUES:
+        return None
+    return Path(value)
+
+
+def content_hash(*parts: str) -> str:
+    """Hash SHA-256 stable d'une suite de chaînes (séparateur non imprimable)."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def file_fingerprint(path: Union[str, Path]) -> str:
+    """SHA-256 du contenu d'un fichier."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SQLiteStore:
+    """
+    Magasin clé → bytes persistant, borné en nombre d'entrées (éviction LRU
+    sur la date de dernier accès) et optionnellement expirant (TTL).
+
+    Une table `meta` (clé → texte) permet à l'appelant de stocker la
+    « version » du contenu (modèle, hash d'ontologie...) et de purger le
+    magasin quand elle change.
+    """
+
+    # On ne réécrit last_used que si la dernière mise à jour date de plus de
+    # TOUCH_INTERVAL_S secondes : évite une écriture disque à chaque hit.
+    TOUCH_INTERVAL_S = 60.0
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: Optional[int] = None,
+        ttl_s: Optional[float] = None,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30.0, check_same_thread=False,
+            isolation_level=None,  # autocommit : chaque écriture est atomique
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+
+    # ------------------------------------------------------------------
+    # Accès clé → valeur
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Retourne la valeur associée à `key`, ou None (absente ou expirée)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, last_used FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at, last_used = row
+            if self.ttl_s is not None and now - created_at > self.ttl_s:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            if now - last_used > self.TOUCH_INTERVAL_S:
+                self._conn.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", (now, key)
+                )
+        return bytes(value)
+
+    def put(self, key: str, value: bytes) -> None:
+        """Insère ou remplace une entrée, puis applique la borne max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), now, now),
+            )
+            self._puts_since_prune += 1
+            # Élagage amorti : on ne compte les lignes que toutes les 64 écritures.
+            if self.max_entries is not None and self._puts_since_prune >= 64:
+                self._prune_locked()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Vide toutes les entrées (la table meta est conservée)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def prune(self) -> int:
+        """Applique explicitement TTL + borne max_entries. Retourne le nb supprimé."""
+        with self._lock:
+            return self._prune_locked()
+
+    def _prune_locked(self) -> int:
+        self._puts_since_prune = 0
+        removed = 0
+        if self.ttl_s is not None:
+            cur = self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?",
+                (time.time() - self.ttl_s,),
+            )
+            removed += cur.rowcount
+        if self.max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                cur = self._conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    " SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+                removed += cur.rowcount
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return int(count)
+
+    # ------------------------------------------------------------------
+    # Métadonnées (version du contenu)
+    # ------------------------------------------------------------------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def ensure_version(self, version: str) -> bool:
+        """
+        Purge le magasin si la version stockée diffère de `version`.
+        Retourne True si une purge a eu lieu.
+        """
+        current = self.get_meta("version")
+        if current == version:
+            return False
+        if current is not None:
+            logger.info(
+                f"🗑️  Cache {self.path.name} invalidé "
+                f"(version {current[:12]}… → {version[:12]}…)"
+            )
+            self.clear()
+        self.set_meta("version", version)
+        return current is not None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
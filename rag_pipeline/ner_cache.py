@@ -0,0 +1,210 @@
+"""
+🔬 Cache des extractions NER (Brique 2)
+=========================================
+L'extraction GPT-4o (temperature=0, seed=42) est rejouée à l'identique par
+les benchmarks (golden de 100 réponses, étudiants virtuels) à chaque
+changement de scoring. Ce cache adresse chaque extraction par son contenu :
+
+    clé = hash(texte étudiant, modèle, hash du prompt système, hash du schéma)
+
+Le texte n'est normalisé que sur les blancs (espaces multiples, retours à
+la ligne, bords) : la Brique 2 ne corrige RIEN et recopie les termes tels
+qu'écrits, deux textes différant par la casse ou les accents ne partagent
+donc pas d'entrée.
+
+Stockage : un fichier JSON Lines (une extraction par ligne, append-only),
+lisible et versionnable à côté des résultats de benchmark. Chaque ligne
+porte la version (modèle + prompt + schéma) qui l'a produite : au
+chargement, les lignes d'une autre version sont ignorées et le fichier est
+compacté — changer MODEL ou SYSTEM_PROMPT invalide le cache sans action.
+
+On met en cache la sortie BRUTE du modèle ; les filets de sécurité
+appliqués ensuite (fragment isolé...) sont rejoués à chaque appel.
+
+Configuration :
+  NER_EXTRACTION_CACHE   chemin du fichier .jsonl ("off" = désactivé)
+                         défaut : ~/.cache/edu-ecg/ner_extractions.jsonl
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from local_cache import content_hash, resolve_cache_path
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class NERExtractionCache:
+    """
+    Cache JSON Lines des extractions NER, versionné par (modèle, prompt, schéma).
+
+    Usage:
+        cache = NERExtractionCache.from_env(MODEL, SYSTEM_PROMPT, NERExtraction)
+        result = cache.get(texte)
+        if result is None:
+            result = ...  # appel GPT-4o
+            cache.put(texte, result)
+        print(cache.stats())
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]],
+        model: str,
+        prompt: str,
+        schema: Type[M],
+    ):
+        self.path = Path(path) if path is not None else None
+        self.model = model
+        self.schema = schema
+        self.version = content_hash(
+            model,
+            content_hash(prompt),
+            json.dumps(schema.model_json_schema(), sort_keys=True),
+        )
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, model: str, prompt: str, schema: Type[M]) -> "NERExtractionCache":
+        """Construit le cache selon NER_EXTRACTION_CACHE."""
+        path = resolve_cache_path("NER_EXTRACTION_CACHE", "ner_extractions.jsonl")
+        return cls(path, model, prompt, schema)
+
+    # ------------------------------------------------------------------
+    # Clé de contenu
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def normalize(texte: str) -> str:
+        """Normalisation des blancs uniquement (cf. docstring du module)."""
+        return " ".join(texte.split())
+
+    def key(self, texte: str) -> str:
+        return content_hash(self.version, self.normalize(texte))
+
+    # ------------------------------------------------------------------
+    # Chargement / compaction du fichier
+    # ------------------------------------------------------------------
+
+    def _load_locked(self) -> Dict[str, Dict]:
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        if self.path is None or not self.path.exists():
+            return self._entries
+
+        stale = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        stale += 1  # ligne tronquée (écriture interrompue)
+                        continue
+                    if record.get("version") != self.version:
+                        stale += 1
+                        continue
+                    self._entries[record["key"]] = record["extraction"]
+        except OSError as e:
+            logger.warning(f"⚠️  Cache NER illisible ({self.path}) : {e}")
+            return self._entries
+
+        if stale:
+            logger.info(
+                f"🗑️  Cache NER {self.path.name} : {stale} entrée(s) d'une autre "
+                f"version (modèle/prompt) écartée(s), compaction"
+            )
+            self._rewrite_locked()
+        return self._entries
+
+    def _rewrite_locked(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for key, extraction in self._entries.items():
+                    f.write(self._line(key, extraction))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️  Compaction du cache NER échouée : {e}")
+
+    def _line(self, key: str, extraction: Dict) -> str:
+        record = {"key": key, "version": self.version, "model": self.model,
+                  "extraction": extraction}
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(self, texte: str) -> Optional[M]:
+        """Extraction en cache (nouvel objet, modifiable sans effet de bord) ou None."""
+        if self.path is None:
+            return None
+        key = self.key(texte)
+        with self._lock:
+            extraction = self._load_locked().get(key)
+            if extraction is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self.schema.model_validate(extraction)
+
+    def put(self, texte: str, result: M) -> None:
+        """Enregistre une extraction (mémoire + ligne ajoutée au fichier)."""
+        if self.path is None:
+            return
+        key = self.key(texte)
+        extraction = result.model_dump(mode="json")
+        with self._lock:
+            entries = self._load_locked()
+            if entries.get(key) == extraction:
+                return
+            entries[key] = extraction
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(self._line(key, extraction))
+            except OSError as e:
+                logger.warning(f"⚠️  Écriture cache NER échouée : {e}")
+
+    def clear(self) -> None:
+        """Vide le cache (mémoire + fichier)."""
+        with self._lock:
+            self._entries = {}
+            if self.path is not None and self.path.exists():
+                self.path.unlink()
+
+    # ------------------------------------------------------------------
+    # Statistiques
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = len(self._entries) if self._entries is not None else None
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": entries,
+            "path": str(self.path) if self.path is not None else None,
+        }
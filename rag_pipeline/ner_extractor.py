@@ -12,6 +12,11 @@ Principes :
 L'output est un objet Pydantic `NERExtraction` garanti par l'API OpenAI
 via la méthode `.parse()` (Structured Outputs).
 
+Les extractions sont mises en cache par contenu (ner_cache) : un texte déjà
+extrait avec le même modèle et le même prompt ne coûte plus d'appel.
+
+Variante asyncio : aextract_clinical_terms (même logique, cf. llm_clients).
+
 Auteur : BMad Team
 Date   : 2026-02-25
 """
@@ -19,14 +24,14 @@ Date   : 2026-02-25
 from __future__ import annotations
 
 import logging
-import os
-from pathlib import Path
+import threading
 from typing import List, Literal, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
 from pydantic import BaseModel, Field
 
+from llm_clients import ChatRequest, LLMSteps, arun_steps, get_client, run_steps
+from ner_cache import NERExtractionCache
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -167,43 +172,55 @@ MODEL = "gpt-4o-2024-08-06"
 
 
 # ---------------------------------------------------------------------------
-# Client OpenAI (singleton module-level, initialisé à la demande)
+# Cache des extractions (singleton module-level)
 # ---------------------------------------------------------------------------
 
-_client: Optional[OpenAI] = None
-
-
-def _get_client() -> OpenAI:
-    """Retourne le client OpenAI, en le créant si nécessaire."""
-    global _client
-    if _client is None:
-        # Chercher le .env dans plusieurs emplacements possibles
-        env_candidates = [
-            Path(".env"),
-            Path(__file__).parent / ".env",
-            Path(__file__).parent.parent / "ECG lecture" / ".env",
-        ]
-        for env_path in env_candidates:
-            if env_path.exists():
-                load_dotenv(env_path)
-                break
-        else:
-            load_dotenv()  # fallback
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY non trouvée. "
-                "Ajoutez-la dans un fichier .env ou en variable d'environnement."
-            )
-        _client = OpenAI(api_key=api_key)
-    return _client
+_extraction_cache: Optional[NERExtractionCache] = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> NERExtractionCache:
+    """Cache des extractions, versionné par MODEL + SYSTEM_PROMPT (cf. ner_cache)."""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = NERExtractionCache.from_env(MODEL, SYSTEM_PROMPT, NERExtraction)
+        return _extraction_cache
 
 
 # ---------------------------------------------------------------------------
 # Fonction principale — Brique 2
 # ---------------------------------------------------------------------------
 
+def _ner_steps(texte_etudiant: str) -> LLMSteps[NERExtraction]:
+    """Appel GPT-4o (Structured Outputs) : sortie brute, avant filets de sécurité."""
+    logger.info(f"🔬 NER Extraction — texte de {len(texte_etudiant)} caractères")
+
+    response = yield ChatRequest(
+        dict(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Texte de l'étudiant : {texte_etudiant}"},
+            ],
+            # Déterminisme : l'extraction NER pilote la NOTE ; à température par
+            # défaut (1.0) une même réponse pouvait extraire « artéfact de
+            # tremblement » un run sur deux (cas 2 : score 50 vs 100). temperature=0
+            # + seed fixe → correction reproductible.
+            temperature=0,
+            seed=42,
+        ),
+        response_format=NERExtraction,
+    )
+
+    result = response.choices[0].message.parsed
+
+    # Garde-fou : l'API peut renvoyer None (refus/erreur de parsing).
+    if result is None:
+        result = NERExtraction(entites=[])
+    return result
+
+
 def extract_clinical_terms(texte_etudiant: str) -> NERExtraction:
     """
     Extrait les entités cliniques ECG d'un texte étudiant via GPT-4o.
@@ -219,31 +236,34 @@ def extract_clinical_terms(texte_etudiant: str) -> NERExtraction:
         RuntimeError: Si la clé API est manquante.
         openai.APIError: Si l'appel API échoue.
     """
-    client = _get_client()
-
-    logger.info(f"🔬 NER Extraction — texte de {len(texte_etudiant)} caractères")
+    return run_steps(_extraction_steps(texte_etudiant), get_client)
 
-    response = client.beta.chat.completions.parse(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Texte de l'étudiant : {texte_etudiant}"},
-        ],
-        response_format=NERExtraction,
-        # Déterminisme : l'extraction NER pilote la NOTE ; à température par
-        # défaut (1.0) une même réponse pouvait extraire « artéfact de
-        # tremblement » un run sur deux (cas 2 : score 50 vs 100). temperature=0
-        # + seed fixe → correction reproductible.
-        temperature=0,
-        seed=42,
-    )
-
-    result = response.choices[0].message.parsed
-
-    # Garde-fou : l'API peut renvoyer None (refus/erreur de parsing).
-    if result is None:
-        result = NERExtraction(entites=[])
 
+async def aextract_clinical_terms(texte_etudiant: str) -> NERExtraction:
+    """
+    Variante asyncio de extract_clinical_terms (AsyncOpenAI partagé).
+    Même cache, même appel, mêmes filets de sécurité.
+    """
+    return await arun_steps(_extraction_steps(texte_etudiant))
+
+
+def _extraction_steps(texte_etudiant: str) -> LLMSteps[NERExtraction]:
+    """Cache → appel GPT-4o si absent → filets de sécurité (tous les pilotes)."""
+    cache = get_extraction_cache()
+    result = cache.get(texte_etudiant)
+    if result is not None:
+        logger.info(f"♻️  NER Extraction (cache) — texte de {len(texte_etudiant)} caractères")
+    else:
+        result = yield from _ner_steps(texte_etudiant)
+        # Une liste vide peut venir d'un refus ou d'un raté non déterministe
+        # (fragments courts) : on ne la fige pas.
+        if result.entites:
+            cache.put(texte_etudiant, result)
+    return _finalize_extraction(texte_etudiant, result)
+
+
+def _finalize_extraction(texte_etudiant: str, result: NERExtraction) -> NERExtraction:
+    """Filets de sécurité appliqués à la sortie brute du modèle (ou du cache)."""
     # Filet de sécurité — FRAGMENT ISOLÉ :
     # Sur une saisie très courte (ex: "inversion électrode"), GPT-4o renvoie
     # parfois une liste vide de façon non déterministe. Dans ce cas, on
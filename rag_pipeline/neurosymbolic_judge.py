@@ -10,6 +10,10 @@ Pipeline en 2 étapes :
   2. Juge LLM (QCM) : sinon, on soumet le Top-K à GPT-4o-mini
      sous forme de QCM. Le LLM peut répondre NONE si aucun candidat
      ne correspond cliniquement.
+     Les résolutions du Juge sont mises en cache (resolution_cache) :
+     un tuple (terme, contexte, candidats) déjà jugé ne coûte plus d'appel.
+
+Variante asyncio : aresolve_term_to_ontology (même logique, cf. llm_clients).
 
 Dépendances :
   - HybridSearchEngine (Brique 3) pour le flag is_exact_match
@@ -23,16 +27,16 @@ Date   : 2026-02-25
 from __future__ import annotations
 
 import logging
-import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
 from pydantic import BaseModel, Field
 
 # Import de la normalisation Brique 1
+from llm_clients import BlockingCall, ChatRequest, LLMSteps, arun_steps, get_client, run_steps
 from ontology_index import normalize_text
+from resolution_cache import ResolutionCache
 
 logger = logging.getLogger(__name__)
 
@@ -138,36 +142,25 @@ MODEL = "gpt-4o-mini"
 
 
 # ---------------------------------------------------------------------------
-# Client OpenAI (singleton module-level)
+# Cache des résolutions du Juge (singleton module-level)
 # ---------------------------------------------------------------------------
 
-_client: Optional[OpenAI] = None
-
-
-def _get_client() -> OpenAI:
-    """Retourne le client OpenAI, en le créant si nécessaire."""
-    global _client
-    if _client is None:
-        env_candidates = [
-            Path(".env"),
-            Path(__file__).parent / ".env",
-            Path(__file__).parent.parent / "ECG lecture" / ".env",
-        ]
-        for env_path in env_candidates:
-            if env_path.exists():
-                load_dotenv(env_path)
-                break
-        else:
-            load_dotenv()
+_resolution_cache: Optional[ResolutionCache] = None
+_resolution_cache_lock = threading.Lock()
+
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY non trouvée. "
-                "Ajoutez-la dans un fichier .env ou en variable d'environnement."
-            )
-        _client = OpenAI(api_key=api_key)
-    return _client
+def get_resolution_cache() -> ResolutionCache:
+    """Cache persistant des résolutions du Juge (cf. resolution_cache)."""
+    global _resolution_cache
+    with _resolution_cache_lock:
+        if _resolution_cache is None:
+            _resolution_cache = ResolutionCache.from_env(model=MODEL, prompt=SYSTEM_PROMPT)
+        return _resolution_cache
+
+
+def resolution_cache_stats() -> Dict:
+    """Hit rate du cache des résolutions (part des appels Juge évités)."""
+    return get_resolution_cache().stats()
 
 
 # ---------------------------------------------------------------------------
@@ -227,6 +220,28 @@ def resolve_term_to_ontology(
           - top_k_candidats: list — les Top-K candidats avec scores (rrf, cosine, bm25)
           - llm_confiance  : int — confiance auto-évaluée par le LLM (0-100), -1 si coupe-circuit
     """
+    return run_steps(
+        _resolution_steps(terme_brut, contexte_phrase, top_k_candidates), get_client
+    )
+
+
+async def aresolve_term_to_ontology(
+    terme_brut: str,
+    contexte_phrase: str,
+    top_k_candidates: List[Dict],
+) -> Dict:
+    """Variante asyncio de resolve_term_to_ontology (AsyncOpenAI partagé)."""
+    return await arun_steps(
+        _resolution_steps(terme_brut, contexte_phrase, top_k_candidates)
+    )
+
+
+def _resolution_steps(
+    terme_brut: str,
+    contexte_phrase: str,
+    top_k_candidates: List[Dict],
+) -> LLMSteps[Dict]:
+    """Pipeline de resolve_term_to_ontology, commun aux chemins sync et async."""
     # --- Cas trivial : pas de candidats ---
     if not top_k_candidates:
         logger.info(f"⚠️  Pas de candidats pour : '{terme_brut}' → NONE")
@@ -285,14 +300,24 @@ def resolve_term_to_ontology(
         }
 
     # --- Étape 2 : Juge LLM (QCM) ---
-    juge_result = _juge_llm(terme_brut, contexte_phrase, top_k_candidates)
+    # Juge déterministe (temperature=0, seed=42) : un tuple déjà jugé avec la
+    # même ontologie, le même index et le même prompt est servi par le cache.
+    cache = get_resolution_cache()
+    juge_result = cache.get(terme_brut, contexte_phrase, top_k_candidates)
+    if juge_result is None:
+        juge_result = yield from _juge_steps(terme_brut, contexte_phrase, top_k_candidates)
+        cache.put(terme_brut, contexte_phrase, top_k_candidates, juge_result)
+    else:
+        logger.info(
+            f"♻️  Juge LLM (cache) : '{terme_brut}' → {juge_result['ontology_id']}"
+        )
 
     # --- Étape 3 : Fallback sous-termes si le Juge renvoie NONE ---
     # Quand un terme composé comme "ESV infundibulaire droite postéroseptale"
     # échoue, on tente chaque sous-terme individuellement pour récupérer
     # le concept principal (ex: "ESV" → EXTRASYSTOLE_VENTRICULAIRE).
     if juge_result["ontology_id"] == "NONE":
-        subterm_result = _fallback_subtokens(terme_brut, contexte_phrase)
+        subterm_result = yield BlockingCall(_fallback_subtokens, terme_brut, contexte_phrase)
         if subterm_result is not None:
             # Enrichir le fallback avec les candidats du terme original
             subterm_result["top_k_candidats"] = _extract_candidats_resume(top_k_candidates)
@@ -304,6 +329,9 @@ def resolve_term_to_ontology(
     return juge_result
 
 
+_fallback_engine_lock = threading.Lock()
+
+
 def _fallback_subtokens(
     terme_brut: str,
     contexte_phrase: str,
@@ -329,13 +357,15 @@ def _fallback_subtokens(
     if len(words) <= 1:
         return None  # Terme simple, pas de sous-termes à essayer
 
-    # Lazy-load du moteur (on réutilise un singleton si possible)
-    if not hasattr(_fallback_subtokens, "_engine"):
-        try:
-            index_dir = str(Path(__file__).parent / "rag_index")
-            _fallback_subtokens._engine = HybridSearchEngine(index_dir)
-        except Exception:
-            return None
+    # Lazy-load du moteur (on réutilise un singleton si possible).
+    # Verrou : les entités d'une copie sont résolues en parallèle.
+    with _fallback_engine_lock:
+        if not hasattr(_fallback_subtokens, "_engine"):
+            try:
+                index_dir = str(Path(__file__).parent / "rag_index")
+                _fallback_subtokens._engine = HybridSearchEngine(index_dir)
+            except Exception:
+                return None
 
     engine = _fallback_subtokens._engine
     best_match = None
@@ -374,19 +404,17 @@ def _fallback_subtokens(
     return None
 
 
-def _juge_llm(
+def _juge_steps(
     terme_brut: str,
     contexte_phrase: str,
     candidates: List[Dict],
-) -> Dict:
+) -> LLMSteps[Dict]:
     """
     Soumet le terme + candidats au Juge GPT-4o-mini sous forme de QCM.
 
     Returns:
         Dict avec ontology_id, concept_name, method, justification.
     """
-    client = _get_client()
-
     # Préparer les options du QCM
     options_lines = []
     valid_ids = set()
@@ -414,17 +442,19 @@ def _juge_llm(
         f"{len(candidates)} candidats soumis"
     )
 
-    response = client.beta.chat.completions.parse(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt_user},
-        ],
+    response = yield ChatRequest(
+        dict(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt_user},
+            ],
+            # Déterminisme : cette résolution de concept pilote la note. On fige la
+            # température et le seed pour une correction reproductible (cf. NER).
+            temperature=0,
+            seed=42,
+        ),
         response_format=ConceptMatching,
-        # Déterminisme : cette résolution de concept pilote la note. On fige la
-        # température et le seed pour une correction reproductible (cf. NER).
-        temperature=0,
-        seed=42,
     )
 
     result = response.choices[0].message.parsed
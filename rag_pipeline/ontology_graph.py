@@ -0,0 +1,416 @@
+"""
+🕸️ Graphe ontologique compilé (fermetures précalculées)
+=========================================================
+Compile une fois `ontology_v2.json` en une structure d'interrogation rapide
+pour le scoring V3 :
+
+  - identifiants entiers : chaque ID de concept (et chaque ID référencé par
+    une relation) reçoit un index ; les index suivent l'ordre alphabétique
+    des IDs, donc le bit de poids faible d'un masque est l'ID le plus petit
+    (équivalent de `sorted(hit)[0]`) ;
+  - fermetures descendantes / ascendantes avec distances (profondeur
+    bornée comme les anciens parcours récursifs de scoring_v3) ;
+  - règles compilées par concept (`ConceptRules`) : requires, qualifiers
+    (familles déjà développées), supports, excludes + excludes_families
+    (familles développées), antécédents `implies`, pôles `negation_of`.
+
+Les ensembles de concepts sont des masques de bits (entiers Python) :
+chaque requête de scoring devient une intersection `mask & found`. Les
+IDs en chaîne ne sont convertis qu'aux frontières des modules
+(`mask` / `key_mask` à l'entrée, `names` / `first` à la sortie).
+
+Le graphe est reconstruit automatiquement si l'ontologie est rechargée
+(`semantic_layer.load_ontology_v2`).
+
+Usage :
+    g = get_ontology_graph()
+    found = g.mask(found_ids)
+    g.rules("BLOC_DE_BRANCHE_GAUCHE").descendants & found
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from semantic_layer import _get_ontology_v2, normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Profondeurs historiques de scoring_v3 (`max_depth=3`) : le parcours des
+# enfants descend jusqu'à 4 niveaux sous le concept, celui des parents
+# remonte jusqu'à 3 niveaux (distance 1 = parent direct).
+DESCENDANT_MAX_DEPTH = 3
+ANCESTOR_MAX_DEPTH = 3
+
+_RELATION_FIELDS = (
+    "children", "parents", "requires", "has_qualifiers", "has_qualifier_families",
+    "supports", "excludes", "excludes_families", "implies", "negation_of",
+)
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Itère les index des bits à 1 d'un masque, du plus petit au plus grand."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def lowest_bit(mask: int) -> int:
+    """Index du bit à 1 de plus faible poids (mask > 0)."""
+    return (mask & -mask).bit_length() - 1
+
+
+@dataclass(frozen=True)
+class ConceptRules:
+    """Règles de scoring compilées d'un concept (index entiers et masques)."""
+    concept_id: str
+    # (libellé d'origine, index de sa forme normalisée)
+    requires: Tuple[Tuple[str, int], ...] = ()
+    requires_mask: int = 0
+    qualifiers: Tuple[Tuple[str, int], ...] = ()
+    qualifiers_mask: int = 0
+    supports: Tuple[Tuple[str, int], ...] = ()
+    supports_mask: int = 0
+    # excludes puis, par famille : la famille elle-même puis ses descendants.
+    # Vérifiés dans l'ordre ; le premier masque touché désigne l'excluant.
+    excludes_checks: Tuple[int, ...] = ()
+    # Descendants (≤ DESCENDANT_MAX_DEPTH) et ancêtres (≤ ANCESTOR_MAX_DEPTH)
+    descendants: int = 0
+    ancestors: Tuple[Tuple[int, int], ...] = ()  # (index, distance), plus proche d'abord
+    # Concepts dont les `implies` désignent ce concept
+    implied_by: int = 0
+    # Pôles positifs (`negation_of`), normalisés
+    negation_of: Tuple[str, ...] = ()
+
+
+class OntologyGraph:
+    """Ontologie V2 compilée : index entiers, fermetures et règles par concept."""
+
+    def __init__(self, onto: Dict):
+        self.source = onto
+        concepts: Dict[str, Dict] = onto.get("concepts", {})
+        self.concepts = concepts
+
+        universe: Set[str] = set(concepts)
+        for c in concepts.values():
+            for f in _RELATION_FIELDS:
+                for x in c.get(f, []) or []:
+                    universe.add(x)
+                    universe.add(normalize_key(x))
+        self.ids: List[str] = sorted(universe)
+        self.index: Dict[str, int] = {cid: i for i, cid in enumerate(self.ids)}
+
+        self._children = [self._refs(concepts.get(cid, {}), "children") for cid in self.ids]
+        self._parents = [self._refs(concepts.get(cid, {}), "parents") for cid in self.ids]
+
+        # Fermetures avec distances : {index: distance}
+        self.descendant_dist: List[Dict[int, int]] = [
+            self._closure(i, self._children, DESCENDANT_MAX_DEPTH + 1) for i in range(len(self.ids))
+        ]
+        self.ancestor_dist: List[Dict[int, int]] = [
+            self._ancestor_walk(i, ANCESTOR_MAX_DEPTH) for i in range(len(self.ids))
+        ]
+        self._descendants = [self._mask_of(d) for d in self.descendant_dist]
+        # Sous-arbres complets (concept + tous ses descendants, sans borne)
+        self._subtrees = [
+            (1 << i) | self._mask_of(self._closure(i, self._children, len(self.ids)))
+            for i in range(len(self.ids))
+        ]
+
+        implied_by: Dict[int, int] = {}
+        for fid, fc in concepts.items():
+            for tgt in fc.get("implies", []) or []:
+                t = self.index[normalize_key(tgt)]
+                implied_by[t] = implied_by.get(t, 0) | (1 << self.index[fid])
+        self._implied_by = implied_by
+
+        self._labels: Optional[LabelIndex] = None
+
+        self._rules: Dict[str, ConceptRules] = {
+            cid: self._compile(cid, c) for cid, c in concepts.items()
+        }
+        # Patterns visibles porteurs de requires (candidats implicites, Brique 4.5)
+        self.requiring_patterns: Tuple[ConceptRules, ...] = tuple(
+            self._rules[cid] for cid, c in concepts.items()
+            if c.get("type") == "pattern" and not c.get("hide") and c.get("requires")
+        )
+        logger.info(f"🕸️  Graphe ontologique compilé : {len(concepts)} concepts, {len(self.ids)} IDs")
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _refs(self, c: Dict, field_name: str) -> List[int]:
+        return [self.index[x] for x in c.get(field_name, []) or []]
+
+    @staticmethod
+    def _closure(start: int, edges: List[List[int]], max_dist: int) -> Dict[int, int]:
+        """Parcours en largeur : {index: distance minimale ≤ max_dist}."""
+        dist: Dict[int, int] = {}
+        queue = deque([(start, 0)])
+        while queue:
+            node, d = queue.popleft()
+            if d >= max_dist:
+                continue
+            for nxt in edges[node]:
+                if nxt not in dist:
+                    dist[nxt] = d + 1
+                    queue.append((nxt, d + 1))
+        return dist
+
+    def _ancestor_walk(self, start: int, max_dist: int) -> Dict[int, int]:
+        """Remontée en profondeur : {index: distance minimale ≤ max_dist}.
+
+        L'ordre d'insertion (celui de l'ancien `_get_all_parents_recursive`)
+        départage les ancêtres trouvés à égale distance.
+        """
+        dist: Dict[int, int] = {}
+
+        def walk(node: int, depth: int) -> None:
+            if depth > max_dist:
+                return
+            for parent in self._parents[node]:
+                if parent not in dist or depth < dist[parent]:
+                    dist[parent] = depth
+                    walk(parent, depth + 1)
+
+        walk(start, 1)
+        return dist
+
+    @staticmethod
+    def _mask_of(indices: Iterable[int]) -> int:
+        m = 0
+        for i in indices:
+            m |= 1 << i
+        return m
+
+    def _compile(self, cid: str, c: Dict) -> ConceptRules:
+        i = self.index[cid]
+
+        def labelled(values) -> Tuple[Tuple[str, int], ...]:
+            return tuple((v, self.index[normalize_key(v)]) for v in values)
+
+        qualifiers = list(c.get("has_qualifiers", []))
+        for qfam in c.get("has_qualifier_families", []):
+            nqf = normalize_key(qfam)
+            if nqf not in qualifiers:
+                qualifiers.append(nqf)
+            for child in sorted(self.descendant_ids(nqf)):
+                if child not in qualifiers:
+                    qualifiers.append(child)
+        requires_l = labelled(c.get("requires", []))
+        qualifiers_l = labelled(qualifiers)
+        supports_l = labelled(c.get("supports", []))
+
+        checks = [1 << self.index[x] for x in c.get("excludes", [])]
+        for fam in c.get("excludes_families", []):
+            f = self.index[fam]
+            checks.append(1 << f)
+            checks.append(self._descendants[f])
+
+        return ConceptRules(
+            concept_id=cid,
+            requires=requires_l,
+            requires_mask=self._mask_of(r for _, r in requires_l),
+            qualifiers=qualifiers_l,
+            qualifiers_mask=self._mask_of(q for _, q in qualifiers_l),
+            supports=supports_l,
+            supports_mask=self._mask_of(s for _, s in supports_l),
+            excludes_checks=tuple(checks),
+            descendants=self._descendants[i],
+            ancestors=tuple(sorted(self.ancestor_dist[i].items(), key=lambda kv: kv[1])),
+            implied_by=self._implied_by.get(i, 0),
+            negation_of=tuple(normalize_key(p) for p in c.get("negation_of", []) or []),
+        )
+
+    # ------------------------------------------------------------------
+    # Conversions IDs ↔ masques
+    # ------------------------------------------------------------------
+
+    def mask(self, ids: Iterable[str]) -> int:
+        """Masque des IDs connus du graphe (les IDs inconnus sont ignorés)."""
+        index = self.index
+        m = 0
+        for cid in ids:
+            i = index.get(cid)
+            if i is not None:
+                m |= 1 << i
+        return m
+
+    def key_mask(self, ids: Iterable[str]) -> int:
+        """Comme `mask`, après normalisation des clés (accents)."""
+        return self.mask(normalize_key(cid) for cid in ids)
+
+    def names(self, mask: int) -> List[str]:
+        """IDs d'un masque, par ordre alphabétique."""
+        return [self.ids[i] for i in iter_bits(mask)]
+
+    def first(self, mask: int) -> Optional[str]:
+        """Plus petit ID (ordre alphabétique) d'un masque, ou None si vide."""
+        return self.ids[lowest_bit(mask)] if mask else None
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+
+    @property
+    def labels(self) -> "LabelIndex":
+        """Index des libellés (construit à la première recherche)."""
+        if self._labels is None:
+            self._labels = LabelIndex(self.concepts)
+        return self._labels
+
+    def rules(self, concept_id: str) -> ConceptRules:
+        """Règles compilées d'un concept (règles vides si inconnu)."""
+        r = self._rules.get(concept_id)
+        return r if r is not None else ConceptRules(concept_id=concept_id)
+
+    def descendant_ids(self, concept_id: str, max_depth: int = DESCENDANT_MAX_DEPTH) -> Set[str]:
+        """Descendants d'un concept (sémantique de `max_depth` des anciens parcours)."""
+        i = self.index.get(concept_id)
+        if i is None:
+            return set()
+        dist = self.descendant_dist[i]
+        if max_depth > DESCENDANT_MAX_DEPTH:
+            dist = self._closure(i, self._children, max_depth + 1)
+        return {self.ids[j] for j, d in dist.items() if d <= max_depth + 1}
+
+    def ancestor_ids(self, concept_id: str, max_depth: int = ANCESTOR_MAX_DEPTH) -> Dict[str, int]:
+        """Ancêtres d'un concept avec leur distance (1 = parent direct)."""
+        i = self.index.get(concept_id)
+        if i is None:
+            return {}
+        dist = self.ancestor_dist[i]
+        if max_depth > ANCESTOR_MAX_DEPTH:
+            dist = self._ancestor_walk(i, max_depth)
+        return {self.ids[j]: d for j, d in dist.items() if d <= max_depth}
+
+    def subtree(self, concept_id: str) -> int:
+        """Masque du concept et de tous ses descendants (profondeur illimitée)."""
+        i = self.index.get(concept_id)
+        return self._subtrees[i] if i is not None else 0
+
+    def excluded_by(self, rules: ConceptRules, found: int) -> Optional[str]:
+        """Premier excluant (excludes puis familles) présent dans `found`."""
+        for check in rules.excludes_checks:
+            hit = check & found
+            if hit:
+                return self.ids[lowest_bit(hit)]
+        return None
+
+    def closest_ancestor(self, rules: ConceptRules, found: int) -> Tuple[Optional[str], int]:
+        """(ancêtre le plus proche présent dans `found`, distance) ou (None, 0)."""
+        for j, d in rules.ancestors:
+            if found >> j & 1:
+                return self.ids[j], d
+        return None, 0
+
+
+# ---------------------------------------------------------------------------
+# Index des libellés (recherche d'un concept par son nom français)
+# ---------------------------------------------------------------------------
+
+class LabelIndex:
+    """Index des noms canoniques et synonymes (minuscules) des concepts.
+
+    Reproduit l'ordre de priorité de `scoring_v3.find_owl_concept` :
+      1. nom canonique exact, 2. synonyme exact, 3. correspondance partielle
+      (le texte contient le nom, ou le nom contient le texte).
+    À chaque niveau, le premier concept dans l'ordre de l'ontologie gagne.
+    Le niveau 3 interroge un index de trigrammes (« le nom contient le
+    texte ») et un index des noms par préfixe (« le texte contient le
+    nom ») au lieu de parcourir tous les concepts.
+    """
+
+    def __init__(self, concepts: Dict[str, Dict]):
+        self.order: List[str] = list(concepts)
+        names = [c.get("concept_name", "").lower().strip('"') for c in concepts.values()]
+        self.names = names
+
+        # Niveaux 1 et 2 : premier concept (ordre ontologie) par libellé
+        self.by_name: Dict[str, int] = {}
+        self.by_synonym: Dict[str, int] = {}
+        for pos, (name, c) in enumerate(zip(names, concepts.values())):
+            self.by_name.setdefault(name, pos)
+            for syn in c.get("synonymes", []):
+                self.by_synonym.setdefault(syn.lower(), pos)
+
+        # Niveau 3a : nom contenu dans le texte → noms par préfixe de 3
+        # caractères (les noms plus courts sont testés directement)
+        self.by_prefix: Dict[str, List[Tuple[str, int]]] = {}
+        self.short_names: List[Tuple[str, int]] = []
+        for name, pos in self.by_name.items():
+            if len(name) >= 3:
+                self.by_prefix.setdefault(name[:3], []).append((name, pos))
+            else:
+                self.short_names.append((name, pos))
+        # Niveau 3b : texte contenu dans le nom → trigrammes du nom
+        self.trigrams: Dict[str, Set[int]] = {}
+        for pos, name in enumerate(names):
+            for k in range(len(name) - 2):
+                self.trigrams.setdefault(name[k:k + 3], set()).add(pos)
+
+    def lookup(self, text: str) -> Optional[str]:
+        """ID du concept correspondant à `text` (déjà en minuscules), ou None."""
+        pos = self.by_name.get(text)
+        if pos is None:
+            pos = self.by_synonym.get(text)
+        if pos is None:
+            pos = self._partial(text)
+        return self.order[pos] if pos is not None else None
+
+    def _partial(self, text: str) -> Optional[int]:
+        best: Optional[int] = None
+        # 3a. un nom apparaît dans le texte à partir d'une position k
+        for name, pos in self.short_names:
+            if name in text and (best is None or pos < best):
+                best = pos
+        for k in range(len(text) - 2):
+            for name, pos in self.by_prefix.get(text[k:k + 3], ()):
+                if (best is None or pos < best) and text.startswith(name, k):
+                    best = pos
+        # 3b. le texte est une sous-chaîne d'un nom
+        if len(text) >= 3:
+            grams = sorted(
+                (self.trigrams.get(text[k:k + 3], set()) for k in range(len(text) - 2)),
+                key=len,
+            )
+            candidates = set(grams[0]).intersection(*grams[1:])
+        else:
+            candidates = range(len(self.names))
+        for pos in sorted(candidates):
+            if best is not None and pos >= best:
+                break
+            if text in self.names[pos]:
+                best = pos
+                break
+        return best
+
+
+# ---------------------------------------------------------------------------
+# Singleton (reconstruit si l'ontologie est rechargée)
+# ---------------------------------------------------------------------------
+
+_GRAPH: Optional[OntologyGraph] = None
+_GRAPH_LOCK = threading.Lock()
+
+
+def get_ontology_graph() -> OntologyGraph:
+    """Graphe compilé de l'ontologie V2 courante (construit une fois)."""
+    global _GRAPH
+    onto = _get_ontology_v2()
+    graph = _GRAPH
+    if graph is None or graph.source is not onto:
+        with _GRAPH_LOCK:
+            graph = _GRAPH
+            if graph is None or graph.source is not onto:
+                graph = _GRAPH = OntologyGraph(onto)
+    return graph
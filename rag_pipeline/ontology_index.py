@@ -34,9 +34,17 @@ from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
 import numpy as np
-from dotenv import load_dotenv
 from openai import OpenAI
-from rank_bm25 import BM25Okapi
+
+from embedding_backends import (
+    DEFAULT_LOCAL_MODEL,
+    OLLAMA_PRESETS,
+    LocalEmbeddingBackend,
+    l2_normalize,
+)
+from llm_clients import get_client, get_endpoint_client
+from llm_scheduler import estimate_text_tokens, get_scheduler
+from sparse_bm25 import SparseBM25
 
 logger = logging.getLogger(__name__)
 
@@ -89,6 +97,89 @@ def tokenize(text: str) -> List[str]:
     return [t for t in tokens if len(t) > 1]  # filtre les tokens d'1 char
 
 
+# ---------------------------------------------------------------------------
+# Flexion helper — variantes pluriel/genre du français médical (exact match)
+# ---------------------------------------------------------------------------
+
+def deflect(text: str) -> set:
+    """
+    Génère les variantes flexionnelles d'un texte normalisé pour
+    absorber les différences singulier/pluriel et masculin/féminin
+    dans le test d'exact match.
+
+    Ex: "qrs larges" → {"qrs large"}
+        "flutter atriale" → {"flutter atrial"}
+        "ondes t amples" → {"onde t ample", "ondes t ample", ...}
+
+    Ne touche PAS à normalize_text ni au BM25/embeddings,
+    s'applique uniquement au test is_exact_match.
+    """
+    variants = set()
+    words = text.split()
+    if not words:
+        return variants
+
+    # Pour chaque mot, générer la variante sans -s, -x, -es, -e final
+    for i, w in enumerate(words):
+        new_words = list(words)
+        # Pluriel : -s, -x
+        if w.endswith("s") and len(w) > 2 and not w.endswith("ss"):
+            new_words[i] = w[:-1]
+            variants.add(" ".join(new_words))
+        if w.endswith("x") and len(w) > 2:
+            new_words[i] = w[:-1]
+            variants.add(" ".join(new_words))
+        # Pluriel -es → -e (ex: "larges" → "large")
+        # Déjà couvert par le -s ci-dessus
+        # Genre : -e final (ex: "atriale" → "atrial")
+        if w.endswith("e") and len(w) > 3 and not w.endswith("ee"):
+            new_words[i] = w[:-1]
+            variants.add(" ".join(new_words))
+        # Genre inverse : ajouter -e (ex: "atrial" → "atriale")
+        if not w.endswith("e") and len(w) > 3:
+            new_words[i] = w + "e"
+            variants.add(" ".join(new_words))
+
+    return variants
+
+
+# ---------------------------------------------------------------------------
+# Sélection Top-K (partagée par les recherches dense et BM25, Briques 1 et 3)
+# ---------------------------------------------------------------------------
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des k plus grands scores, triés par score décroissant.
+
+    Remplace `np.argsort(scores)[::-1][:k]` : sélection O(N) par
+    np.argpartition, puis tri des seuls candidats — au lieu d'un tri
+    complet O(N log N) du corpus à chaque requête.
+
+    Égalités : départagées par index DÉCROISSANT, soit exactement l'ordre
+    d'un argsort stable inversé. Le résultat est donc déterministe
+    (l'ancien argsort non stable ordonnait les ex-aequo de façon arbitraire).
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if n <= 2048 or k >= n:
+        # Petits corpus : un tri stable complet reste le plus rapide.
+        return np.argsort(scores, kind="stable")[::-1][:k]
+
+    # Sélection sur les scores négés : introselect dégénère quand le
+    # k-ième plus grand se trouve en fin de tableau au milieu d'une masse
+    # d'ex-aequo (profil BM25 : majorité de zéros).
+    neg = np.negative(scores)
+    threshold = scores[np.argpartition(neg, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > threshold)
+    # Ex-aequo au seuil : seuls ceux d'index le plus élevé sont retenus
+    # (évite de trier tout le corpus quand beaucoup de scores valent 0).
+    ties = np.flatnonzero(scores == threshold)[len(above) - k:]
+    candidates = np.concatenate([above, ties])
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
 # ---------------------------------------------------------------------------
 # Classe principale : OntologyIndex
 # ---------------------------------------------------------------------------
@@ -111,25 +202,22 @@ class OntologyIndex:
     # Backend par défaut : OpenAI text-embedding-3-small (1536 dims).
     # Backend local : Ollama (endpoint OpenAI-compatible), ex. nomic-embed-text
     # (768 dims), activé par la variable d'env ONTOLOGY_EMBED_BACKEND=ollama.
+    # Backend in-process : sentence-transformers sur CPU, sans serveur,
+    # activé par ONTOLOGY_EMBED_BACKEND=local (cf. embedding_backends).
     # Aucune régression : sans variable d'env, comportement identique à avant.
     EMBEDDING_MODEL = "text-embedding-3-small"
     EMBEDDING_DIMS = 1536
     EMBEDDING_BATCH_SIZE = 512  # limite OpenAI : 2048 inputs par requête
 
     # Presets locaux connus (dim exacte pour préallouer la matrice).
-    _LOCAL_EMBED_PRESETS = {
-        "nomic-embed-text": 768,
-        "mxbai-embed-large": 1024,
-        "bge-m3": 1024,
-        "snowflake-arctic-embed": 1024,
-    }
+    _LOCAL_EMBED_PRESETS = OLLAMA_PRESETS
 
     def __init__(self, ontology_path: Optional[str] = None):
         self.ontology_path = ontology_path
         self.documents: List[OntologyDocument] = []
 
         # --- Backend d'embeddings (env-driven, réversible) ----------------
-        # ONTOLOGY_EMBED_BACKEND = "openai" (défaut) | "ollama"
+        # ONTOLOGY_EMBED_BACKEND = "openai" (défaut) | "ollama" | "local"
         # ONTOLOGY_EMBED_MODEL   = surcharge du nom de modèle (optionnel)
         backend = os.getenv("ONTOLOGY_EMBED_BACKEND", "openai").lower()
         self.embed_backend = backend
@@ -140,9 +228,15 @@ class OntologyIndex:
                 model.split(":")[0], int(os.getenv("ONTOLOGY_EMBED_DIMS", "768")))
             # Ollama n'a pas de limite de batch OpenAI ; on encode plus petit.
             self.EMBEDDING_BATCH_SIZE = 64
+        elif backend == "local":
+            self.EMBEDDING_MODEL = os.getenv("ONTOLOGY_EMBED_MODEL", DEFAULT_LOCAL_MODEL)
+            # Dimension lue sur le modèle au premier encodage (cf. _get_local_backend).
+            self.EMBEDDING_DIMS = int(os.getenv("ONTOLOGY_EMBED_DIMS", "0")) or None
+            self.EMBEDDING_BATCH_SIZE = 256
+        self._local_backend: Optional[LocalEmbeddingBackend] = None
 
         # Index BM25
-        self._bm25: Optional[BM25Okapi] = None
+        self._bm25: Optional[SparseBM25] = None
         self._bm25_corpus: List[List[str]] = []
         
         # Index vectoriel (matrice N×EMBEDDING_DIMS, float32)
@@ -166,30 +260,18 @@ class OntologyIndex:
             if self.embed_backend == "ollama":
                 base_url = os.getenv("OLLAMA_BASE_URL",
                                      "http://localhost:11434/v1")
-                self._client = OpenAI(base_url=base_url, api_key="ollama")
+                self._client = get_endpoint_client(base_url, "ollama")
                 return self._client
-            # Chercher le .env dans le dossier courant ou dans ECG lecture (projet parent)
-            env_candidates = [
-                Path(".env"),
-                Path(__file__).parent / ".env",
-                Path(__file__).parent.parent / "ECG lecture" / ".env",
-            ]
-            for env_path in env_candidates:
-                if env_path.exists():
-                    load_dotenv(env_path)
-                    break
-            else:
-                load_dotenv()  # fallback : cherche automatiquement
-            
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise RuntimeError(
-                    "OPENAI_API_KEY non trouvée. "
-                    "Ajoutez-la dans un fichier .env ou en variable d'environnement."
-                )
-            self._client = OpenAI(api_key=api_key)
+            # Client partagé du processus (pool HTTP commun, cf. llm_clients)
+            self._client = get_client()
         return self._client
     
+    def _get_local_backend(self) -> LocalEmbeddingBackend:
+        """Backend sentence-transformers in-process (ONTOLOGY_EMBED_BACKEND=local)."""
+        if self._local_backend is None:
+            self._local_backend = LocalEmbeddingBackend(self.EMBEDDING_MODEL, self.EMBEDDING_DIMS)
+        return self._local_backend
+
     # ------------------------------------------------------------------
     # Étape 1 : Parsing de l'ontologie JSON
     # ------------------------------------------------------------------
@@ -300,7 +382,7 @@ class OntologyIndex:
         """Construit l'index BM25 sur les surface_forms tokenisés."""
         t0 = time.time()
         self._bm25_corpus = [tokenize(doc.surface_form) for doc in self.documents]
-        self._bm25 = BM25Okapi(self._bm25_corpus)
+        self._bm25 = SparseBM25(self._bm25_corpus)
         elapsed = time.time() - t0
         logger.info(f"🔤 Index BM25 construit en {elapsed:.2f}s ({len(self._bm25_corpus)} documents)")
     
@@ -315,10 +397,19 @@ class OntologyIndex:
         Gère le batching automatique (max EMBEDDING_BATCH_SIZE par requête).
         Les embeddings sont normalisés L2 par l'API OpenAI.
         """
-        client = self._get_client()
-        
         surface_forms = [doc.surface_form for doc in self.documents]
         n = len(surface_forms)
+
+        if self.embed_backend == "local":
+            # In-process : pas de client, vecteurs déjà normalisés L2.
+            t0 = time.time()
+            self._embeddings = self._get_local_backend().embed(surface_forms)
+            self.EMBEDDING_DIMS = int(self._embeddings.shape[1])
+            logger.info(f"🧠 Embeddings locaux calculés en {time.time() - t0:.2f}s "
+                        f"(shape: {self._embeddings.shape}, modèle: {self.EMBEDDING_MODEL})")
+            return
+
+        client = self._get_client()
         all_embeddings = np.zeros((n, self.EMBEDDING_DIMS), dtype=np.float32)
         
         t0 = time.time()
@@ -326,7 +417,9 @@ class OntologyIndex:
             end = min(start + self.EMBEDDING_BATCH_SIZE, n)
             batch = surface_forms[start:end]
             
-            response = client.embeddings.create(
+            response = get_scheduler().call(
+                self.EMBEDDING_MODEL, client.embeddings.create,
+                tokens=estimate_text_tokens(*batch),
                 model=self.EMBEDDING_MODEL,
                 input=batch,
             )
@@ -340,9 +433,7 @@ class OntologyIndex:
         # L2 (contrairement à OpenAI). On normalise pour que le dot-product =
         # cosinus, comme l'attend search_vector/search_hybrid.
         if self.embed_backend == "ollama":
-            norms = np.linalg.norm(all_embeddings, axis=1, keepdims=True)
-            norms[norms == 0] = 1.0
-            all_embeddings = all_embeddings / norms
+            all_embeddings = l2_normalize(all_embeddings)
 
         self._embeddings = all_embeddings
         elapsed = time.time() - t0
@@ -396,7 +487,7 @@ class OntologyIndex:
             return []
         
         scores = self._bm25.get_scores(tokens)
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        top_indices = top_k_indices(scores, top_k)
         
         results = []
         for idx in top_indices:
@@ -410,24 +501,27 @@ class OntologyIndex:
         if self._embeddings is None:
             raise RuntimeError("Embeddings non construits. Appelez build() d'abord.")
         
-        client = self._get_client()
-        
-        response = client.embeddings.create(
-            model=self.EMBEDDING_MODEL,
-            input=[query],
-        )
-        query_embedding = np.array(response.data[0].embedding, dtype=np.float32)
+        if self.embed_backend == "local":
+            query_embedding = self._get_local_backend().embed([query])[0]
+        else:
+            client = self._get_client()
+
+            response = get_scheduler().call(
+                self.EMBEDDING_MODEL, client.embeddings.create,
+                tokens=estimate_text_tokens(query),
+                model=self.EMBEDDING_MODEL,
+                input=[query],
+            )
+            query_embedding = np.array(response.data[0].embedding, dtype=np.float32)
 
         # Backend local (Ollama) : normaliser la requête pour que le
         # dot-product soit un cosinus (la matrice est déjà normalisée au build).
         if self.embed_backend == "ollama":
-            qn = np.linalg.norm(query_embedding)
-            if qn:
-                query_embedding = query_embedding / qn
+            query_embedding = l2_normalize(query_embedding)
 
         # Dot product ≈ cosine similarity (embeddings normalisés)
         similarities = self._embeddings @ query_embedding
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        top_indices = top_k_indices(similarities, top_k)
         
         results = []
         for idx in top_indices:
@@ -506,7 +600,7 @@ class OntologyIndex:
     # Sauvegarde / Chargement (sans le modèle, juste les données)
     # ------------------------------------------------------------------
     
-    def save(self, directory: str):
+    def save(self, directory: str, bundle_dtype: str = "float32"):
         """
         Sauvegarde l'index sur disque.
         
@@ -514,6 +608,10 @@ class OntologyIndex:
         - vecteurs_ontologie.npy   : matrice N×1536 (float32)
         - metadata_ontologie.json  : registre {index i ↔ ligne i} + métadonnées
         - bm25_corpus.json         : corpus tokenisé pour reconstruire BM25
+        - bundle/                  : index compilé, chargé par mmap
+                                     (cf. index_store ; embeddings en
+                                     `bundle_dtype`, float32 ou float16 —
+                                     ce dernier relu en float32 en RAM)
         """
         out_dir = Path(directory)
         out_dir.mkdir(parents=True, exist_ok=True)
@@ -532,30 +630,47 @@ class OntologyIndex:
         ]
         meta_output = {
             "documents": docs_data,
+            **self.metadata,
+            # Après self.metadata : un index rechargé puis re-sauvegardé garde
+            # la description de SON espace vectoriel, lue par la Brique 3.
+            "embedding_backend": self.embed_backend,
             "embedding_model": self.EMBEDDING_MODEL,
             "embedding_dims": self.EMBEDDING_DIMS,
-            **self.metadata,
         }
         with open(out_dir / "metadata_ontologie.json", 'w', encoding='utf-8') as f:
             json.dump(meta_output, f, ensure_ascii=False, indent=2)
         
         # Matrice d'embeddings
         if self._embeddings is not None:
-            np.save(out_dir / "vecteurs_ontologie.npy", self._embeddings)
+            # Écriture via fichier temporaire + rename : la matrice peut être
+            # un mmap du fichier cible (index rechargé puis re-sauvegardé).
+            tmp_path = out_dir / "vecteurs_ontologie.tmp.npy"
+            np.save(tmp_path, self._embeddings)
+            os.replace(tmp_path, out_dir / "vecteurs_ontologie.npy")
         
         # BM25 corpus (pour reconstruire l'index au chargement)
+        if not self._bm25_corpus:
+            self._bm25_corpus = [tokenize(d.surface_form) for d in self.documents]
         with open(out_dir / "bm25_corpus.json", 'w', encoding='utf-8') as f:
             json.dump(self._bm25_corpus, f, ensure_ascii=False)
+
+        # Bundle compilé (structures dérivées pré-calculées, relues en mmap
+        # par la Brique 3). Import local : index_store dépend de ce module.
+        from index_store import build_bundle, write_bundle
+        index_meta = {k: v for k, v in meta_output.items() if k != "documents"}
+        bundle = build_bundle(docs_data, self._embeddings, index_meta, bm25=self._bm25)
+        write_bundle(out_dir, bundle, embedding_dtype=bundle_dtype)
         
         logger.info(f"💾 Index sauvegardé dans {out_dir}/ "
-                     f"(vecteurs_ontologie.npy + metadata_ontologie.json)")
+                     f"(vecteurs_ontologie.npy + metadata_ontologie.json + bundle/)")
     
     @classmethod
     def load(cls, directory: str) -> "OntologyIndex":
         """
         Charge un index sauvegardé depuis le disque.
         
-        Fichiers attendus :
+        Fichiers attendus : bundle/ (index compilé, lu par mmap), ou à
+        défaut les fichiers historiques :
         - vecteurs_ontologie.npy
         - metadata_ontologie.json
         - bm25_corpus.json
@@ -565,6 +680,17 @@ class OntologyIndex:
             raise FileNotFoundError(f"Répertoire d'index introuvable : {in_dir}")
         
         idx = cls()
+
+        # Bundle compilé : documents, embeddings (mmap) et BM25 sans recalcul.
+        from index_store import load_bundle
+        bundle = load_bundle(in_dir)
+        if bundle is not None:
+            idx.documents = [OntologyDocument(**d) for d in bundle.documents]
+            idx._restore_vector_space(dict(bundle.index_meta))
+            idx._embeddings = bundle.embeddings
+            idx._bm25 = bundle.bm25
+            logger.info(f"📂 Index chargé (bundle) : {len(idx.documents)} documents depuis {in_dir}/")
+            return idx
         
         # Métadonnées + documents
         meta_path = in_dir / "metadata_ontologie.json"
@@ -576,23 +702,38 @@ class OntologyIndex:
         
         docs_data = meta.pop("documents", [])
         idx.documents = [OntologyDocument(**d) for d in docs_data]
-        idx.metadata = meta
+        idx._restore_vector_space(meta)
         
         # Embeddings
         emb_path = in_dir / "vecteurs_ontologie.npy"
         if emb_path.exists():
-            idx._embeddings = np.load(emb_path)
+            idx._embeddings = np.load(emb_path, mmap_mode="r")
         
         # BM25
         bm25_path = in_dir / "bm25_corpus.json"
         if bm25_path.exists():
             with open(bm25_path, 'r', encoding='utf-8') as f:
                 idx._bm25_corpus = json.load(f)
-            idx._bm25 = BM25Okapi(idx._bm25_corpus)
+            idx._bm25 = SparseBM25(idx._bm25_corpus)
         
         logger.info(f"📂 Index chargé : {len(idx.documents)} documents depuis {in_dir}/")
         return idx
     
+    def _restore_vector_space(self, meta: Dict) -> None:
+        """
+        Reprend l'espace vectoriel de l'index sauvegardé, pas celui de
+        l'environnement courant (sinon requête et index divergent), puis
+        range le reste dans self.metadata.
+        """
+        if "embedding_model" in meta:
+            self.EMBEDDING_MODEL = meta.pop("embedding_model")
+            self.EMBEDDING_DIMS = meta.pop("embedding_dims", self.EMBEDDING_DIMS)
+            self.embed_backend = meta.pop(
+                "embedding_backend",
+                "ollama" if self.EMBEDDING_MODEL.split(":")[0] in OLLAMA_PRESETS else "openai",
+            )
+        self.metadata = meta
+
     # ------------------------------------------------------------------
     # Utilitaires de diagnostic
     # ------------------------------------------------------------------
@@ -25,9 +25,11 @@ Zero dependance externe (pur stdlib).
 from __future__ import annotations
 import re
 import unicodedata
-from typing import Dict, List, Optional, Set
+from functools import lru_cache
+from typing import Dict, List, Set
 
 
+@lru_cache(maxsize=65536)
 def _canon(s: str) -> str:
     if s is None:
         return ""
@@ -37,7 +39,13 @@ def _canon(s: str) -> str:
 
 
 class PatternInferencer:
-    """Infere les concepts-verdict flagges `infer_from_requires` dans l'ontologie."""
+    """Infere les concepts-verdict flagges `infer_from_requires` dans l'ontologie.
+
+    Les ensembles de concepts sont des masques de bits (entiers Python) sur
+    un espace d'IDs canoniques interne : `infer` convertit `found_ids` /
+    `absent_ids` a l'entree, chaque test de require / d'exclusion est ensuite
+    une intersection de masques.
+    """
 
     def __init__(self, concepts: Dict[str, dict]):
         self.concepts = concepts
@@ -60,6 +68,18 @@ class PatternInferencer:
             for c, cd in concepts.items()
         }
         self._desc = {c: self._descendants(c) for c in self._canon2id}
+
+        # espace d'IDs interne : canon -> bit
+        universe = set(self._canon2id)
+        for table in (self._children, self._requires, self._excl_fam, self._neg_of):
+            for refs in table.values():
+                universe.update(refs)
+        self._bit = {c: i for i, c in enumerate(sorted(universe))}
+        # c -> masque de {c} U descendants(c)
+        self._self_or_desc = {
+            c: self._mask([c, *self._desc.get(c, ())]) for c in self._bit
+        }
+
         # concepts-verdict opt-in (lecture du flag declaratif)
         self.targets = []  # [(canon_id, min_satisfied)]
         for c, cd in concepts.items():
@@ -70,6 +90,21 @@ class PatternInferencer:
                 kc = _canon(c)
                 self.targets.append((kc, len(self._requires.get(kc, [])) or 1))
 
+        # regles compilees par verdict : (canon, bit, min_sat, masque
+        # d'exclusion, [(masque positif, masque de polarite) par require])
+        self._compiled = []
+        for target, min_sat in self.targets:
+            reqs = self._requires.get(target, [])
+            excl = 0
+            for fam in self._excl_fam.get(target, []):
+                excl |= self._self_or_desc[fam]
+            req_masks = [
+                (self._self_or_desc[r],
+                 self._mask_union(self._self_or_desc[x] for x in self._neg_of.get(r, [])))
+                for r in reqs
+            ]
+            self._compiled.append((target, self._bit[target], min_sat, excl, req_masks))
+
     def _descendants(self, root: str) -> Set[str]:
         seen, stack = set(), list(self._children.get(root, ()))
         while stack:
@@ -80,24 +115,22 @@ class PatternInferencer:
             stack.extend(self._children.get(x, ()))
         return seen
 
-    def _present_or_desc(self, cid: str, found: Set[str]) -> bool:
-        return cid in found or bool(self._desc.get(cid, set()) & found)
-
-    def _require_satisfied(self, r: str, found: Set[str], absent: Set[str]) -> bool:
-        # positif : le require (ou un descendant) est present
-        if self._present_or_desc(r, found):
-            return True
-        # polarite : le pendant pathologique du require est explicitement absent
-        for x in self._neg_of.get(r, []):
-            if x in absent or (self._desc.get(x, set()) & absent):
-                return True
-        return False
-
-    def _excluded(self, target: str, found: Set[str]) -> Optional[str]:
-        for fam in self._excl_fam.get(target, []):
-            if self._present_or_desc(fam, found):
-                return fam
-        return None
+    def _mask(self, ids) -> int:
+        """Masque des IDs canoniques connus (les autres sont ignores)."""
+        bit = self._bit
+        m = 0
+        for c in ids:
+            i = bit.get(c)
+            if i is not None:
+                m |= 1 << i
+        return m
+
+    @staticmethod
+    def _mask_union(masks) -> int:
+        m = 0
+        for x in masks:
+            m |= x
+        return m
 
     def infer(self, found_ids, absent_ids=None):
         """Renvoie une liste de dicts pour chaque concept-verdict infere :
@@ -106,23 +139,24 @@ class PatternInferencer:
         `found_ids`/`absent_ids` : iterables d'IDs ontologiques (present/absent).
         N'infere PAS un concept deja present. Idempotent, point fixe.
         """
-        found = {_canon(x) for x in (found_ids or [])}
-        absent = {_canon(x) for x in (absent_ids or [])}
+        found = self._mask(_canon(x) for x in (found_ids or []))
+        absent = self._mask(_canon(x) for x in (absent_ids or []))
         out = []
-        emitted: Set[str] = set()
+        emitted = 0
         changed = True
         while changed:
             changed = False
-            for target, min_sat in self.targets:
-                if target in found or target in emitted:
+            for target, bit, min_sat, excl, req_masks in self._compiled:
+                if (found | emitted) >> bit & 1:
                     continue
-                reqs = self._requires.get(target, [])
-                if not reqs:
+                if not req_masks:
                     continue
                 # ecran excludes : une famille pathologique presente => pas de verdict
-                if self._excluded(target, found):
+                if excl & found:
                     continue
-                n_ok = sum(1 for r in reqs if self._require_satisfied(r, found, absent))
+                # require satisfait : lui (ou un descendant) present, OU son
+                # pendant pathologique (ou un descendant) explicitement absent
+                n_ok = sum(1 for pos, neg in req_masks if pos & found or neg & absent)
                 if n_ok >= min_sat:
                     cid = self._canon2id.get(target, target)
                     out.append({
@@ -130,9 +164,9 @@ class PatternInferencer:
                         "statut": "present",
                         "method": "pattern_inference",
                         "n_requires": n_ok,
-                        "n_total": len(reqs),
+                        "n_total": len(req_masks),
                     })
-                    emitted.add(target)
-                    found.add(target)  # peut declencher un autre verdict
+                    emitted |= 1 << bit
+                    found |= 1 << bit  # peut declencher un autre verdict
                     changed = True
         return out
@@ -17,6 +17,9 @@ Utilisation :
     feedback = generate_pedagogical_feedback(report)
     print(feedback.texte)
 
+    # asyncio (AsyncOpenAI partagé, même enchaînement d'appels) :
+    feedback = await agenerate_pedagogical_feedback(report)
+
 Auteur : BMad Team
 Date   : 2026-02-28
 """
@@ -27,13 +30,18 @@ import json
 import logging
 import os
 import re
+import threading
+import time
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Set
 
-from openai import OpenAI
 from pydantic import BaseModel, Field
 
+from feedback_cache import FeedbackCache
+from llm_clients import ChatRequest, LLMSteps, arun_steps, get_client, run_steps
+from llm_scheduler import estimate_text_tokens
 from edn_knowledge_base import (
+    EDN_ENTRIES,
     EDNEntry,
     get_edn_entry,
     get_edn_entries_for_ids,
@@ -61,68 +69,113 @@ class PedagogicalFeedback:
     concepts_cours_cites: List[str]     # Noms des concepts pour lesquels le cours est cité
     has_critical_miss: bool             # True si un concept rang A a été manqué
     erreur: Optional[str] = None
+    # Suivi de la chaîne (rédaction → garde-fous) : latence par étape (s),
+    # appels LLM émis, et réécritures évitées par la réécriture groupée.
+    etapes_s: Dict[str, float] = field(default_factory=dict)
+    n_appels_llm: int = 0
+    n_appels_evites: int = 0
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Construction du contexte de cours pour le prompt
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _build_course_context(report) -> str:
-    """
-    Construit le contexte de cours pertinent à injecter dans le prompt GPT.
-    Sélectionne uniquement les entrées EDN liées aux concepts du cas.
-    """
-    # Collecter tous les ontology_ids pertinents pour ce cas
-    relevant_ids: Set[str] = set()
-
-    # IDs des validants (attendus)
-    for vd in report.validant_details:
-        relevant_ids.add(vd.golden_id)
+# Plafond (tokens estimés) du contexte de cours injecté dans le prompt de
+# rédaction — et relu par le juge clinique.
+COURSE_CONTEXT_TOKEN_BUDGET = int(os.getenv("FEEDBACK_COURSE_CONTEXT_TOKENS", "2000"))
+
+_COURSE_CONTEXT_HEADER = "=== EXTRAITS DU COURS SFC — Item 231 (EDN) ===\n"
+_RANG_LABELS = {"A": "RANG A (indispensable)", "B": "RANG B (important)", "C": "RANG C (complémentaire)"}
+_RANG_ORDER = {"A": 0, "B": 1, "C": 2}
+
+
+@dataclass(frozen=True)
+class CourseBlock:
+    """Bloc de cours pré-rendu d'une entrée EDN (EDN_ENTRIES est statique)."""
+    entry: EDNEntry
+    texte: str
+    n_tokens: int
+
+
+def _render_course_block(entry: EDNEntry) -> str:
+    parts = [f"--- {entry.titre_cours} [{_RANG_LABELS.get(entry.rang_edn, entry.rang_edn)}] ---"]
+    parts.append(f"Extrait : {entry.extrait_cours}")
+    if entry.points_cles:
+        parts.append("Points clés :")
+        for pc in entry.points_cles:
+            parts.append(f"  • {pc}")
+    if entry.pieges_classiques:
+        parts.append("Pièges classiques :")
+        for piege in entry.pieges_classiques:
+            parts.append(f"  ⚠️ {piege}")
+    parts.append("")
+    return "\n".join(parts)
 
-    # IDs des descripteurs (attendus)
-    for dd in report.descripteur_details:
-        relevant_ids.add(dd.golden_id)
 
-    # IDs des concepts trouvés par le candidat
-    for c in report.concepts_extraits:
-        if c.ontology_id != "NONE":
-            relevant_ids.add(c.ontology_id)
+def _compile_course_blocks() -> Dict[int, CourseBlock]:
+    blocks = {}
+    for entry in EDN_ENTRIES:
+        texte = _render_course_block(entry)
+        blocks[id(entry)] = CourseBlock(entry, texte, estimate_text_tokens(texte) + 1)
+    return blocks
 
-    # IDs des découvertes
-    for dec in report.decouvertes:
-        relevant_ids.add(dec.ontology_id)
 
-    # Récupérer les entrées EDN (dédupliquées par objet)
-    seen_entries: Set[int] = set()
-    entries: List[EDNEntry] = []
+# id(EDNEntry) → bloc rendu, une fois pour toutes à l'import.
+_COURSE_BLOCKS: Dict[int, CourseBlock] = _compile_course_blocks()
+_HEADER_TOKENS = estimate_text_tokens(_COURSE_CONTEXT_HEADER) + 1
 
-    for oid in relevant_ids:
-        entry = get_edn_entry(oid)
-        if entry and id(entry) not in seen_entries:
-            seen_entries.add(id(entry))
-            entries.append(entry)
 
-    if not entries:
+def _relevant_course_blocks(report) -> List[CourseBlock]:
+    """
+    Blocs de cours liés au cas, du plus au moins pertinent pour le feedback :
+    validants manqués, validants trouvés, descripteurs, puis concepts cités
+    par l'étudiant (extraits, découvertes) ; rang EDN A → C au sein d'un
+    même niveau, ordre du golden / du texte ensuite. Une entrée n'apparaît
+    qu'une fois (au niveau le plus pertinent).
+    """
+    tiers: List[List[str]] = [
+        [vd.golden_id for vd in report.validant_details if not vd.found],
+        [vd.golden_id for vd in report.validant_details if vd.found],
+        [dd.golden_id for dd in report.descripteur_details],
+        [c.ontology_id for c in report.concepts_extraits if c.ontology_id != "NONE"]
+        + [dec.ontology_id for dec in report.decouvertes],
+    ]
+    seen: Set[int] = set()
+    ranked = []
+    for tier, ids in enumerate(tiers):
+        for pos, oid in enumerate(ids):
+            entry = get_edn_entry(oid)
+            if entry is None or id(entry) in seen:
+                continue
+            seen.add(id(entry))
+            ranked.append((tier, _RANG_ORDER.get(entry.rang_edn, 3), pos, _COURSE_BLOCKS[id(entry)]))
+    ranked.sort(key=lambda r: r[:3])
+    return [r[3] for r in ranked]
+
+
+def _build_course_context(report, token_budget: Optional[int] = None) -> str:
+    """
+    Construit le contexte de cours pertinent à injecter dans le prompt GPT.
+    Sélectionne uniquement les entrées EDN liées aux concepts du cas, par
+    pertinence décroissante, jusqu'au budget de tokens (le bloc le plus
+    pertinent est toujours inclus).
+    """
+    budget = COURSE_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    blocks = _relevant_course_blocks(report)
+    if not blocks:
         return "Aucun extrait de cours pertinent trouvé pour ce cas."
 
-    # Construire le texte de contexte
-    parts = []
-    parts.append("=== EXTRAITS DU COURS SFC — Item 231 (EDN) ===\n")
-
-    for entry in entries:
-        rang_label = {"A": "RANG A (indispensable)", "B": "RANG B (important)", "C": "RANG C (complémentaire)"}
-        parts.append(f"--- {entry.titre_cours} [{rang_label.get(entry.rang_edn, entry.rang_edn)}] ---")
-        parts.append(f"Extrait : {entry.extrait_cours}")
-        if entry.points_cles:
-            parts.append("Points clés :")
-            for pc in entry.points_cles:
-                parts.append(f"  • {pc}")
-        if entry.pieges_classiques:
-            parts.append("Pièges classiques :")
-            for piege in entry.pieges_classiques:
-                parts.append(f"  ⚠️ {piege}")
-        parts.append("")
-
+    parts = [_COURSE_CONTEXT_HEADER]
+    used = _HEADER_TOKENS
+    for block in blocks:
+        if len(parts) > 1 and used + block.n_tokens > budget:
+            logger.debug(
+                f"Contexte de cours plafonné à {used} tokens : "
+                f"{len(blocks) - len(parts) + 1} entrée(s) EDN omise(s)."
+            )
+            break
+        parts.append(block.texte)
+        used += block.n_tokens
     return "\n".join(parts)
 
 
@@ -427,43 +480,6 @@ def _detect_status_contradiction(texte: str) -> bool:
     return bool(_STATUS_CONTRADICTION_POS_RE.search(texte) and _STATUS_CONTRADICTION_NEG_RE.search(texte))
 
 
-def _neutralize_status_contradiction(texte: str, model: str = "gpt-4o") -> str:
-    """
-    Demande une réécriture ciblée pour lever une contradiction de statut
-    détectée par `_detect_status_contradiction` : le rédacteur doit choisir,
-    pour chaque concept concerné, UNE SEULE formulation cohérente avec les
-    données réelles (found=True/False, match_type) déjà fournies dans le
-    contexte, sans changer le reste du texte ni son ton général.
-    """
-    client = OpenAI()
-    retry_message = f"""Le texte de feedback pédagogique suivant contient une
-CONTRADICTION DE FORMULATION : il affirme, pour un même concept ou des
-concepts très proches, à la fois qu'il a été "mentionné/identifié/noté
-explicitement" ET qu'il n'a "pas été nommé explicitement" (ou une
-formulation équivalente). Ces deux affirmations ne peuvent pas être vraies
-en même temps pour un même concept.
-
-Réécris le texte en choisissant, pour chaque concept concerné, UNE SEULE
-formulation cohérente (en te basant sur le sens global du texte : si un
-concept a globalement été présenté comme trouvé/identifié, garde cette
-version ; sinon garde la version "non nommé explicitement"), SANS changer
-le reste du texte ni son ton général, et en respectant STRICTEMENT toutes
-les règles système (jargon interdit, rangs EDN, ton vs score, citations
-réelles uniquement) :
-
-{texte}"""
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": retry_message},
-        ],
-        temperature=0.3,
-        max_tokens=800,
-    )
-    return (response.choices[0].message.content or "").strip()
-
-
 # ──────────────────────────────────────────────────────────────────────────────
 # Validation post-hoc des affirmations cliniques (piste "problèmes résiduels"
 # de l'audit 2026-08-06) : un second appel LLM, dédié et à température nulle,
@@ -531,7 +547,7 @@ def _validate_clinical_claims(
     course_context: str,
     student_summary: str,
     model: str = "gpt-4o",
-) -> ClinicalClaimValidation:
+) -> LLMSteps[ClinicalClaimValidation]:
     """
     Appelle un juge LLM dédié (Structured Outputs) pour détecter toute
     affirmation clinique du texte de feedback non fondée par le contexte
@@ -539,7 +555,6 @@ def _validate_clinical_claims(
     sécurité post-génération : en cas de détection, une reformulation
     corrective ciblée est demandée au rédacteur (cf. appelant).
     """
-    client = OpenAI()
     user_message = f"""CONTEXTE FOURNI AU RÉDACTEUR (concepts + cours) :
 
 {student_summary}
@@ -549,14 +564,17 @@ def _validate_clinical_claims(
 TEXTE DE FEEDBACK À VÉRIFIER :
 
 {feedback_text}"""
-    response = client.beta.chat.completions.parse(
-        model=model,
-        messages=[
-            {"role": "system", "content": _CLINICAL_VALIDATOR_SYSTEM_PROMPT},
-            {"role": "user", "content": user_message},
-        ],
-        temperature=0,
+    response = yield ChatRequest(
+        dict(
+            model=model,
+            messages=[
+                {"role": "system", "content": _CLINICAL_VALIDATOR_SYSTEM_PROMPT},
+                {"role": "user", "content": user_message},
+            ],
+            temperature=0,
+        ),
         response_format=ClinicalClaimValidation,
+        etape="validation_clinique",
     )
     parsed = response.choices[0].message.parsed
     if parsed is None:
@@ -564,36 +582,82 @@ TEXTE DE FEEDBACK À VÉRIFIER :
     return parsed
 
 
-def _correct_unfounded_claims(
+# ──────────────────────────────────────────────────────────────────────────────
+# Réécriture ciblée groupée : les garde-fous post-hoc (jargon, affirmations
+# cliniques non fondées, contradiction de statut) sont évalués sur le même
+# brouillon, puis TOUTES les corrections demandées sont fusionnées en un seul
+# appel au rédacteur — au lieu de jusqu'à trois réécritures enchaînées
+# (reformulation anti-jargon, correction clinique, neutralisation), chacune
+# relisant la sortie de la précédente.
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class GuardrailFindings:
+    """Problèmes relevés par les garde-fous sur un même brouillon."""
+    jargon: List[str] = field(default_factory=list)
+    validation: Optional[ClinicalClaimValidation] = None
+    contradiction: bool = False
+
+    @property
+    def unfounded(self) -> bool:
+        v = self.validation
+        return bool(v and v.contient_affirmation_non_fondee and v.passages_problematiques)
+
+    @property
+    def n_corrections(self) -> int:
+        """Nombre de réécritures qu'aurait demandées la chaîne séquentielle."""
+        return int(bool(self.jargon)) + int(self.unfounded) + int(self.contradiction)
+
+
+def _rewrite_flagged_feedback(
     feedback_text: str,
-    validation: ClinicalClaimValidation,
+    findings: GuardrailFindings,
     model: str = "gpt-4o",
-) -> str:
+) -> LLMSteps[str]:
     """
-    Demande une réécriture ciblée du texte de feedback pour retirer/adoucir
-    les passages signalés comme non fondés par le juge de validation
-    clinique, sans changer le reste du texte ni le ton général.
+    Une seule réécriture ciblée corrigeant tous les problèmes relevés
+    (`findings`), sans changer le reste du texte ni le ton général.
     """
-    client = OpenAI()
-    passages = "\n".join(f"- « {p} »" for p in validation.passages_problematiques)
-    retry_message = f"""Le texte de feedback pédagogique suivant contient des
-affirmations cliniques jugées NON FONDÉES par le contexte réellement fourni
+    problemes = []
+    if findings.jargon:
+        problemes.append("""JARGON TECHNIQUE INTERDIT : termes de pipeline comme "match", "type de
+match", "qualifier", "support", "rang A/B/C", des pourcentages bruts, ou une
+citation placeholder non réelle « extrait du cours ». Reformule ces passages
+en langage naturel destiné à un étudiant, sans changer le fond clinique.""")
+    if findings.unfounded:
+        passages = "\n".join(f"- « {p} »" for p in findings.validation.passages_problematiques)
+        problemes.append(f"""AFFIRMATIONS CLINIQUES NON FONDÉES par le contexte réellement fourni
 (règle diagnostique, distinction terminologique ou mécanisme physiopatho-
 logique inventé, absent du contexte) :
 
 {passages}
 
-Raison : {validation.justification}
+Raison : {findings.validation.justification}
+
+SUPPRIME ou NEUTRALISE uniquement ces passages (remplace-les par une
+formulation neutre qui reste dans les limites du contexte fourni, ou
+supprime-les si aucune reformulation fondée n'est possible).""")
+    if findings.contradiction:
+        problemes.append("""CONTRADICTION DE FORMULATION : le texte affirme, pour un même concept ou
+des concepts très proches, à la fois qu'il a été "mentionné/identifié/noté
+explicitement" ET qu'il n'a "pas été nommé explicitement" (ou une
+formulation équivalente). Choisis, pour chaque concept concerné, UNE SEULE
+formulation cohérente (en te basant sur le sens global du texte : si un
+concept a globalement été présenté comme trouvé/identifié, garde cette
+version ; sinon garde la version "non nommé explicitement").""")
+
+    liste = "\n\n".join(f"{i}. {p}" for i, p in enumerate(problemes, 1))
+    retry_message = f"""Le texte de feedback pédagogique suivant présente le(s) problème(s)
+ci-dessous, à corriger TOUS dans une seule réécriture :
+
+{liste}
 
-Réécris le texte en SUPPRIMANT ou en NEUTRALISANT uniquement ces passages
-(remplace-les par une formulation neutre qui reste dans les limites du
-contexte fourni, ou supprime-les si aucune reformulation fondée n'est
-possible), SANS modifier le reste du texte ni son ton général, et en
-respectant STRICTEMENT toutes les règles système (jargon interdit, rangs
-EDN, ton vs score, citations réelles uniquement) :
+Ne modifie rien d'autre : même fond clinique hors passages signalés, même
+ton général, et respecte STRICTEMENT toutes les règles système (jargon
+interdit, rangs EDN, ton vs score, citations réelles uniquement) :
 
 {feedback_text}"""
-    response = client.chat.completions.create(
+    response = yield ChatRequest(dict(
         model=model,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -601,10 +665,32 @@ EDN, ton vs score, citations réelles uniquement) :
         ],
         temperature=0.3,
         max_tokens=800,
-    )
+    ), etape="reecriture_ciblee")
     return (response.choices[0].message.content or "").strip()
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Cache des feedbacks par issue notée (optionnel, cf. feedback_cache)
+# ──────────────────────────────────────────────────────────────────────────────
+
+_feedback_cache: Optional[FeedbackCache] = None
+_feedback_cache_lock = threading.Lock()
+
+
+def get_feedback_cache() -> FeedbackCache:
+    """Cache des feedbacks (FEEDBACK_CACHE, désactivé par défaut)."""
+    global _feedback_cache
+    with _feedback_cache_lock:
+        if _feedback_cache is None:
+            _feedback_cache = FeedbackCache.from_env()
+        return _feedback_cache
+
+
+def feedback_cache_stats() -> Dict:
+    """Hit rate du cache des feedbacks (part des chaînes de feedback évitées)."""
+    return get_feedback_cache().stats()
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Fonction principale
 # ──────────────────────────────────────────────────────────────────────────────
@@ -630,6 +716,34 @@ def generate_pedagogical_feedback(
     Returns:
         PedagogicalFeedback avec texte du commentaire et métadonnées.
     """
+    return run_steps(
+        _feedback_steps(report, model, temperature, commentaire_correcteur), get_client
+    )
+
+
+async def agenerate_pedagogical_feedback(
+    report,
+    model: str = "gpt-4o",
+    temperature: float = 0.7,
+    commentaire_correcteur: str = "",
+) -> PedagogicalFeedback:
+    """Variante asyncio de generate_pedagogical_feedback (AsyncOpenAI partagé)."""
+    return await arun_steps(
+        _feedback_steps(report, model, temperature, commentaire_correcteur)
+    )
+
+
+def _feedback_steps(
+    report,
+    model: str = "gpt-4o",
+    temperature: float = 0.7,
+    commentaire_correcteur: str = "",
+) -> LLMSteps[PedagogicalFeedback]:
+    """
+    Enchaînement rédaction → garde-fous (cf. llm_clients) : au plus trois
+    appels — rédaction, juge clinique, puis une réécriture ciblée groupée
+    si un garde-fou a relevé un problème.
+    """
     # Vérifier qu'il y a un rapport exploitable
     if report.erreur:
         return PedagogicalFeedback(
@@ -669,9 +783,37 @@ def generate_pedagogical_feedback(
 
 Rédige le commentaire pédagogique en un seul texte continu (pas de titres, pas de sections numérotées), en respectant strictement les règles de ton, de rang EDN et de formulation par match_type données dans les instructions système."""
 
+    etapes_s: Dict[str, float] = {}
+    n_appels = 0
+    t = time.perf_counter()
+
+    # Même issue notée déjà commentée (cache optionnel) : pas d'appel LLM.
+    cache = get_feedback_cache()
+    cache_key = None
+    if cache.enabled:
+        cache_key = cache.key(
+            report, course_context, commentaire_correcteur, model, temperature,
+            SYSTEM_PROMPT + _CLINICAL_VALIDATOR_SYSTEM_PROMPT,
+        )
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            etapes_s["cache"] = round(time.perf_counter() - t, 3)
+            return PedagogicalFeedback(
+                texte=_enforce_tone_guardrail(cached_text, report.score_final_pct),
+                rang_edn_manques=rang_manques,
+                concepts_cours_cites=concepts_cites,
+                has_critical_miss=has_critical,
+                etapes_s=etapes_s,
+            )
+
+    def lap(etape: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        etapes_s[etape] = round(now - t, 3)
+        t = now
+
     try:
-        client = OpenAI()
-        response = client.chat.completions.create(
+        response = yield ChatRequest(dict(
             model=model,
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -679,92 +821,87 @@ Rédige le commentaire pédagogique en un seul texte continu (pas de titres, pas
             ],
             temperature=temperature,
             max_tokens=800,
-        )
+        ), etape="redaction")
+        n_appels += 1
         feedback_text = (response.choices[0].message.content or "").strip()
-
-        # Garde-fou P2 (belt-and-suspenders) : si du jargon technique interne
-        # a fui dans le texte malgré l'instruction système, on redemande UNE
-        # fois une reformulation strictement corrective avant d'abandonner.
-        jargon_found = _detect_jargon_leak(feedback_text)
-        if jargon_found:
-            logger.warning(f"Fuite de jargon détectée dans le feedback ({jargon_found}) — nouvelle tentative de reformulation.")
-            retry_message = f"""Le texte suivant contient du jargon technique interdit
-(termes de pipeline comme "match", "type de match", "qualifier", "support",
-"rang A/B/C", des pourcentages bruts, ou une citation placeholder non réelle
-« extrait du cours »). Réécris-le en langage naturel destiné à un étudiant,
-en respectant STRICTEMENT les mêmes règles système (aucun de ces termes ne
-doit apparaître), sans changer le fond clinique du message :
-
-{feedback_text}"""
-            retry_response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": retry_message},
-                ],
-                temperature=0.3,
-                max_tokens=800,
-            )
-            retried_text = (retry_response.choices[0].message.content or "").strip()
-            if retried_text and not _detect_jargon_leak(retried_text):
-                feedback_text = retried_text
-            else:
-                logger.warning("La reformulation n'a pas éliminé le jargon détecté — texte conservé tel quel.")
+        lap("redaction")
+
+        # ═══════════════════════════════════════════════════════════════
+        # Garde-fous post-hoc (DAG) : étage 1 = contrôles indépendants sur le
+        # MÊME brouillon ; étage 2 = une seule réécriture ciblée regroupant
+        # toutes les corrections demandées.
+        # ═══════════════════════════════════════════════════════════════
+        # Garde-fou P2 (belt-and-suspenders) : jargon technique interne qui
+        # aurait fui malgré l'instruction système.
+        # Garde-fou déterministe complémentaire (P3.3, 2026-08-10) : le juge
+        # LLM ci-dessous ne détecte pas les contradictions de FORMULATION
+        # (mentionné explicitement / sans le nommer explicitement pour un
+        # même concept) — mesuré à ~13% des générations sur match_type
+        # indirect, sans déclenchement du juge LLM dans ces cas précis (cf.
+        # docs/P3.3_challenge_set_results_2026_08_10.md). Détection par
+        # règle simple, sans appel LLM supplémentaire.
+        # Ces contrôles (regex, quelques µs) sont faits avant l'envoi du juge :
+        # ils n'ajoutent rien à la latence de l'étage.
+        findings = GuardrailFindings(
+            jargon=_detect_jargon_leak(feedback_text),
+            contradiction=_detect_status_contradiction(feedback_text),
+        )
+        lap("controles_deterministes")
 
         # Validation post-hoc des affirmations cliniques : un juge LLM dédié
         # relit le texte à la lumière STRICTE du contexte fourni, et signale
         # toute affirmation clinique non fondée (règle inventée, distinction
         # terminologique non fournie, mécanisme physiopathologique absent du
-        # cours). En cas de détection, une reformulation ciblée est demandée
-        # (retire/neutralise uniquement les passages fautifs, sans réécrire
-        # tout le texte).
+        # cours).
         try:
-            validation = _validate_clinical_claims(feedback_text, course_context, student_summary, model=model)
-            if validation.contient_affirmation_non_fondee and validation.passages_problematiques:
-                logger.warning(
-                    f"Affirmation(s) clinique(s) non fondée(s) détectée(s) : "
-                    f"{validation.passages_problematiques} — {validation.justification}"
-                )
-                corrected_text = _correct_unfounded_claims(feedback_text, validation, model=model)
-                if corrected_text:
-                    # Re-vérifier que la correction n'a pas réintroduit du jargon
-                    if not _detect_jargon_leak(corrected_text):
-                        feedback_text = corrected_text
-                    else:
-                        logger.warning("La correction clinique a réintroduit du jargon — texte conservé tel quel.")
+            findings.validation = yield from _validate_clinical_claims(
+                feedback_text, course_context, student_summary, model=model
+            )
+            n_appels += 1
         except Exception as e_validate:
             # La validation post-hoc est un filet de sécurité best-effort :
             # une erreur ici ne doit jamais faire échouer la génération.
             logger.warning(f"Validation post-hoc des affirmations cliniques ignorée (erreur : {e_validate})")
+        lap("validation_clinique")
 
-        # Garde-fou déterministe complémentaire (P3.3, 2026-08-10) : le juge
-        # LLM ci-dessus ne détecte pas les contradictions de FORMULATION
-        # (mentionné explicitement / sans le nommer explicitement pour un
-        # même concept) — mesuré à ~13% des générations sur match_type
-        # indirect, sans déclenchement du juge LLM dans ces cas précis (cf.
-        # docs/P3.3_challenge_set_results_2026_08_10.md). Détection par
-        # règle simple, sans appel LLM supplémentaire tant qu'aucune
-        # contradiction n'est détectée.
-        if _detect_status_contradiction(feedback_text):
+        # Seul un texte entièrement contrôlé (juge clinique passé, problèmes
+        # relevés effectivement corrigés) peut être servi à d'autres étudiants.
+        cacheable = findings.validation is not None
+
+        if findings.jargon:
+            logger.warning(f"Fuite de jargon détectée dans le feedback ({findings.jargon}).")
+        if findings.unfounded:
+            logger.warning(
+                f"Affirmation(s) clinique(s) non fondée(s) détectée(s) : "
+                f"{findings.validation.passages_problematiques} — {findings.validation.justification}"
+            )
+        if findings.contradiction:
             logger.warning(
                 "Contradiction de statut détectée (formulation 'mentionné explicitement' "
-                "et 'sans le nommer explicitement' co-présentes) — reformulation ciblée demandée."
+                "et 'sans le nommer explicitement' co-présentes)."
             )
+
+        # Étage 2 : une réécriture pour l'ensemble des problèmes relevés
+        # (retire/neutralise uniquement les passages fautifs, sans réécrire
+        # tout le texte).
+        if findings.n_corrections:
+            rewrite_accepted = False
             try:
-                neutralized_text = _neutralize_status_contradiction(feedback_text, model=model)
-                if neutralized_text and not _detect_jargon_leak(neutralized_text):
-                    if not _detect_status_contradiction(neutralized_text):
-                        feedback_text = neutralized_text
-                    else:
-                        # La reformulation n'a pas résolu la contradiction : on
-                        # conserve quand même la nouvelle version (généralement
-                        # moins mauvaise) plutôt que d'abandonner silencieusement.
-                        feedback_text = neutralized_text
-                        logger.warning("La reformulation n'a pas complètement éliminé la contradiction de statut.")
+                rewritten = yield from _rewrite_flagged_feedback(feedback_text, findings, model=model)
+                n_appels += 1
+                if rewritten and not _detect_jargon_leak(rewritten):
+                    feedback_text = rewritten
+                    rewrite_accepted = True
+                    if findings.contradiction and _detect_status_contradiction(rewritten):
+                        # On conserve quand même la nouvelle version
+                        # (généralement moins mauvaise) plutôt que d'abandonner.
+                        logger.warning("La réécriture n'a pas complètement éliminé la contradiction de statut.")
                 else:
-                    logger.warning("La reformulation anti-contradiction a introduit du jargon — texte conservé tel quel.")
-            except Exception as e_neutralize:
-                logger.warning(f"Neutralisation de la contradiction de statut ignorée (erreur : {e_neutralize})")
+                    logger.warning("La réécriture ciblée contient (encore) du jargon — texte conservé tel quel.")
+            except Exception as e_rewrite:
+                logger.warning(f"Réécriture ciblée des garde-fous ignorée (erreur : {e_rewrite})")
+            cacheable = cacheable and rewrite_accepted
+            lap("reecriture_ciblee")
 
         feedback_text = _enforce_tone_guardrail(feedback_text, report.score_final_pct)
 
@@ -776,16 +913,31 @@ doit apparaître), sans changer le fond clinique du message :
             concepts_cours_cites=concepts_cites,
             has_critical_miss=has_critical,
             erreur=str(e)[:200],
+            etapes_s=etapes_s,
+            n_appels_llm=n_appels,
         )
 
+    if cache_key is not None and cacheable:
+        cache.put(
+            cache_key, feedback_text, report.texte_etudiant,
+            student_summary.replace(report.texte_etudiant, "") + "\n" + course_context,
+        )
+
+    n_evites = max(0, findings.n_corrections - 1)
+    logger.info(
+        f"Feedback : {n_appels} appel(s) LLM ({n_evites} réécriture(s) évitée(s)), "
+        + ", ".join(f"{k} {v:.2f}s" for k, v in etapes_s.items())
+    )
     return PedagogicalFeedback(
         texte=feedback_text,
         rang_edn_manques=rang_manques,
         concepts_cours_cites=concepts_cites,
         has_critical_miss=has_critical,
+        etapes_s=etapes_s,
+        n_appels_llm=n_appels,
+        n_appels_evites=n_evites,
     )
 
-
 # ──────────────────────────────────────────────────────────────────────────────
 # Feedback de secours (sans GPT)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -0,0 +1,218 @@
+"""
+⚖️ Cache des résolutions du Juge LLM (Brique 4)
+=================================================
+Le Juge (GPT-4o-mini, temperature=0, seed=42) est conçu pour être
+déterministe : un même (terme, contexte, candidats) doit donner la même
+résolution. Ce cache évite de repayer l'appel pour chaque tuple déjà vu
+(réponses récurrentes, re-corrections d'une même copie, benchmarks).
+
+Clé de contenu : hash(terme normalisé, contexte, candidats soumis — ids et
+surface_forms, dans l'ordre du QCM).
+
+Version du cache : hash(modèle, prompt système, empreinte de
+ontology_v2.json, empreinte de l'index (metadata_ontologie.json)). Toute
+modification de l'un d'eux purge le cache — à l'ouverture, et en cours de
+processus dès que la date/taille d'un des fichiers surveillés change.
+
+Configuration :
+  JUDGE_RESOLUTION_CACHE      chemin du fichier SQLite ("off" = désactivé)
+                              défaut : ~/.cache/edu-ecg/judge_resolutions.sqlite
+  JUDGE_RESOLUTION_CACHE_TTL  durée de vie d'une entrée en jours (défaut 30)
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from local_cache import SQLiteStore, content_hash, file_fingerprint, resolve_cache_path
+from ontology_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Borne disque : une résolution sérialisée pèse quelques centaines d'octets.
+MAX_ENTRIES = 200_000
+
+
+def default_watched_files() -> List[Path]:
+    """Fichiers dont le contenu versionne les résolutions : ontologie V2 + index."""
+    here = Path(__file__).parent
+    candidates = [
+        here.parent / "ECG lecture" / "data" / "ontology_v2.json",
+        here / "data" / "ontology_v2.json",
+        here / "rag_index" / "metadata_ontologie.json",
+    ]
+    return [p for p in candidates if p.exists()]
+
+
+class ResolutionCache:
+    """
+    Cache persistant (SQLite) des résolutions du Juge LLM.
+
+    Usage:
+        cache = ResolutionCache.from_env(model=MODEL, prompt=SYSTEM_PROMPT)
+        hit = cache.get(terme, contexte, candidats)
+        if hit is None:
+            hit = ...  # appel LLM
+            cache.put(terme, contexte, candidats, hit)
+        print(cache.stats())
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]],
+        model: str,
+        prompt: str,
+        watched_files: Optional[Sequence[Union[str, Path]]] = None,
+        ttl_days: Optional[float] = 30.0,
+    ):
+        self.model = model
+        self.prompt = prompt
+        self.watched_files = [Path(p) for p in (
+            default_watched_files() if watched_files is None else watched_files
+        )]
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._store: Optional[SQLiteStore] = None
+        if path is not None:
+            try:
+                self._store = SQLiteStore(
+                    path,
+                    max_entries=MAX_ENTRIES,
+                    ttl_s=ttl_days * 86400 if ttl_days else None,
+                )
+                self._check_version()
+            except Exception as e:
+                # Un cache inaccessible ne doit jamais bloquer la correction.
+                logger.warning(f"⚠️  Cache des résolutions désactivé ({path}) : {e}")
+                self._store = None
+
+    @classmethod
+    def from_env(cls, model: str, prompt: str) -> "ResolutionCache":
+        """Construit le cache selon JUDGE_RESOLUTION_CACHE / JUDGE_RESOLUTION_CACHE_TTL."""
+        path = resolve_cache_path("JUDGE_RESOLUTION_CACHE", "judge_resolutions.sqlite")
+        ttl_days = float(os.getenv("JUDGE_RESOLUTION_CACHE_TTL", "30"))
+        return cls(path, model, prompt, ttl_days=ttl_days or None)
+
+    # ------------------------------------------------------------------
+    # Version (modèle, prompt, ontologie, index)
+    # ------------------------------------------------------------------
+
+    def _file_stamp(self) -> Tuple:
+        """(chemin, mtime, taille) des fichiers surveillés — un stat, pas de hash."""
+        stamp = []
+        for p in self.watched_files:
+            try:
+                st = p.stat()
+                stamp.append((str(p), st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((str(p), None, None))
+        return tuple(stamp)
+
+    def version(self) -> str:
+        """Hash du modèle, du prompt et du contenu des fichiers surveillés."""
+        parts = [self.model, self.prompt]
+        for p in self.watched_files:
+            parts.append(file_fingerprint(p) if p.exists() else "")
+        return content_hash(*parts)
+
+    def _check_version(self) -> None:
+        """Re-hashe les fichiers surveillés s'ils ont changé depuis le dernier contrôle."""
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            self._stamp = stamp
+        if self._store.ensure_version(self.version()):
+            with self._lock:
+                self.invalidations += 1
+
+    def invalidate(self) -> None:
+        """Purge explicite (ex. après une correction manuelle de l'ontologie)."""
+        if self._store is not None:
+            self._store.clear()
+            with self._lock:
+                self.invalidations += 1
+
+    # ------------------------------------------------------------------
+    # Clé de contenu
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def key(terme_brut: str, contexte_phrase: str, candidates: Sequence[Dict]) -> str:
+        """Clé stable : hash(terme normalisé, contexte, candidats du QCM)."""
+        return content_hash(
+            normalize_text(terme_brut),
+            " ".join(contexte_phrase.split()),
+            *(f"{c['ontology_id']}\x1e{c['surface_form']}" for c in candidates),
+        )
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(
+        self, terme_brut: str, contexte_phrase: str, candidates: Sequence[Dict],
+    ) -> Optional[Dict]:
+        """Résolution en cache (nouveau dict) ou None."""
+        if self._store is None:
+            return None
+        try:
+            self._check_version()
+            raw = self._store.get(self.key(terme_brut, contexte_phrase, candidates))
+        except Exception as e:
+            logger.warning(f"⚠️  Lecture cache des résolutions échouée : {e}")
+            raw = None
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw.decode("utf-8"))
+
+    def put(
+        self,
+        terme_brut: str,
+        contexte_phrase: str,
+        candidates: Sequence[Dict],
+        resolution: Dict,
+    ) -> None:
+        """Enregistre la résolution du Juge pour ce tuple."""
+        if self._store is None:
+            return
+        try:
+            self._store.put(
+                self.key(terme_brut, contexte_phrase, candidates),
+                json.dumps(resolution, ensure_ascii=False).encode("utf-8"),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Écriture cache des résolutions échouée : {e}")
+
+    # ------------------------------------------------------------------
+    # Statistiques
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """Compteurs hit/miss depuis la création du cache (= appels Juge évités)."""
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "disk_entries": len(self._store) if self._store is not None else 0,
+            "disk_path": str(self._store.path) if self._store is not None else None,
+        }
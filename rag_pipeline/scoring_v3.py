@@ -46,6 +46,12 @@ Conversion des négations :
     Ex: absent(TROUBLE_DE_REPOLARISATION) → PAS_D_ANOMALIE_DE_LE_REPOLARISATION
     Si pas de mapping → ignoré.
 
+Cohorte :
+    `score_cohort_v3(expected_ids, found_sets, absent_sets)` score toute une
+    promotion sur un même cas en une passe NumPy (règles du cas compilées
+    une fois, cf. `CaseScoringPlan`), avec des résultats identiques au
+    scoring individuel.
+
 Auteur : BMad Team
 Date   : 2026-04-06
 """
@@ -56,12 +62,15 @@ import logging
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Set, Tuple
 
+import numpy as np
+
 from semantic_layer import (
     get_concept,
     load_ontology_v2,
     normalize_key,
     _get_ontology_v2,
 )
+from ontology_graph import OntologyGraph, get_ontology_graph, iter_bits
 import scoring_thresholds
 
 logger = logging.getLogger(__name__)
@@ -100,7 +109,7 @@ def find_owl_concept(concept_text: str) -> Optional[Dict]:
     """
     Cherche un concept dans l'ontologie V2 par son label français.
 
-    Stratégie de recherche (par ordre de priorité) :
+    Stratégie de recherche (par ordre de priorité, cf. ontology_graph.LabelIndex) :
       1. Match exact sur concept_name (case-insensitive)
       2. Match exact sur un synonyme
       3. Match partiel (contient / est contenu dans)
@@ -112,44 +121,22 @@ def find_owl_concept(concept_text: str) -> Optional[Dict]:
         dict avec ontology_id, concept_name, poids, categorie, synonymes.
         Retourne un dict par défaut (poids=1) si non trouvé.
     """
-    onto = _get_ontology_v2()
-    concepts = onto.get("concepts", {})
+    g = get_ontology_graph()
     concept_lower = concept_text.lower().strip()
 
-    # 1. Recherche exacte par concept_name
-    for cid, cdata in concepts.items():
-        if cdata.get("concept_name", "").lower().strip('"') == concept_lower:
-            return {
-                "ontology_id": cid,
-                "concept_name": cdata.get("concept_name", "").strip('"'),
-                "poids": cdata.get("poids", 1),
-                "categorie": cdata.get("categorie", "DESCRIPTEUR_ECG"),
-                "synonymes": cdata.get("synonymes", []),
-            }
-
-    # 2. Recherche par synonymes
-    for cid, cdata in concepts.items():
-        synonymes = [s.lower() for s in cdata.get("synonymes", [])]
-        if concept_lower in synonymes:
-            return {
-                "ontology_id": cid,
-                "concept_name": cdata.get("concept_name", "").strip('"'),
-                "poids": cdata.get("poids", 1),
-                "categorie": cdata.get("categorie", "DESCRIPTEUR_ECG"),
-                "synonymes": cdata.get("synonymes", []),
-            }
-
-    # 3. Recherche partielle (contient)
-    for cid, cdata in concepts.items():
-        cname = cdata.get("concept_name", "").lower().strip('"')
-        if concept_lower in cname or cname in concept_lower:
-            return {
-                "ontology_id": cid,
-                "concept_name": cdata.get("concept_name", "").strip('"'),
-                "poids": cdata.get("poids", 1),
-                "categorie": cdata.get("categorie", "DESCRIPTEUR_ECG"),
-                "synonymes": cdata.get("synonymes", []),
-            }
+    # Index des libellés (noms, synonymes, trigrammes), construit une fois
+    # par chargement d'ontologie ; même priorité que les trois parcours
+    # historiques (exact > synonyme > partiel, premier concept gagnant).
+    cid = g.labels.lookup(concept_lower)
+    if cid is not None:
+        cdata = g.concepts[cid]
+        return {
+            "ontology_id": cid,
+            "concept_name": cdata.get("concept_name", "").strip('"'),
+            "poids": cdata.get("poids", 1),
+            "categorie": cdata.get("categorie", "DESCRIPTEUR_ECG"),
+            "synonymes": cdata.get("synonymes", []),
+        }
 
     # Pas trouvé → dict par défaut
     return {
@@ -262,24 +249,13 @@ def convert_absents_to_positive(absent_ids: List[str]) -> List[Tuple[str, str]]:
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
+# Les relations de l'ontologie sont compilées une fois dans `OntologyGraph`
+# (fermetures descendantes/ascendantes, familles développées, masques de
+# bits) : chaque vérification est une intersection de masques.
 
 def _get_all_children_recursive(concept_id: str, max_depth: int = 3) -> Set[str]:
     """Retourne tous les enfants (descendants) d'un concept."""
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    result = set()
-
-    def _walk(cid, depth):
-        if depth > max_depth:
-            return
-        c = concepts.get(cid, {})
-        for child in c.get("children", []):
-            if child not in result:
-                result.add(child)
-                _walk(child, depth + 1)
-
-    _walk(concept_id, 0)
-    return result
+    return get_ontology_graph().descendant_ids(concept_id, max_depth)
 
 
 def _check_excludes(
@@ -291,26 +267,8 @@ def _check_excludes(
     ou excludes_families du concept attendu.
     Retourne l'ID du concept excluant trouvé, ou None.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    c = concepts.get(concept_id, {})
-
-    # Excludes directs
-    for exc in c.get("excludes", []):
-        if exc in found_set:
-            return exc
-
-    # Excludes families : chaque famille = un concept parent dont tous
-    # les descendants sont exclus
-    for fam in c.get("excludes_families", []):
-        if fam in found_set:
-            return fam
-        children = _get_all_children_recursive(fam)
-        hit = found_set & children
-        if hit:
-            return sorted(hit)[0]
-
-    return None
+    g = get_ontology_graph()
+    return g.excluded_by(g.rules(concept_id), g.mask(found_set))
 
 
 def _get_all_parents_recursive(concept_id: str, max_depth: int = 3) -> Dict[str, int]:
@@ -318,21 +276,7 @@ def _get_all_parents_recursive(concept_id: str, max_depth: int = 3) -> Dict[str,
     Retourne tous les ancêtres d'un concept avec leur distance.
     {parent_id: distance} où distance = 1 pour parent direct, 2 pour grand-parent, etc.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    result: Dict[str, int] = {}
-
-    def _walk(cid: str, depth: int):
-        if depth > max_depth:
-            return
-        c = concepts.get(cid, {})
-        for parent in c.get("parents", []):
-            if parent not in result or depth < result[parent]:
-                result[parent] = depth
-                _walk(parent, depth + 1)
-
-    _walk(concept_id, 1)
-    return result
+    return get_ontology_graph().ancestor_ids(concept_id, max_depth)
 
 
 def _find_child_in_found(concept_id: str, found_set: Set[str]) -> Optional[str]:
@@ -341,9 +285,8 @@ def _find_child_in_found(concept_id: str, found_set: Set[str]) -> Optional[str]:
     Un enfant est plus spécifique → mérite les points complets.
     Retourne le premier enfant trouvé, ou None.
     """
-    children = _get_all_children_recursive(concept_id, max_depth=3)
-    hit = found_set & children
-    return sorted(hit)[0] if hit else None
+    g = get_ontology_graph()
+    return g.first(g.rules(concept_id).descendants & g.mask(found_set))
 
 
 # Crédit accordé quand un ANTÉCÉDENT clinique (relation `implies`) est trouvé.
@@ -370,16 +313,8 @@ def _find_antecedent_in_found(concept_id: str, found_set: Set[str]) -> Optional[
     Moteur GÉNÉRIQUE : aucun couple codé en dur, tout est lu dans l'ontologie.
     Retourne l'ID de l'antécédent trouvé, ou None.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    for fid in found_set:
-        fc = concepts.get(fid)
-        if not fc:
-            continue
-        for tgt in fc.get("implies", []) or []:
-            if normalize_key(tgt) == concept_id:
-                return fid
-    return None
+    g = get_ontology_graph()
+    return g.first(g.rules(concept_id).implied_by & g.mask(found_set))
 
 
 # Crédit accordé quand un concept négatif attendu est validé par la NÉGATION
@@ -409,14 +344,9 @@ def _find_negated_pole_in_absent(concept_id: str, absent_set: Set[str]) -> Optio
     l'ontologie (`negation_of`), validées et mesurées. Retourne l'ID du pôle
     positif nié trouvé, ou None.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    c = concepts.get(concept_id)
-    if not c:
-        return None
-    for pole in c.get("negation_of", []) or []:
-        if normalize_key(pole) in absent_set:
-            return normalize_key(pole)
+    for pole in get_ontology_graph().rules(concept_id).negation_of:
+        if pole in absent_set:
+            return pole
     return None
 
 
@@ -426,14 +356,8 @@ def _find_parent_in_found(concept_id: str, found_set: Set[str]) -> Tuple[Optiona
     Retourne (parent_id, distance) du parent le plus proche trouvé, ou (None, 0).
     Distance 1 = parent direct (→ 2/3), distance 2+ = grand-parent (→ 1/3).
     """
-    parents = _get_all_parents_recursive(concept_id, max_depth=3)
-    best_parent = None
-    best_dist = 999
-    for pid, dist in parents.items():
-        if pid in found_set and dist < best_dist:
-            best_parent = pid
-            best_dist = dist
-    return (best_parent, best_dist) if best_parent else (None, 0)
+    g = get_ontology_graph()
+    return g.closest_ancestor(g.rules(concept_id), g.mask(found_set))
 
 
 # ---------------------------------------------------------------------------
@@ -455,42 +379,39 @@ def _score_sub_require(
     Ex : QRS_NORMAL requires [QRS_FINS, ABSENCE_D_ONDE_Q_PATHOLOGIQUE]
          Si QRS_FINS trouvé → score = 0.5 (1/2 requires)
     """
+    g = get_ontology_graph()
+    return _sub_require_credit(g, concept_id, g.mask(found_set), depth, max_depth)
+
+
+def _sub_require_credit(
+    g: OntologyGraph,
+    concept_id: str,
+    found: int,
+    depth: int,
+    max_depth: int,
+) -> float:
+    """Cœur de `_score_sub_require` sur un masque de concepts trouvés."""
     if depth >= max_depth:
         return 0.0
 
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
-    c = concepts.get(concept_id, {})
+    rules = g.rules(concept_id)
 
     # Check requires
-    requires = c.get("requires", [])
-    if requires:
+    if rules.requires:
         credit = 0.0
-        for r in requires:
-            nr = normalize_key(r)
-            if nr in found_set:
+        for r, nr in rules.requires:
+            if found >> nr & 1:
                 credit += 1.0
             else:
-                credit += _score_sub_require(nr, found_set, depth + 1, max_depth)
-        return credit / len(requires)
+                credit += _sub_require_credit(g, g.ids[nr], found, depth + 1, max_depth)
+        return credit / len(rules.requires)
 
     # Check qualifiers
-    qualifiers = list(c.get("has_qualifiers", []))
-    for qfam in c.get("has_qualifier_families", []):
-        nqf = normalize_key(qfam)
-        if nqf not in qualifiers:
-            qualifiers.append(nqf)
-        for child in _get_all_children_recursive(nqf, max_depth=3):
-            if child not in qualifiers:
-                qualifiers.append(child)
-    qual_found = [q for q in qualifiers if normalize_key(q) in found_set]
-    if qual_found:
+    if rules.qualifiers_mask & found:
         return scoring_thresholds.SUB_REQUIRE_QUALIFIER_CREDIT
 
     # Check supports
-    supports = c.get("supports", [])
-    sup_found = [s for s in supports if normalize_key(s) in found_set]
-    if sup_found:
+    if rules.supports_mask & found:
         return scoring_thresholds.SUB_REQUIRE_SUPPORT_CREDIT
 
     return 0.0
@@ -504,24 +425,28 @@ def _score_one_concept(
     expected_id: str,
     found_set: Set[str],
     absent_set: Optional[Set[str]] = None,
+    found_mask: Optional[int] = None,
 ) -> ConceptScore:
     """
     Calcule le score d'UN concept golden par rapport aux found_ids.
 
     `absent_set` : concepts extraits avec statut 'absent' (l'étudiant a nié
     « pas de X »). Sert au crédit déclaratif `negation_of` (bloc 1e).
+    `found_mask` : `found_set` déjà converti en masque (`OntologyGraph.mask`),
+    pour scorer plusieurs concepts golden sans reconvertir.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
+    g = get_ontology_graph()
 
     neid = normalize_key(expected_id)
-    c = concepts.get(neid, {})
+    c = g.concepts.get(neid, {})
     cname = c.get("concept_name", neid)
+    rules = g.rules(neid)
+    found = g.mask(found_set) if found_mask is None else found_mask
 
     cs = ConceptScore(concept_id=neid, concept_name=cname)
 
     # ── 0. Vérifier les exclusions d'abord ─────────────────────────
-    excluded_by = _check_excludes(neid, found_set)
+    excluded_by = g.excluded_by(rules, found)
     if excluded_by:
         cs.match_type = "excluded"
         cs.score = 0.0
@@ -537,7 +462,7 @@ def _score_one_concept(
         return cs
 
     # ── 1b. Un enfant (plus spécifique) trouvé ? → score complet ──
-    child_hit = _find_child_in_found(neid, found_set)
+    child_hit = g.first(rules.descendants & found)
     if child_hit:
         cs.match_type = "exact"
         cs.score = 1.0
@@ -552,7 +477,7 @@ def _score_one_concept(
     #   `implies_score` intégré à la logique du max ci-dessous (parent/
     #   requires/qualifier/support), pour ne créditer `implies` que s'il
     #   fait mieux que les autres sources.
-    antecedent_hit = _find_antecedent_in_found(neid, found_set)
+    antecedent_hit = g.first(rules.implied_by & found)
     if antecedent_hit and IMPLIES_CREDIT >= 1.0:
         cs.match_type = "implies"
         cs.score = 1.0
@@ -575,7 +500,7 @@ def _score_one_concept(
 
     # ── 1c. Un parent (plus générique) trouvé ? ───────────────────
     #   parent +1 (direct) → 2/3,  parent +2 (éloigné) → 1/3
-    parent_hit, parent_dist = _find_parent_in_found(neid, found_set)
+    parent_hit, parent_dist = g.closest_ancestor(rules, found)
     if parent_hit:
         if parent_dist <= 1:
             parent_score = scoring_thresholds.SUB_REQUIRE_QUALIFIER_CREDIT
@@ -593,20 +518,19 @@ def _score_one_concept(
         parent_cs_score = 0.0
 
     # ── 2. A des requires_findings ? ───────────────────────────────
-    requires = c.get("requires", [])
+    requires = rules.requires
     if requires:
         satisfied = []
         missing = []
         partial_credit = 0.0
 
-        for r in requires:
-            nr = normalize_key(r)
-            if nr in found_set:
+        for r, nr in requires:
+            if found >> nr & 1:
                 satisfied.append(r)
                 partial_credit += 1.0
             else:
                 # Recursive : vérifier si ce require est lui-même partiellement satisfait
-                sub_score = _score_sub_require(nr, found_set, depth=1)
+                sub_score = _sub_require_credit(g, g.ids[nr], found, depth=1, max_depth=2)
                 if sub_score > 0:
                     satisfied.append(f"{r}({sub_score:.0%})")
                     partial_credit += sub_score
@@ -653,17 +577,9 @@ def _score_one_concept(
         return cs
 
     # ── 3. has_qualifiers trouvés ? ────────────────────────────────
-    qualifiers = list(c.get("has_qualifiers", []))
-    # Étendre avec has_qualifier_families (le concept lui-même + ses enfants)
-    for qfam in c.get("has_qualifier_families", []):
-        nqf = normalize_key(qfam)
-        if nqf not in qualifiers:
-            qualifiers.append(nqf)
-        for child in _get_all_children_recursive(nqf, max_depth=3):
-            if child not in qualifiers:
-                qualifiers.append(child)
-    qual_found = [q for q in qualifiers if normalize_key(q) in found_set]
-    if qual_found:
+    # (has_qualifier_families déjà développées : le concept lui-même + ses enfants)
+    if rules.qualifiers_mask & found:
+        qual_found = [q for q, nq in rules.qualifiers if found >> nq & 1]
         qual_score = 2.0 / 3.0
         if qual_score >= parent_cs_score:
             cs.match_type = "qualifier"
@@ -675,9 +591,8 @@ def _score_one_concept(
         return cs
 
     # ── 4. supports trouvés ? ──────────────────────────────────────
-    supports = c.get("supports", [])
-    sup_found = [s for s in supports if normalize_key(s) in found_set]
-    if sup_found:
+    if rules.supports_mask & found:
+        sup_found = [s for s, ns in rules.supports if found >> ns & 1]
         sup_score = 1.0 / 3.0
         if sup_score >= parent_cs_score:
             cs.match_type = "support"
@@ -744,13 +659,19 @@ def score_student_response_v3(
             result.negation_conversions.append((absent_id, positive_id))
             logger.debug("Negation: absent(%s) → +%s", absent_id, positive_id)
 
-    # Scorer chaque concept golden
+    # Scorer chaque concept golden (found_set converti une fois en masque)
+    found_mask = get_ontology_graph().mask(found_set)
     for eid in expected_ids:
-        cs = _score_one_concept(eid, found_set, absent_set)
+        cs = _score_one_concept(eid, found_set, absent_set, found_mask)
         result.concept_scores.append(cs)
 
-    # Agrégation : chaque concept vaut 1/N
-    n = len(expected_ids)
+    _aggregate(result)
+    return result
+
+
+def _aggregate(result: ScoringResultV3) -> None:
+    """Agrégation (chaque concept vaut 1/N) et compteurs par match_type."""
+    n = len(result.concept_scores)
     result.max_possible_score = float(n)
     result.total_score = sum(cs.score for cs in result.concept_scores)
     result.score_pct = round((result.total_score / n) * 100, 1) if n > 0 else 0.0
@@ -774,7 +695,436 @@ def score_student_response_v3(
         else:
             result.n_missed += 1
 
-    return result
+
+# ---------------------------------------------------------------------------
+# Scoring de cohorte (vectorisé)
+# ---------------------------------------------------------------------------
+# Quand toute une promotion passe sur le même cas, les règles de chaque
+# concept golden (exclusions, descendants, antécédents, négations, ancêtres,
+# requires, qualifiers, supports) sont compilées UNE fois en listes de
+# colonnes (`CaseScoringPlan`), puis évaluées pour tous les étudiants d'un
+# coup sur une matrice booléenne étudiants × concepts (`CohortMatrix`).
+# Résultats identiques à `score_student_response_v3` appelé par étudiant.
+#
+# Les crédits (`scoring_thresholds`, IMPLIES_CREDIT, NEGATION_CREDIT) sont
+# lus à chaque `evaluate` : après modification d'une constante, réévaluer
+# le même plan sur la même matrice donne la note « et si » sans réencoder.
+
+# Origine du score d'un concept (sert à reconstruire match_type et detail)
+_R_MISSED, _R_EXCLUDED, _R_EXACT, _R_CHILD, _R_IMPLIES, _R_NEGATION, \
+    _R_PARENT, _R_REQUIRES, _R_REQUIRES_MISSED, _R_QUALIFIERS, _R_SUPPORTS = range(11)
+
+_NO_COLS = np.zeros(0, dtype=np.intp)
+
+
+def _cols(indices) -> np.ndarray:
+    return np.fromiter(indices, dtype=np.intp) if indices else _NO_COLS
+
+
+@dataclass
+class _SubRequirePlan:
+    """Crédit d'un require non trouvé (profondeur 1 de `_sub_require_credit`)."""
+    requires_cols: np.ndarray
+    qualifiers_cols: np.ndarray
+    supports_cols: np.ndarray
+
+
+@dataclass
+class _GoldenPlan:
+    """Règles d'un concept golden, en colonnes de la matrice de cohorte."""
+    concept_id: str
+    concept_name: str
+    col: int
+    excludes_checks: List[np.ndarray]
+    descendants_cols: np.ndarray
+    implied_by_cols: np.ndarray
+    negation_poles: List[Tuple[str, int]]
+    ancestors_cols: np.ndarray
+    ancestors_dist: np.ndarray
+    requires: List[Tuple[str, int, _SubRequirePlan]]
+    qualifiers: List[Tuple[str, int]]
+    qualifiers_cols: np.ndarray
+    supports: List[Tuple[str, int]]
+    supports_cols: np.ndarray
+
+
+@dataclass
+class CohortMatrix:
+    """Réponses d'une cohorte encodées pour un `CaseScoringPlan`."""
+    found: np.ndarray                     # (n_étudiants, n_colonnes) bool
+    absent: np.ndarray                    # idem, concepts niés
+    negation_conversions: List[List[Tuple[str, str]]]
+
+    @property
+    def n_students(self) -> int:
+        return self.found.shape[0]
+
+
+@dataclass
+class CohortEvaluation:
+    """Scores d'une cohorte : matrices (n_étudiants, n_golden) + détail."""
+    plan: "CaseScoringPlan"
+    matrix: CohortMatrix
+    scores: np.ndarray                    # score de chaque concept golden
+    reasons: np.ndarray                   # origine du score (_R_*)
+    details: List[Dict[str, np.ndarray]]  # tableaux intermédiaires par golden
+
+    @property
+    def total_scores(self) -> np.ndarray:
+        """Somme des scores par étudiant (même ordre d'addition que le scalaire)."""
+        total = np.zeros(self.scores.shape[0])
+        for j in range(self.scores.shape[1]):
+            total = total + self.scores[:, j]
+        return total
+
+    @property
+    def score_pct(self) -> List[float]:
+        """Note en % par étudiant (arrondi identique à ScoringResultV3.score_pct)."""
+        n = self.scores.shape[1]
+        if n == 0:
+            return [0.0] * self.scores.shape[0]
+        return [round((t / n) * 100, 1) for t in self.total_scores.tolist()]
+
+    def results(self) -> List[ScoringResultV3]:
+        """Un ScoringResultV3 par étudiant, identique au scoring individuel."""
+        # Colonnes converties une fois en listes Python (accès scalaires rapides)
+        columns = [
+            (self.scores[:, j].tolist(), self.reasons[:, j].tolist(),
+             {k: v.tolist() for k, v in self.details[j].items()})
+            for j in range(len(self.plan.goldens))
+        ]
+        out = []
+        for s in range(self.matrix.n_students):
+            result = ScoringResultV3(
+                negation_conversions=list(self.matrix.negation_conversions[s])
+            )
+            if self.plan.goldens:
+                result.concept_scores = [
+                    self._concept_score(s, gp, *col)
+                    for gp, col in zip(self.plan.goldens, columns)
+                ]
+                _aggregate(result)
+            out.append(result)
+        return out
+
+    def _concept_score(self, s: int, gp: _GoldenPlan, scores: List[float],
+                       reasons: List[int], d: Dict[str, list]) -> ConceptScore:
+        name = self.plan.column_ids
+        reason = reasons[s]
+        cs = ConceptScore(concept_id=gp.concept_id, concept_name=gp.concept_name,
+                          score=scores[s])
+
+        if reason == _R_EXCLUDED:
+            cs.match_type = "excluded"
+            cs.excluded_by = name[d["excluded_col"][s]]
+            cs.detail = f"Exclu par {cs.excluded_by}"
+        elif reason == _R_EXACT:
+            cs.match_type = "exact"
+            cs.detail = "Trouvé exact"
+        elif reason == _R_CHILD:
+            cs.match_type = "exact"
+            cs.detail = f"Enfant trouvé: {name[d['child_col'][s]]}"
+        elif reason == _R_IMPLIES:
+            cs.match_type = "implies"
+            cs.detail = f"Impliqué par: {name[d['implied_col'][s]]}"
+        elif reason == _R_NEGATION:
+            cs.match_type = "negation"
+            cs.detail = f"Nié explicitement: pas de {gp.negation_poles[d['pole'][s]][0]}"
+        elif reason == _R_PARENT:
+            parent, dist = name[d["parent_col"][s]], d["parent_dist"][s]
+            if dist <= 1:
+                cs.detail = f"Parent direct trouvé: {parent} (dist={dist})"
+            else:
+                cs.detail = f"Parent éloigné trouvé: {parent} (dist={dist})"
+            if gp.requires:
+                cs.match_type = "qualifier" if cs.score >= 2.0 / 3.0 else "support"
+            else:
+                cs.match_type = "qualifier" if dist <= 1 else "support"
+        elif reason in (_R_REQUIRES, _R_REQUIRES_MISSED):
+            satisfied, missing = [], []
+            for k, (r, _, _) in enumerate(gp.requires):
+                if d["direct"][s][k]:
+                    satisfied.append(r)
+                elif d["sub"][s][k] > 0:
+                    satisfied.append(f"{r}({d['sub'][s][k]:.0%})")
+                else:
+                    missing.append(r)
+            cs.requires_total = len(gp.requires)
+            cs.requires_found = len(satisfied)
+            cs.requires_satisfied = satisfied
+            cs.requires_missing = missing
+            if reason == _R_REQUIRES:
+                cs.match_type = "requires"
+                cs.detail = f"{d['partial'][s]:.1f}/{len(gp.requires)} requires"
+            else:
+                cs.match_type = "missed"
+                cs.detail = f"0/{len(gp.requires)} requires — non reconnu"
+        elif reason == _R_QUALIFIERS:
+            cs.match_type = "qualifier"
+            cs.qualifiers_found = [q for q, c in gp.qualifiers if self.matrix.found[s, c]]
+            cs.detail = f"Qualifiers: {', '.join(cs.qualifiers_found)}"
+        elif reason == _R_SUPPORTS:
+            cs.match_type = "support"
+            cs.supports_found = [x for x, c in gp.supports if self.matrix.found[s, c]]
+            cs.detail = f"Supports: {', '.join(cs.supports_found)}"
+        else:
+            cs.match_type = "missed"
+            cs.detail = "Non trouvé"
+        return cs
+
+
+def _first_hit(found: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(au moins une colonne vraie, position de la première) par étudiant."""
+    if not len(cols):
+        n = found.shape[0]
+        return np.zeros(n, dtype=bool), np.zeros(n, dtype=np.intp)
+    sub = found[:, cols]
+    return sub.any(axis=1), sub.argmax(axis=1)
+
+
+class CaseScoringPlan:
+    """Règles de scoring V3 d'un cas (liste golden) compilées pour une cohorte."""
+
+    def __init__(self, expected_ids: List[str]):
+        g = get_ontology_graph()
+        self.graph = g
+        self.expected_ids = list(expected_ids)
+
+        # Colonnes : espace d'IDs du graphe + IDs golden inconnus de l'ontologie
+        self.column_ids: List[str] = list(g.ids)
+        self.columns: Dict[str, int] = dict(g.index)
+        for eid in self.expected_ids:
+            neid = normalize_key(eid)
+            if neid not in self.columns:
+                self.columns[neid] = len(self.column_ids)
+                self.column_ids.append(neid)
+
+        self.goldens: List[_GoldenPlan] = [self._compile(eid) for eid in self.expected_ids]
+
+    def _compile(self, expected_id: str) -> _GoldenPlan:
+        g = self.graph
+        neid = normalize_key(expected_id)
+        rules = g.rules(neid)
+
+        def bits(mask: int) -> np.ndarray:
+            return _cols(list(iter_bits(mask)))
+
+        def sub_plan(nr: int) -> _SubRequirePlan:
+            sub = g.rules(g.ids[nr])
+            return _SubRequirePlan(
+                requires_cols=_cols([c for _, c in sub.requires]),
+                qualifiers_cols=bits(sub.qualifiers_mask),
+                supports_cols=bits(sub.supports_mask),
+            )
+
+        return _GoldenPlan(
+            concept_id=neid,
+            concept_name=g.concepts.get(neid, {}).get("concept_name", neid),
+            col=self.columns[neid],
+            excludes_checks=[bits(m) for m in rules.excludes_checks],
+            descendants_cols=bits(rules.descendants),
+            implied_by_cols=bits(rules.implied_by),
+            negation_poles=[(p, self.columns.get(p, -1)) for p in rules.negation_of],
+            ancestors_cols=_cols([a for a, _ in rules.ancestors]),
+            ancestors_dist=_cols([dist for _, dist in rules.ancestors]),
+            requires=[(r, nr, sub_plan(nr)) for r, nr in rules.requires],
+            qualifiers=list(rules.qualifiers),
+            qualifiers_cols=_cols([c for _, c in rules.qualifiers]),
+            supports=list(rules.supports),
+            supports_cols=_cols([c for _, c in rules.supports]),
+        )
+
+    # ------------------------------------------------------------------
+    # Encodage des réponses
+    # ------------------------------------------------------------------
+
+    def encode(
+        self,
+        found_sets: List[List[str]],
+        absent_sets: Optional[List[List[str]]] = None,
+    ) -> CohortMatrix:
+        """Encode les réponses (mêmes conversions que score_student_response_v3)."""
+        n = len(found_sets)
+        if absent_sets is None:
+            absent_sets = [[] for _ in range(n)]
+        if len(absent_sets) != n:
+            raise ValueError(
+                f"{len(absent_sets)} listes d'absents pour {n} listes de concepts trouvés"
+            )
+        m = len(self.column_ids)
+        conversions: List[List[Tuple[str, str]]] = []
+        columns = self.columns
+        f_rows: List[int] = []
+        f_cols: List[int] = []
+        a_rows: List[int] = []
+        a_cols: List[int] = []
+        for s, (found_ids, absent_ids) in enumerate(zip(found_sets, absent_sets)):
+            absent_ids = list(absent_ids or [])
+            found_set = {normalize_key(fid) for fid in found_ids}
+            conv = convert_absents_to_positive(absent_ids) if absent_ids else []
+            for _, positive_id in conv:
+                found_set.add(positive_id)
+            conversions.append(conv)
+            for c in map(columns.get, found_set):
+                if c is not None:
+                    f_rows.append(s)
+                    f_cols.append(c)
+            for c in (columns.get(normalize_key(a)) for a in absent_ids):
+                if c is not None:
+                    a_rows.append(s)
+                    a_cols.append(c)
+        found = np.zeros((n, m), dtype=bool)
+        absent = np.zeros((n, m), dtype=bool)
+        found[f_rows, f_cols] = True
+        absent[a_rows, a_cols] = True
+        return CohortMatrix(found=found, absent=absent, negation_conversions=conversions)
+
+    # ------------------------------------------------------------------
+    # Évaluation vectorisée
+    # ------------------------------------------------------------------
+
+    def evaluate(self, matrix: CohortMatrix) -> CohortEvaluation:
+        """Score tous les étudiants de `matrix` (crédits lus au moment de l'appel)."""
+        n = matrix.n_students
+        scores = np.zeros((n, len(self.goldens)))
+        reasons = np.full((n, len(self.goldens)), _R_MISSED, dtype=np.int8)
+        details = []
+        for j, gp in enumerate(self.goldens):
+            score, reason, d = self._evaluate_golden(gp, matrix)
+            scores[:, j] = score
+            reasons[:, j] = reason
+            details.append(d)
+        return CohortEvaluation(plan=self, matrix=matrix, scores=scores,
+                                reasons=reasons, details=details)
+
+    @staticmethod
+    def _sub_credit(sp: _SubRequirePlan, found: np.ndarray) -> np.ndarray:
+        """Crédit de `_sub_require_credit` à la profondeur 1, par étudiant."""
+        if len(sp.requires_cols):
+            return found[:, sp.requires_cols].sum(axis=1) / len(sp.requires_cols)
+        q_hit, _ = _first_hit(found, sp.qualifiers_cols)
+        s_hit, _ = _first_hit(found, sp.supports_cols)
+        return np.where(q_hit, scoring_thresholds.SUB_REQUIRE_QUALIFIER_CREDIT,
+                        np.where(s_hit, scoring_thresholds.SUB_REQUIRE_SUPPORT_CREDIT, 0.0))
+
+    def _evaluate_golden(self, gp: _GoldenPlan, matrix: CohortMatrix):
+        F, A = matrix.found, matrix.absent
+        n = F.shape[0]
+        d: Dict[str, np.ndarray] = {}
+
+        # ── 1c. Parent (plancher) ──────────────────────────────────────
+        p_hit, p_pos = _first_hit(F, gp.ancestors_cols)
+        p_dist = gp.ancestors_dist[p_pos] if len(gp.ancestors_cols) else np.zeros(n, dtype=np.intp)
+        d["parent_col"] = gp.ancestors_cols[p_pos] if len(gp.ancestors_cols) else p_pos
+        d["parent_dist"] = p_dist
+        parent_cs = np.where(
+            p_hit,
+            np.where(p_dist <= 1,
+                     round(scoring_thresholds.SUB_REQUIRE_QUALIFIER_CREDIT, 4),
+                     round(scoring_thresholds.SUB_REQUIRE_SUPPORT_CREDIT, 4)),
+            0.0,
+        )
+        has_parent = parent_cs > 0
+
+        # ── 2-6. requires / qualifiers / supports / parent / rien ─────
+        if gp.requires:
+            direct = np.zeros((n, len(gp.requires)), dtype=bool)
+            sub = np.zeros((n, len(gp.requires)))
+            partial = np.zeros(n)
+            for k, (_, col, sp) in enumerate(gp.requires):
+                direct[:, k] = F[:, col]
+                sub[:, k] = np.where(direct[:, k], 0.0, self._sub_credit(sp, F))
+                partial = partial + np.where(direct[:, k], 1.0, sub[:, k])
+            req_score = np.array([round(v, 4) for v in (partial / len(gp.requires)).tolist()])
+            d["direct"], d["sub"], d["partial"] = direct, sub, partial
+            use_req = (req_score > 0) & (req_score >= parent_cs)
+            score = np.where(use_req, req_score, np.where(has_parent, parent_cs, 0.0))
+            reason = np.where(use_req, _R_REQUIRES,
+                              np.where(has_parent, _R_PARENT, _R_REQUIRES_MISSED))
+        else:
+            q_hit, _ = _first_hit(F, gp.qualifiers_cols)
+            s_hit, _ = _first_hit(F, gp.supports_cols)
+            q_wins = 2.0 / 3.0 >= parent_cs
+            s_wins = 1.0 / 3.0 >= parent_cs
+            score = np.where(
+                q_hit, np.where(q_wins, 2.0 / 3.0, parent_cs),
+                np.where(s_hit, np.where(s_wins, 1.0 / 3.0, parent_cs), parent_cs))
+            reason = np.where(
+                q_hit, np.where(q_wins, _R_QUALIFIERS, _R_PARENT),
+                np.where(s_hit, np.where(s_wins, _R_SUPPORTS, _R_PARENT),
+                         np.where(has_parent, _R_PARENT, _R_MISSED)))
+
+        # ── 0/1/1b/1d/1e : court-circuits, du moins au plus prioritaire ──
+        if NEGATION_CREDIT >= 1.0 and gp.negation_poles:
+            pole = np.full(n, -1, dtype=np.intp)
+            for k, (_, col) in enumerate(gp.negation_poles):
+                if col >= 0:
+                    pole = np.where((pole < 0) & A[:, col], k, pole)
+            d["pole"] = pole
+            hit = pole >= 0
+            score = np.where(hit, 1.0, score)
+            reason = np.where(hit, _R_NEGATION, reason)
+
+        if IMPLIES_CREDIT >= 1.0:
+            i_hit, i_pos = _first_hit(F, gp.implied_by_cols)
+            if len(gp.implied_by_cols):
+                d["implied_col"] = gp.implied_by_cols[i_pos]
+            score = np.where(i_hit, 1.0, score)
+            reason = np.where(i_hit, _R_IMPLIES, reason)
+
+        c_hit, c_pos = _first_hit(F, gp.descendants_cols)
+        if len(gp.descendants_cols):
+            d["child_col"] = gp.descendants_cols[c_pos]
+        score = np.where(c_hit, 1.0, score)
+        reason = np.where(c_hit, _R_CHILD, reason)
+
+        exact = F[:, gp.col]
+        score = np.where(exact, 1.0, score)
+        reason = np.where(exact, _R_EXACT, reason)
+
+        excluded_col = np.full(n, -1, dtype=np.intp)
+        for cols in gp.excludes_checks:
+            e_hit, e_pos = _first_hit(F, cols)
+            if len(cols):
+                excluded_col = np.where((excluded_col < 0) & e_hit, cols[e_pos], excluded_col)
+        d["excluded_col"] = excluded_col
+        excluded = excluded_col >= 0
+        score = np.where(excluded, 0.0, score)
+        reason = np.where(excluded, _R_EXCLUDED, reason)
+
+        return score, reason, d
+
+
+def score_cohort_v3(
+    case_expected_ids: List[str],
+    list_of_found_sets: List[List[str]],
+    list_of_absent_sets: Optional[List[List[str]]] = None,
+) -> List[ScoringResultV3]:
+    """
+    Scoring V3 d'une cohorte entière sur un même cas, en une passe.
+
+    Équivaut à `[score_student_response_v3(f, case_expected_ids, a) for f, a
+    in zip(list_of_found_sets, list_of_absent_sets)]`, mais les règles du cas
+    ne sont compilées qu'une fois et évaluées pour tous les étudiants avec
+    NumPy. Pour des notes « et si » (constantes de `scoring_thresholds`
+    modifiées), garder le plan et la matrice :
+
+        plan = CaseScoringPlan(expected_ids)
+        matrix = plan.encode(found_sets, absent_sets)
+        plan.evaluate(matrix).score_pct
+
+    Args:
+        case_expected_ids:   IDs golden du cas (validants)
+        list_of_found_sets:  IDs présents, un itérable par étudiant
+        list_of_absent_sets: IDs niés ('absent'), un itérable par étudiant
+
+    Returns:
+        Un ScoringResultV3 par étudiant, dans l'ordre des listes.
+    """
+    if not case_expected_ids:
+        return [ScoringResultV3() for _ in list_of_found_sets]
+    plan = CaseScoringPlan(case_expected_ids)
+    return plan.evaluate(plan.encode(list_of_found_sets, list_of_absent_sets)).results()
 
 
 # ---------------------------------------------------------------------------
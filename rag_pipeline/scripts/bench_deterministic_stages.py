@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark — étapes déterministes du rapport sur 10 000 réponses synthétiques
+=============================================================================
+Mesure le débit des étapes sans appel réseau de `_assemble_and_score`, qui
+travaillent sur des masques de bits (cf. ontology_graph) :
+  - rattrapage lexical       (`candidate_report._lexical_backstop_ids`) ;
+  - inférence des verdicts   (`PatternInferencer.infer`, Brique 2.5) ;
+  - scoring V3               (`score_student_response_v3`, Brique 5) ;
+  - expansion sémantique     (`expand_found_concepts`, Brique 4.5).
+
+Les réponses sont tirées de l'ontologie chargée (graine fixe) : IDs présents
+/ absents / golden aléatoires, texte fait de noms canoniques et synonymes
+des concepts cités, dont une partie précédée d'une négation.
+
+Usage :
+    python scripts/bench_deterministic_stages.py
+    python scripts/bench_deterministic_stages.py --n 10000 --seed 0
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.stderr.reconfigure(encoding="utf-8")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from candidate_report import _get_inferencer, _lexical_backstop_ids
+from ontology_graph import get_ontology_graph
+from scoring_v3 import build_negation_map, score_student_response_v3
+from semantic_layer import _get_ontology_v2, expand_found_concepts
+
+
+def build_answers(n: int, seed: int) -> List[Dict]:
+    concepts = _get_ontology_v2()["concepts"]
+    ids = sorted(concepts)
+    rng = random.Random(seed)
+    answers = []
+    for _ in range(n):
+        cited = rng.sample(ids, rng.randint(2, 15))
+        parts = []
+        for cid in cited:
+            c = concepts[cid]
+            forme = rng.choice([c.get("concept_name", "")] + list(c.get("synonymes", [])))
+            parts.append(rng.choice(["", "", "pas de ", "probable "]) + forme)
+        absent = rng.sample(ids, rng.randint(0, 4))
+        answers.append({
+            "texte": ", ".join(parts),
+            "found": cited[: max(1, len(cited) * 3 // 4)],
+            "absent": absent,
+            "golden": rng.sample(ids, rng.randint(3, 12)) + [rng.choice(cited)],
+        })
+    return answers
+
+
+def bench(name: str, fn: Callable[[Dict], object], answers: List[Dict]) -> None:
+    t0 = time.perf_counter()
+    for a in answers:
+        fn(a)
+    dt = time.perf_counter() - t0
+    print(f"  {name:28s} {dt:7.3f} s   {dt / len(answers) * 1e6:8.1f} µs/réponse"
+          f"   {len(answers) / dt:10.0f} réponses/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    t0 = time.perf_counter()
+    graph = get_ontology_graph()
+    inferencer = _get_inferencer()
+    build_negation_map()
+    print(f"Préparation (graphe {len(graph.ids)} IDs, inférenceur, négations) : "
+          f"{time.perf_counter() - t0:.3f} s")
+
+    answers = build_answers(args.n, args.seed)
+    print(f"{len(answers)} réponses synthétiques (graine {args.seed})\n")
+
+    bench("rattrapage lexical",
+          lambda a: _lexical_backstop_ids(a["texte"], a["golden"], set(a["found"])), answers)
+    bench("inférence des verdicts",
+          lambda a: inferencer.infer(a["found"], a["absent"]), answers)
+    bench("scoring V3",
+          lambda a: score_student_response_v3(a["found"], a["golden"], a["absent"]), answers)
+    bench("expansion sémantique",
+          lambda a: expand_found_concepts(a["found"]), answers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark — sélection Top-K : argsort complet vs top_k_indices
+=====================================================================
+Compare l'ancienne sélection `np.argsort(scores)[::-1][:k]` (tri complet
+O(N log N)) à `ontology_index.top_k_indices` (argpartition + tri partiel)
+sur des corpus synthétiques de 411, 10 000 et 100 000 documents, pour les
+deux profils de scores du pipeline :
+  - dense  : cosinus float32 (quasi aucun ex-aequo) ;
+  - sparse : scores BM25 float64, majorité de zéros et nombreux ex-aequo.
+
+Vérifie au passage que top_k_indices renvoie exactement l'ordre d'un
+argsort STABLE inversé (même scores, ex-aequo départagés par index
+décroissant).
+
+Usage :
+    python scripts/bench_top_k.py
+    python scripts/bench_top_k.py --sizes 411,10000,100000,1000000 --k 15
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.stderr.reconfigure(encoding="utf-8")
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ontology_index import top_k_indices
+
+
+def make_scores(kind: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    if kind == "dense":
+        return rng.uniform(-0.1, 0.8, n).astype(np.float32)
+    # BM25 : ~2 % de documents matchés, poids discrets (mêmes tf/longueurs).
+    scores = np.zeros(n)
+    hits = rng.choice(n, size=max(1, n // 50), replace=False)
+    scores[hits] = rng.choice([1.7, 2.3, 3.1, 4.6], size=len(hits))
+    return scores
+
+
+def bench(fn, repeat: int) -> float:
+    """Meilleur temps moyen par appel (µs) sur 5 séries."""
+    return min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=str, default="411,10000,100000")
+    parser.add_argument("--k", type=int, default=15, help="Taille du pool (k × pool_factor).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print("=" * 74)
+    print(f"⏱️  TOP-K (k={args.k}) — argsort complet vs top_k_indices")
+    print("=" * 74)
+    print(f"  {'profil':<8}{'N':>10}{'argsort (µs)':>16}{'top_k (µs)':>14}{'gain':>9}  parité")
+    for kind in ("dense", "sparse"):
+        for n in sizes:
+            scores = make_scores(kind, n, rng)
+            expected = np.argsort(scores, kind="stable")[::-1][: args.k]
+            same = np.array_equal(top_k_indices(scores, args.k), expected)
+
+            repeat = max(3, 200_000 // n)
+            t_old = bench(lambda: np.argsort(scores)[::-1][: args.k], repeat)
+            t_new = bench(lambda: top_k_indices(scores, args.k), repeat)
+            print(f"  {kind:<8}{n:>10}{t_old:>16.1f}{t_new:>14.1f}"
+                  f"{t_old / t_new:>8.1f}×  {'✅' if same else '❌'}")
+    print("=" * 74)
+
+
+if __name__ == "__main__":
+    main()
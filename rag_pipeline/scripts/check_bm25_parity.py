@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Parité + vitesse — SparseBM25 (vectorisé) vs rank_bm25.BM25Okapi
+=================================================================
+Vérifie, sur le corpus BM25 réel de l'index (rag_index/bm25_corpus.json,
+ou surface_forms de metadata_ontologie.json à défaut), que SparseBM25
+renvoie EXACTEMENT les mêmes scores que BM25Okapi :
+  - chaque surface_form du corpus utilisée comme requête ;
+  - des requêtes bruitées (tokens répétés, hors vocabulaire, vides) ;
+  - le scoring par lot (get_scores_many) vs requête par requête.
+
+Usage :
+    python scripts/check_bm25_parity.py
+    python scripts/check_bm25_parity.py --index-dir rag_index --n-random 2000
+
+Code de sortie non nul si un écart est détecté.
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding="utf-8")
+    sys.stderr.reconfigure(encoding="utf-8")
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ontology_index import tokenize
+from sparse_bm25 import SparseBM25
+
+
+def load_corpus(index_dir: Path) -> List[List[str]]:
+    bm25_path = index_dir / "bm25_corpus.json"
+    if bm25_path.exists():
+        with open(bm25_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with open(index_dir / "metadata_ontologie.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return [tokenize(d["surface_form"]) for d in meta["documents"]]
+
+
+def build_queries(corpus: List[List[str]], n_random: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    vocab = sorted({w for doc in corpus for w in doc})
+    queries = [list(doc) for doc in corpus]
+    for _ in range(n_random):
+        q = rng.sample(vocab, k=min(len(vocab), rng.randint(1, 5)))
+        if rng.random() < 0.3:
+            q.append(q[0])                # token répété
+        if rng.random() < 0.2:
+            q.append("zzz_hors_vocab")    # token inconnu
+        queries.append(q)
+    queries.append([])
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    default_dir = Path(__file__).parent.parent / "rag_index"
+    parser.add_argument("--index-dir", type=Path, default=default_dir)
+    parser.add_argument("--n-random", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.index_dir)
+    queries = build_queries(corpus, args.n_random, args.seed)
+
+    t0 = time.perf_counter()
+    ref = BM25Okapi(corpus)
+    t_build_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = SparseBM25(corpus)
+    t_build_fast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ref_scores = [ref.get_scores(q) for q in queries]
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast_scores = [fast.get_scores(q) for q in queries]
+    t_fast = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    batch_scores = fast.get_scores_many(queries)
+    t_batch = time.perf_counter() - t0
+
+    n_diff = 0
+    max_abs = 0.0
+    for i, (r, f) in enumerate(zip(ref_scores, fast_scores)):
+        if not np.array_equal(r, f) or not np.array_equal(f, batch_scores[i]):
+            n_diff += 1
+            max_abs = max(max_abs, float(np.abs(r - f).max()),
+                          float(np.abs(f - batch_scores[i]).max()))
+
+    n = len(queries)
+    print("=" * 70)
+    print("🔤 PARITÉ BM25 — SparseBM25 vs rank_bm25.BM25Okapi")
+    print("=" * 70)
+    print(f"  Corpus     : {len(corpus)} documents, {len(fast.vocab)} termes")
+    print(f"  Requêtes   : {n}")
+    print(f"  Build      : BM25Okapi {t_build_ref * 1e3:.1f} ms | "
+          f"SparseBM25 {t_build_fast * 1e3:.1f} ms")
+    print(f"  Scoring    : BM25Okapi {t_ref / n * 1e6:.1f} µs/req | "
+          f"SparseBM25 {t_fast / n * 1e6:.1f} µs/req | "
+          f"lot {t_batch / n * 1e6:.1f} µs/req "
+          f"(×{t_ref / max(t_fast, 1e-9):.0f})")
+    if n_diff:
+        print(f"  ❌ {n_diff}/{n} requêtes divergentes (écart max {max_abs:.3e})")
+        sys.exit(1)
+    print(f"  ✅ Scores identiques au bit près sur {n} requêtes")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
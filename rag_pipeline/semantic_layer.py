@@ -23,6 +23,7 @@ import json
 import logging
 import unicodedata
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Set
 
@@ -73,6 +74,14 @@ def normalize_key(key: str) -> str:
     """Normalise une cle en supprimant les accents (e->e, a->a, etc.).
     Pipeline V1 peut renvoyer des cles avec accents (ex: FAISCEAU_ACCESSOIRE_A_CONDUCTION_ANTEROGRADE)
     alors que les cles V2 sont sans accents."""
+    # Cas courant : cle deja ASCII (NFKD est alors l'identite)
+    if key.isascii():
+        return key
+    return _strip_accents(key)
+
+
+@lru_cache(maxsize=65536)
+def _strip_accents(key: str) -> str:
     nfkd = unicodedata.normalize("NFKD", key)
     return "".join(ch for ch in nfkd if not unicodedata.combining(ch))
 
@@ -414,22 +423,25 @@ def _find_implicit_patterns(
     Exemple : l'etudiant dit "QRS larges + tachycardie" -> on detecte
     TACHYCARDIE_VENTRICULAIRE comme pattern implicite.
     """
-    onto = _get_ontology_v2()
-    concepts = onto["concepts"]
+    # Import local : ontology_graph depend de ce module
+    from ontology_graph import get_ontology_graph
+
+    g = get_ontology_graph()
+    concepts = g.concepts
+    findings_mask = g.key_mask(all_findings)
     implicit = {}
 
-    for cid, c in concepts.items():
-        if c.get("type") != "pattern":
-            continue
+    # Candidats precompiles : patterns visibles porteurs de requires
+    for rules in g.requiring_patterns:
+        cid = rules.concept_id
         if cid in all_found:
             continue  # Deja trouve explicitement
-        if is_hidden(cid):
+        # Aucun require present : ratio nul, inutile de detailler
+        if IMPLICIT_MIN_REQUIRES_RATIO > 0 and not rules.requires_mask & findings_mask:
             continue
 
+        c = concepts[cid]
         requires = c.get("requires", [])
-        if not requires:
-            continue
-
         satisfied = [r for r in requires if r in all_findings]
         ratio = len(satisfied) / len(requires)
 
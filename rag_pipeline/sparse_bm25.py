@@ -0,0 +1,189 @@
+"""
+🔤 BM25 vectorisé — matrice terme × document pré-pondérée
+===========================================================
+Remplaçant drop-in de rank_bm25.BM25Okapi pour le chemin chaud de la
+recherche lexicale (Briques 1 et 3).
+
+BM25Okapi.get_scores() parcourt en Python pur TOUS les documents pour
+CHAQUE token de la requête. Ici, le poids BM25 de chaque couple
+(terme, document) — IDF et normalisation de longueur inclus — est calculé
+une fois à la construction et rangé dans une matrice creuse au format CSR
+orienté termes (une ligne par terme du vocabulaire). Scorer une requête
+revient à sommer quelques lignes creuses : le coût ne dépend plus de la
+taille du corpus mais du nombre de postings des tokens de la requête.
+
+Parité : mêmes formules, même ordre d'opérations flottantes et même ordre
+d'accumulation que BM25Okapi (k1=1.5, b=0.75, epsilon=0.25) — les scores
+sont identiques au bit près (cf. scripts/check_bm25_parity.py).
+
+Implémentation NumPy pure (indptr / indices / data) : pas de dépendance
+SciPy, absente du projet.
+
+Auteur : BMad Team
+Date   : 2026-10-17
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+class SparseBM25:
+    """
+    Index BM25 Okapi pré-pondéré, interface compatible BM25Okapi.get_scores.
+
+    Usage:
+        bm25 = SparseBM25([tokenize(d) for d in docs])
+        scores = bm25.get_scores(tokenize("bloc de branche"))   # (N,)
+        batch = bm25.get_scores_many([["fa"], ["bbg"]])          # (2, N)
+    """
+
+    def __init__(
+        self,
+        corpus: Sequence[Sequence[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        # --- 1. Fréquences (même parcours que rank_bm25.BM25._initialize) ---
+        nd: Dict[str, int] = {}  # terme → nombre de documents le contenant
+        doc_freqs: List[Dict[str, int]] = []
+        doc_len: List[int] = []
+        num_doc = 0
+        for document in corpus:
+            doc_len.append(len(document))
+            num_doc += len(document)
+            frequencies: Dict[str, int] = {}
+            for word in document:
+                frequencies[word] = frequencies.get(word, 0) + 1
+            doc_freqs.append(frequencies)
+            for word in frequencies:
+                nd[word] = nd.get(word, 0) + 1
+
+        self.corpus_size = len(doc_len)
+        self.avgdl = num_doc / self.corpus_size
+        self.doc_len = np.array(doc_len)
+
+        # --- 2. IDF (même parcours que BM25Okapi._calc_idf) ---
+        # Les IDF négatives (termes présents dans plus de la moitié du corpus)
+        # sont remplacées par epsilon × IDF moyenne.
+        self.idf: Dict[str, float] = {}
+        idf_sum = 0.0
+        negative_idfs = []
+        for word, freq in nd.items():
+            idf = math.log(self.corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            self.idf[word] = idf
+            idf_sum += idf
+            if idf < 0:
+                negative_idfs.append(word)
+        self.average_idf = idf_sum / len(self.idf) if self.idf else 0.0
+        eps = self.epsilon * self.average_idf
+        for word in negative_idfs:
+            self.idf[word] = eps
+
+        # --- 3. Matrice CSR terme × document, poids BM25 pré-calculés ---
+        self.vocab: Dict[str, int] = {word: i for i, word in enumerate(nd)}
+        postings: List[List[int]] = [[] for _ in self.vocab]
+        for doc_id, frequencies in enumerate(doc_freqs):
+            for word in frequencies:
+                postings[self.vocab[word]].append(doc_id)
+
+        counts = np.fromiter((len(p) for p in postings), dtype=np.int64,
+                             count=len(postings))
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (d for p in postings for d in p), dtype=np.int32,
+            count=int(self.indptr[-1]),
+        )
+        tf = np.fromiter(
+            (doc_freqs[d][word] for word, p in zip(self.vocab, postings) for d in p),
+            dtype=np.int64, count=int(self.indptr[-1]),
+        )
+        idf_per_posting = np.repeat(
+            np.array([self.idf[word] for word in self.vocab], dtype=np.float64),
+            counts,
+        )
+        # Même expression (et même ordre d'évaluation) que BM25Okapi.get_scores.
+        dl = self.doc_len[self.indices]
+        self.data = idf_per_posting * (
+            tf * (self.k1 + 1)
+            / (tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl))
+        )
+
+    # ------------------------------------------------------------------
+    # Persistance (index_store) : tableaux plats, rechargeables en mmap
+    # ------------------------------------------------------------------
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tableaux NumPy suffisants pour reconstruire l'index (cf. from_arrays)."""
+        return {
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "data": self.data,
+            "doc_len": self.doc_len,
+            "idf": np.array([self.idf[w] for w in self.vocab], dtype=np.float64),
+            "params": np.array(
+                [self.k1, self.b, self.epsilon, self.avgdl, self.average_idf],
+                dtype=np.float64,
+            ),
+        }
+
+    @classmethod
+    def from_arrays(cls, vocab: Sequence[str], arrays: Dict[str, np.ndarray]) -> "SparseBM25":
+        """
+        Reconstruit un index sans recalcul depuis to_arrays() + le vocabulaire
+        (dans l'ordre des lignes). Les tableaux peuvent être des memmaps
+        en lecture seule : ils ne sont jamais modifiés.
+        """
+        self = cls.__new__(cls)
+        k1, b, epsilon, avgdl, average_idf = (float(x) for x in arrays["params"])
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.avgdl, self.average_idf = avgdl, average_idf
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.data = arrays["data"]
+        self.doc_len = arrays["doc_len"]
+        self.corpus_size = len(self.doc_len)
+        self.vocab = {word: i for i, word in enumerate(vocab)}
+        self.idf = dict(zip(vocab, (float(x) for x in arrays["idf"])))
+        return self
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def _accumulate(self, out: np.ndarray, query: Sequence[str]) -> None:
+        """Ajoute à `out` (N,) les contributions de chaque token de la requête."""
+        # Un token répété compte autant de fois qu'il apparaît (comme BM25Okapi) ;
+        # un token hors vocabulaire ne contribue pas.
+        for word in query:
+            row = self.vocab.get(word)
+            if row is None:
+                continue
+            start, end = self.indptr[row], self.indptr[row + 1]
+            # Les documents d'une ligne sont distincts : += vectorisé sûr.
+            out[self.indices[start:end]] += self.data[start:end]
+
+    def get_scores(self, query: Sequence[str]) -> np.ndarray:
+        """Scores BM25 de tous les documents pour une requête tokenisée (N,)."""
+        scores = np.zeros(self.corpus_size)
+        self._accumulate(scores, query)
+        return scores
+
+    def get_scores_many(self, queries: Sequence[Sequence[str]]) -> np.ndarray:
+        """Scores BM25 d'un lot de requêtes tokenisées (n_queries × N)."""
+        scores = np.zeros((len(queries), self.corpus_size))
+        for i, query in enumerate(queries):
+            self._accumulate(scores[i], query)
+        return scores
+
+    def __len__(self) -> int:
+        return self.corpus_size